@@ -0,0 +1,296 @@
+from collections import OrderedDict, deque
+from itertools import compress
+from operator import itemgetter
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+
+class AhoCorasick:
+    """
+    Automate d'Aho-Corasick : recherche simultanée de plusieurs motifs en un seul parcours du texte,
+    en temps linéaire en la longueur du texte (plus le nombre d'occurrences), quel que soit le nombre de motifs.
+    """
+
+    def __init__(self, patterns: Sequence[str]) -> None:
+        """
+        Construit l'automate (trie des motifs, liens d'échec et sorties).
+        :param patterns: Motifs recherchés, non vides
+        :raise ValueError: si un motif est vide
+        """
+        if any(len(pattern) == 0 for pattern in patterns):
+            raise ValueError("Les motifs recherchés ne peuvent pas être vides.")
+        self.patterns = list(patterns)
+        # Transitions du trie, lien d'échec et indices des motifs reconnus pour chaque état
+        self._transitions: List[Dict[str, int]] = [{}]
+        self._failures: List[int] = [0]
+        self._outputs: List[List[int]] = [[]]
+        for patternIndex, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                nextState = self._transitions[state].get(char)
+                if nextState is None:
+                    nextState = len(self._transitions)
+                    self._transitions[state][char] = nextState
+                    self._transitions.append({})
+                    self._failures.append(0)
+                    self._outputs.append([])
+                state = nextState
+            self._outputs[state].append(patternIndex)
+        self._computeFailures()
+
+    def _computeFailures(self) -> None:
+        """
+        Calcule les liens d'échec par un parcours en largeur du trie et ajoute à chaque état
+        les motifs reconnus par son état d'échec (suffixes).
+        """
+        statesToVisit = deque([0])
+        while statesToVisit:
+            state = statesToVisit.popleft()
+            for char, nextState in self._transitions[state].items():
+                statesToVisit.append(nextState)
+                if state != 0:
+                    # Plus long suffixe propre du chemin vers nextState qui soit aussi un préfixe d'un motif
+                    failure = self._failures[state]
+                    while failure and char not in self._transitions[failure]:
+                        failure = self._failures[failure]
+                    self._failures[nextState] = self._transitions[failure].get(char, 0)
+                self._outputs[nextState] = self._outputs[nextState] + self._outputs[self._failures[nextState]]
+
+    def findAll(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Retourne toutes les occurrences des motifs dans text, y compris celles qui se chevauchent.
+        :return: Liste de couples (position de début, indice du motif), dans l'ordre des positions de fin
+        """
+        transitions, failures, outputs = self._transitions, self._failures, self._outputs
+        patternLengths = [len(pattern) for pattern in self.patterns]
+        matches = []
+        state = 0
+        for position, char in enumerate(text, 1):
+            while state and char not in transitions[state]:
+                state = failures[state]
+            state = transitions[state].get(char, 0)
+            for patternIndex in outputs[state]:
+                matches.append((position - patternLengths[patternIndex], patternIndex))
+        return matches
+
+    def findLeftmostLongest(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Retourne les occurrences des motifs dans text sans chevauchement : de gauche à droite,
+        la plus longue occurrence commençant à chaque position est retenue.
+        Les occurrences sont rangées dans une case par position de début plutôt que triées :
+        le temps reste linéaire en la longueur du texte plus le nombre d'occurrences.
+        :return: Liste de couples (position de début, indice du motif), dans l'ordre des positions
+        """
+        patternLengths = [len(pattern) for pattern in self.patterns]
+        # Plus longue occurrence commençant à chaque position du texte (la première trouvée à longueur égale)
+        longestMatches: List[Optional[Tuple[int, int]]] = [None] * (len(text) + 1)
+        for start, patternIndex in self.findAll(text):
+            longestMatch = longestMatches[start]
+            if longestMatch is None or patternLengths[patternIndex] > patternLengths[longestMatch[1]]:
+                longestMatches[start] = (start, patternIndex)
+        selectedMatches = []
+        position = 0
+        # Parcourt en C les seules positions où commence une occurrence
+        for start, patternIndex in compress(longestMatches, longestMatches):
+            if start >= position:
+                selectedMatches.append((start, patternIndex))
+                position = start + patternLengths[patternIndex]
+        return selectedMatches
+
+
+class PlaceholderReplacer:
+    """
+    Remplacement des champs d'un modèle par un automate d'Aho-Corasick construit une fois par ensemble de clés.
+    Le modèle est parcouru une seule fois par ensemble de clés pour en extraire un plan (segments statiques
+    et clés des champs) ; chaque remplissage avec les mêmes clés ne fait ensuite qu'un ''.join().
+    Les champs peuvent utiliser plusieurs styles de délimiteurs et le modèle peut contenir des champs
+    absents des valeurs fournies, traités selon missingFieldPolicy :
+    - 'leave' : le champ est laissé tel quel,
+    - 'default' : le champ est remplacé par defaultValue,
+    - 'error' : ValueError est levée.
+    """
+
+    missingFieldPolicies = ('leave', 'default', 'error')
+
+    def __init__(self, content: str, delimiters: Sequence[Tuple[str, str]] = (('[---', '---]'),),
+                 missingFieldPolicy: str = 'leave', defaultValue: str = '', maxCachedPlans: int = 64) -> None:
+        """
+        :param content: Contenu du modèle
+        :param delimiters: Couples (délimiteur ouvrant, délimiteur fermant) des champs
+        :param missingFieldPolicy: Traitement des champs du modèle absents des valeurs fournies ('leave', 'default', 'error')
+        :param defaultValue: Valeur des champs absents avec la politique 'default'
+        :param maxCachedPlans: Nombre maximal d'ensembles de clés dont le plan est conservé
+        :raise ValueError: si la politique est inconnue, si aucun délimiteur n'est fourni ou si un délimiteur est vide
+        """
+        if missingFieldPolicy not in self.missingFieldPolicies:
+            raise ValueError(f"La politique des champs absents doit être parmi {', '.join(self.missingFieldPolicies)}.")
+        if len(delimiters) == 0 or any(len(opening) == 0 or len(closing) == 0 for opening, closing in delimiters):
+            raise ValueError("Les délimiteurs des champs ne peuvent pas être vides.")
+        if maxCachedPlans < 1:
+            raise ValueError("La taille du cache doit être strictement positive.")
+        self.content = content
+        self.delimiters = [tuple(delimiter) for delimiter in delimiters]
+        self.missingFieldPolicy = missingFieldPolicy
+        self.defaultValue = defaultValue
+        self.maxCachedPlans = maxCachedPlans
+        # Plans de remplissage par ensemble de clés (ordonné) : segments statiques et extracteur des valeurs
+        self._plans: OrderedDict[Tuple[str, ...], Tuple[List[str], Optional[Callable], Tuple[str, ...]]] = OrderedDict()
+
+    def fillOut(self, fieldValues: Mapping[str, str]) -> str:
+        """
+        Remplace les champs du modèle par les valeurs fournies.
+        :raise ValueError: avec la politique 'error', si un champ du modèle est absent de fieldValues
+        """
+        keys = tuple(fieldValues)
+        plan = self._plans.get(keys)
+        if plan is None:
+            plan = self._storePlan(keys, self._makePlan(keys))
+        segments, valuesGetter, slotKeys = plan
+        if valuesGetter is None:
+            # 0 ou 1 champ dans le plan
+            if len(slotKeys) == 0:
+                return segments[0]
+            return segments[0] + fieldValues[slotKeys[0]] + segments[2]
+        segments = list(segments)
+        segments[1::2] = valuesGetter(fieldValues)
+        return ''.join(segments)
+
+    def findPlaceholders(self) -> List[str]:
+        """
+        Retourne les noms des champs du modèle, tous délimiteurs confondus, dans l'ordre du modèle.
+        """
+        placeholderNames = []
+        position = 0
+        openingAutomaton = AhoCorasick([opening for opening, _ in self.delimiters])
+        for start, delimiterIndex in openingAutomaton.findLeftmostLongest(self.content):
+            placeholder = self._closePlaceholder(start, delimiterIndex) if start >= position else None
+            if placeholder is not None:
+                position, placeholderName = placeholder
+                placeholderNames.append(placeholderName)
+        return placeholderNames
+
+    def _storePlan(self, keys: Tuple[str, ...], plan: tuple) -> tuple:
+        self._plans[keys] = plan
+        if len(self._plans) > self.maxCachedPlans:
+            self._plans.popitem(last=False)
+        return plan
+
+    def _makePlan(self, keys: Tuple[str, ...]) -> Tuple[List[str], Optional[Callable], Tuple[str, ...]]:
+        """
+        Parcourt le modèle avec l'automate des champs keys (dans chaque style de délimiteurs) et, si besoin,
+        des délimiteurs ouvrants pour repérer les champs absents.
+        :return: Segments (statiques aux indices pairs), extracteur des valeurs (None pour 0 ou 1 champ)
+                 et clés des champs dans l'ordre du modèle
+        """
+        patterns = []
+        patternKeys: List[Optional[str]] = []
+        for opening, closing in self.delimiters:
+            for key in keys:
+                patterns.append(f"{opening}{key}{closing}")
+                patternKeys.append(key)
+        openingCount = 0
+        if self.missingFieldPolicy != 'leave':
+            # Les délimiteurs ouvrants non suivis d'une clé connue signalent un champ absent
+            for opening, _ in self.delimiters:
+                patterns.append(opening)
+                patternKeys.append(None)
+            openingCount = len(self.delimiters)
+        automaton = AhoCorasick(patterns)
+
+        segments: List[str] = []
+        slotKeys: List[str] = []
+        staticParts: List[str] = []
+        missingFieldNames: List[str] = []
+        position = 0
+        for start, patternIndex in automaton.findLeftmostLongest(self.content):
+            if start < position:
+                # Délimiteur ouvrant inclus dans un champ absent déjà traité
+                continue
+            key = patternKeys[patternIndex]
+            if key is not None:
+                staticParts.append(self.content[position:start])
+                segments.append(''.join(staticParts))
+                segments.append('')
+                slotKeys.append(key)
+                staticParts = []
+                position = start + len(patterns[patternIndex])
+                continue
+            # Délimiteur ouvrant qui n'est pas celui d'un champ fourni : champ absent
+            placeholder = self._closePlaceholder(start, patternIndex - (len(patterns) - openingCount))
+            if placeholder is None:
+                continue
+            staticParts.append(self.content[position:start])
+            staticParts.append(self.defaultValue)
+            position, missingFieldName = placeholder
+            missingFieldNames.append(missingFieldName)
+        staticParts.append(self.content[position:])
+        segments.append(''.join(staticParts))
+
+        if missingFieldNames and self.missingFieldPolicy == 'error':
+            raise ValueError(f"Les champs suivants sont manquants : {', '.join(missingFieldNames)}")
+        valuesGetter = itemgetter(*slotKeys) if len(slotKeys) > 1 else None
+        return segments, valuesGetter, tuple(slotKeys)
+
+    def _closePlaceholder(self, start: int, delimiterIndex: int) -> Optional[Tuple[int, str]]:
+        """
+        Recherche le délimiteur fermant du champ dont le délimiteur ouvrant commence à start.
+        Comme pour TemplateManager.fieldPattern, le nom du champ est le texte le plus court jusqu'au délimiteur
+        fermant, sur la même ligne.
+        :return: Position de fin du champ et nom du champ, ou None si le délimiteur ouvrant n'est pas celui d'un champ
+        """
+        opening, closing = self.delimiters[delimiterIndex]
+        nameStart = start + len(opening)
+        nameEnd = self.content.find(closing, nameStart)
+        if nameEnd < 0 or '\n' in self.content[nameStart:nameEnd]:
+            return None
+        return nameEnd + len(closing), self.content[nameStart:nameEnd]
+
+
+#=====================================================================================
+# Tests de la classe PlaceholderReplacer
+#=====================================================================================
+import re
+import timeit
+
+
+def _main() -> None:
+    """
+    Compare le remplacement par str.replace(), par regex et par automate d'Aho-Corasick
+    selon le nombre de champs du modèle.
+    """
+    content = "Bonjour [---PRENOM---] {{NOM}}, votre [---INCONNU---] commande {{COMMANDE}} est prête."
+    for policy in PlaceholderReplacer.missingFieldPolicies:
+        replacer = PlaceholderReplacer(content, delimiters=[('[---', '---]'), ('{{', '}}')],
+                                       missingFieldPolicy=policy, defaultValue='?')
+        try:
+            print(f"{policy:8}: {replacer.fillOut({'PRENOM': 'Anne', 'NOM': 'Martin', 'COMMANDE': 'n°42'})}")
+        except ValueError as e:
+            print(f"{policy:8}: Erreur : {e}")
+    print(f"Champs du modèle : {replacer.findPlaceholders()}")
+
+    executionCount = 1000
+    fieldPattern = re.compile(r'\[---(.*?)---\]')
+    for fieldCount in (10, 100, 1000):
+        fieldValues = {f"CHAMP{i}": f"valeur {i}" for i in range(fieldCount)}
+        content = ''.join(f"<p>texte statique {i}</p>[---CHAMP{i}---]\n" for i in range(fieldCount))
+        replacer = PlaceholderReplacer(content)
+
+        def fillOutWithReplace() -> str:
+            result = content
+            for key, value in fieldValues.items():
+                result = result.replace(f"[---{key}---]", value)
+            return result
+
+        def fillOutWithRegex() -> str:
+            return fieldPattern.sub(lambda match: fieldValues.get(match.group(1), match.group(0)), content)
+
+        assert fillOutWithReplace() == fillOutWithRegex() == replacer.fillOut(fieldValues)
+        for name, fillOut in (('str.replace', fillOutWithReplace), ('regex', fillOutWithRegex),
+                              ('Aho-Corasick', lambda: replacer.fillOut(fieldValues))):
+            executionTime = timeit.timeit(fillOut, number=executionCount)
+            print(f"{fieldCount:5} champs, {name:12} : {executionTime * 1e6 / executionCount:9.1f} µs par remplissage")
+        executionTime = timeit.timeit(lambda: PlaceholderReplacer(content).fillOut(fieldValues), number=10)
+        print(f"{fieldCount:5} champs, construction de l'automate et parcours du modèle : {executionTime * 1e6 / 10:9.1f} µs")
+
+
+if __name__ == '__main__':
+    _main()
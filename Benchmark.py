@@ -0,0 +1,341 @@
+# Banc d'essai reproductible des méthodes de remplissage du modèle et de la génération complète du mailing
+
+import argparse
+import csv
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pyexcel_xlsx
+
+from Mailer import Mailer
+from MailingData import MailingData
+from MailingPipeline import MailingPipeline
+from TemplateManager import TemplateManager
+
+
+# Méthodes de remplissage mesurées : nom de la méthode de TemplateManager -> forme des données attendue
+# ('dict' : une ligne sous forme de dictionnaire, 'list' : une ligne sous forme de liste,
+#  'columns' : un lot de lignes sous forme de colonnes)
+FILL_OUT_STRATEGIES: Dict[str, str] = {
+    'fillOut__withRegex': 'dict',
+    'fillOut__withReplace': 'dict',
+    'fillOut__withAhoCorasick': 'dict',
+    'fillOut__withSegmentationAndDict': 'dict',
+    'fillOut__withSegmentationAndList': 'list',
+    'fillOut__withCompiledPlan': 'list',
+    'fillOut__withGeneratedCode': 'list',
+    'fillOut__withBytes': 'list',
+    'fillOut__withSegmentationAndColumns': 'columns',
+    'fillOut__withPresizedBatch': 'columns',
+    'fillOut__withPresizedBytesBatch': 'columns',
+}
+
+# Scénarios par défaut : chaque axe (nombre de champs, longueur des valeurs, taille du texte statique,
+# répétition des champs, nombre de lignes) varie par rapport au scénario de référence du README
+DEFAULT_SCENARIOS: List[Dict[str, int]] = [
+    {'fieldCount': 3, 'valueLength': 13, 'staticLength': 150, 'repeatCount': 1, 'rowCount': 10000},
+    {'fieldCount': 10, 'valueLength': 96, 'staticLength': 500, 'repeatCount': 1, 'rowCount': 10000},
+    {'fieldCount': 50, 'valueLength': 20, 'staticLength': 2000, 'repeatCount': 1, 'rowCount': 10000},
+    {'fieldCount': 10, 'valueLength': 20, 'staticLength': 50000, 'repeatCount': 1, 'rowCount': 2000},
+    {'fieldCount': 10, 'valueLength': 20, 'staticLength': 2000, 'repeatCount': 5, 'rowCount': 10000},
+    {'fieldCount': 10, 'valueLength': 20, 'staticLength': 500, 'repeatCount': 1, 'rowCount': 100000},
+]
+
+# Nombre de lignes par lot pour les méthodes par colonnes
+BATCH_SIZE = 1000
+
+
+def scenarioName(scenario: Dict[str, int]) -> str:
+    """
+    Retourne un nom stable du scénario, utilisé pour comparer deux fichiers de résultats.
+    """
+    return (f"f{scenario['fieldCount']}-v{scenario['valueLength']}-s{scenario['staticLength']}"
+            f"-r{scenario['repeatCount']}-n{scenario['rowCount']}")
+
+
+def generateTemplate(scenario: Dict[str, int], seed: int = 0) -> str:
+    """
+    Génère un modèle HTML contenant fieldCount champs, chacun présent repeatCount fois dans un ordre
+    aléatoire reproductible, séparés par du texte statique (avec accents) d'environ staticLength caractères au total.
+    """
+    randomGenerator = random.Random(seed)
+    fieldNames = [f"CHAMP{i}" for i in range(1, scenario['fieldCount'] + 1)]
+    fieldSlots = fieldNames * scenario['repeatCount']
+    randomGenerator.shuffle(fieldSlots)
+    words = ['texte', 'statique', 'élément', 'modèle', 'à', 'déjà', 'mailing', 'bonjour', 'offre']
+    staticLengthPerSegment = max(1, scenario['staticLength'] // (len(fieldSlots) + 1))
+
+    def staticSegment() -> str:
+        segment = ''
+        while len(segment) < staticLengthPerSegment:
+            segment += randomGenerator.choice(words) + ' '
+        return f"<p>{segment[:staticLengthPerSegment]}</p>"
+
+    return ''.join(staticSegment() + f"<b>[---{fieldName}---]</b>\n" for fieldName in fieldSlots) + staticSegment()
+
+
+def generateRows(scenario: Dict[str, int], seed: int = 0) -> Tuple[List[str], List[List[str]]]:
+    """
+    Génère l'en-tête et les lignes de données (hors colonnes des destinataires) du scénario.
+    Chaque colonne comporte au plus 100 valeurs distinctes de valueLength caractères.
+    """
+    randomGenerator = random.Random(seed)
+    fieldNames = [f"CHAMP{i}" for i in range(1, scenario['fieldCount'] + 1)]
+    valueLength = scenario['valueLength']
+    distinctValues = [[(f"{fieldName} valeur {i} " + 'x' * valueLength)[:valueLength] for i in range(100)]
+                      for fieldName in fieldNames]
+    rows = [[randomGenerator.choice(values) for values in distinctValues] for _ in range(scenario['rowCount'])]
+    return fieldNames, rows
+
+
+def writeDataFiles(directory: Path, fieldNames: List[str], rows: List[List[str]]) -> Tuple[Path, Path]:
+    """
+    Écrit les données au format xlsx et CSV, avec les colonnes DESTINATAIRES et DESTINATAIRES_COPIE.
+    :return: Chemins des fichiers xlsx et CSV
+    """
+    header = ['DESTINATAIRES', 'DESTINATAIRES_COPIE'] + fieldNames
+    sheet = [header] + [[f"destinataire{i}@example.com", ''] + row for i, row in enumerate(rows)]
+    xlsxFile = directory / 'data.xlsx'
+    pyexcel_xlsx.save_data(str(xlsxFile), {'Feuil1': sheet})
+    csvFile = directory / 'data.csv'
+    with open(csvFile, 'w', encoding='utf-8', newline='') as output:
+        csv.writer(output).writerows(sheet)
+    return xlsxFile, csvFile
+
+
+def _percentile(sortedValues: List[float], percent: float) -> float:
+    """
+    Retourne le percentile (méthode du rang le plus proche) d'une liste triée.
+    """
+    index = max(0, min(len(sortedValues) - 1, int(round(percent / 100 * len(sortedValues) + 0.5)) - 1))
+    return sortedValues[index]
+
+
+def _measure(calls: List[Callable[[], Any]], rowsPerCall: List[int]) -> Dict[str, Any]:
+    """
+    Exécute chaque appel en mesurant sa durée, puis une seconde fois sous tracemalloc pour le pic mémoire.
+    :return: Débit, latences par appel (en microsecondes) et pic mémoire (en octets)
+    """
+    latencies = []
+    start = time.perf_counter()
+    for call in calls:
+        callStart = time.perf_counter_ns()
+        call()
+        latencies.append((time.perf_counter_ns() - callStart) / 1000)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    for call in calls:
+        call()
+    _, peakMemory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    rowCount = sum(rowsPerCall)
+    return {
+        'rows': rowCount,
+        'rowsPerCall': rowsPerCall[0] if rowsPerCall else 0,
+        'seconds': seconds,
+        'rowsPerSecond': rowCount / seconds if seconds > 0 else 0.0,
+        'latencyMicroseconds': {f"p{percent}": _percentile(latencies, percent) for percent in (50, 90, 99)},
+        'peakMemoryBytes': peakMemory,
+    }
+
+
+def benchmarkFillOutStrategies(template: TemplateManager, fieldNames: List[str],
+                               rows: List[List[str]], strategies: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Mesure chaque méthode de remplissage du modèle sur les mêmes lignes de données.
+    """
+    dictRows = [dict(zip(fieldNames, row)) for row in rows]
+    batches = [[[row[i] for row in rows[start:start + BATCH_SIZE]] for i in range(len(fieldNames))]
+               for start in range(0, len(rows), BATCH_SIZE)]
+    results = {}
+    for strategy in strategies:
+        fillOut = getattr(template, strategy)
+        inputKind = FILL_OUT_STRATEGIES[strategy]
+        if inputKind == 'columns':
+            calls = [lambda batch=batch: fillOut(batch) for batch in batches]
+            rowsPerCall = [len(batch[0]) if batch else 0 for batch in batches]
+        else:
+            inputs = dictRows if inputKind == 'dict' else rows
+            calls = [lambda fieldValues=fieldValues: fillOut(fieldValues) for fieldValues in inputs]
+            rowsPerCall = [1] * len(inputs)
+        results[strategy] = _measure(calls, rowsPerCall)
+    return results
+
+
+def _generateMailingWithList(dataFile: Path, templateFile: Path, outputFile: Path) -> None:
+    """
+    Génération complète ligne par ligne : MailingData -> fillOut__withCompiledPlan -> Mailer.addMailing.
+    """
+    data = MailingData(dataFile)
+    template = TemplateManager(htmlFile=templateFile, providedFieldNames=data.fieldNames)
+    with Mailer(outputFile) as mailer:
+        for fieldValues in data.nextFieldsValueAsList():
+            mailer.addMailing(template.fillOut__withCompiledPlan(fieldValues))
+
+
+def _generateMailingWithBytesBatches(dataFile: Path, templateFile: Path, outputFile: Path) -> None:
+    """
+    Génération complète par lots : MailingData -> fillOut__withPresizedBytesBatch -> Mailer.addJoinedMailingsBytes.
+    """
+    data = MailingData(dataFile)
+    template = TemplateManager(htmlFile=templateFile, providedFieldNames=data.fieldNames)
+    with Mailer(outputFile) as mailer:
+        for rowCount, fieldColumns in data.nextFieldValuesAsColumns(batchSize=BATCH_SIZE):
+            mailer.addJoinedMailingsBytes(template.fillOut__withPresizedBytesBatch(fieldColumns, Mailer.separatorBytes,
+                                                                                   rowCount), rowCount)
+
+
+def _generateMailingWithPipeline(dataFile: Path, templateFile: Path, outputFile: Path) -> None:
+    """
+    Génération complète par lots dont la lecture, le remplissage et l'écriture se chevauchent (MailingPipeline).
+    """
+    data = MailingData(dataFile)
+    template = TemplateManager(htmlFile=templateFile, providedFieldNames=data.fieldNames)
+    with Mailer(outputFile) as mailer:
+        MailingPipeline(template, batchSize=BATCH_SIZE).run(data, mailer)
+
+
+# Générations complètes mesurées, du fichier de données au fichier de sortie
+END_TO_END_RUNS: Dict[str, Callable[[Path, Path, Path], None]] = {
+    'endToEnd__withList': _generateMailingWithList,
+    'endToEnd__withBytesBatches': _generateMailingWithBytesBatches,
+    'endToEnd__withPipeline': _generateMailingWithPipeline,
+}
+
+
+def benchmarkEndToEnd(dataFile: Path, templateFile: Path, outputFile: Path, rowCount: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Mesure chaque génération complète du mailing (lecture, remplissage et écriture).
+    """
+    return {name: _measure([lambda run=run: run(dataFile, templateFile, outputFile)], [rowCount])
+            for name, run in END_TO_END_RUNS.items()}
+
+
+def runBenchmarks(scenarios: List[Dict[str, int]], strategies: List[str], endToEnd: bool = True) -> Dict[str, Any]:
+    """
+    Exécute le banc d'essai pour chaque scénario et retourne les résultats sérialisables en JSON.
+    """
+    results = []
+    for scenario in scenarios:
+        name = scenarioName(scenario)
+        print(f"Scénario {name}", file=sys.stderr)
+        fieldNames, rows = generateRows(scenario)
+        with tempfile.TemporaryDirectory() as tmpDir:
+            templateFile = Path(tmpDir) / 'template.html'
+            templateFile.write_text(generateTemplate(scenario), encoding='utf-8')
+            template = TemplateManager(htmlFile=templateFile, providedFieldNames=fieldNames)
+            measures = benchmarkFillOutStrategies(template, fieldNames, rows, strategies)
+            if endToEnd:
+                xlsxFile, csvFile = writeDataFiles(Path(tmpDir), fieldNames, rows)
+                # Les mesures depuis le fichier xlsx gardent leur nom d'origine, pour rester comparables
+                # aux résultats antérieurs ; celles depuis le fichier CSV sont suffixées par __csv
+                measures.update(benchmarkEndToEnd(xlsxFile, templateFile, Path(tmpDir) / 'output.html', len(rows)))
+                endToEndMeasures = benchmarkEndToEnd(csvFile, templateFile, Path(tmpDir) / 'output.html', len(rows))
+                measures.update({f"{name}__csv": measure for name, measure in endToEndMeasures.items()})
+        for strategy, measure in measures.items():
+            results.append({'scenario': name, **scenario, 'strategy': strategy, **measure})
+    return {'metadata': _metadata(), 'results': results}
+
+
+def _metadata() -> Dict[str, Any]:
+    """
+    Décrit l'environnement d'exécution pour pouvoir comparer des résultats entre commits.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'date': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': sys.version,
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+    }
+
+
+def compareResults(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """
+    Compare le débit de chaque couple (scénario, méthode) présent dans les deux résultats,
+    puis signale les couples absents de l'un des deux résultats, qui ne sont pas comparés.
+    :param threshold: Baisse relative de débit au-delà de laquelle une régression est signalée
+    :return: Liste des régressions détectées
+    """
+    baselineThroughputs = {(result['scenario'], result['strategy']): result['rowsPerSecond']
+                           for result in baseline['results']}
+    currentKeys = {(result['scenario'], result['strategy']) for result in current['results']}
+    regressions = []
+    for result in current['results']:
+        key = (result['scenario'], result['strategy'])
+        if key not in baselineThroughputs or baselineThroughputs[key] == 0:
+            continue
+        ratio = result['rowsPerSecond'] / baselineThroughputs[key]
+        marker = ''
+        if ratio < 1 - threshold:
+            marker = '  <-- régression'
+            regressions.append(f"{key[0]} {key[1]} : x{ratio:.2f}")
+        print(f"{key[0]:<28} {key[1]:<40} x{ratio:.2f}{marker}")
+    for key in sorted(baselineThroughputs.keys() - currentKeys):
+        print(f"{key[0]:<28} {key[1]:<40} absent des résultats courants")
+    for key in sorted(currentKeys - baselineThroughputs.keys()):
+        print(f"{key[0]:<28} {key[1]:<40} absent des résultats de référence")
+    return regressions
+
+
+def printResults(benchmarkResults: Dict[str, Any]) -> None:
+    """
+    Affiche les résultats sous forme de tableau.
+    """
+    print(f"{'Scénario':<28} {'Méthode':<40} {'lignes/s':>12} {'p50 µs':>10} {'p99 µs':>10} {'pic Mo':>8}")
+    for result in benchmarkResults['results']:
+        latency = result['latencyMicroseconds']
+        print(f"{result['scenario']:<28} {result['strategy']:<40} {result['rowsPerSecond']:>12,.0f} "
+              f"{latency['p50']:>10.1f} {latency['p99']:>10.1f} {result['peakMemoryBytes'] / 1e6:>8.1f}")
+
+
+def main() -> None:
+    """
+    Point d'entrée en ligne de commande du banc d'essai.
+    """
+    parser = argparse.ArgumentParser(description="Banc d'essai des méthodes de remplissage du modèle de mail.")
+    parser.add_argument('--output', type=Path, help="Fichier JSON dans lequel enregistrer les résultats")
+    parser.add_argument('--compare', type=Path, help="Fichier JSON de résultats de référence à comparer")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Baisse relative de débit signalée comme régression (défaut : 0.10)")
+    parser.add_argument('--strategies', nargs='+', choices=list(FILL_OUT_STRATEGIES), default=list(FILL_OUT_STRATEGIES),
+                        help="Méthodes de remplissage à mesurer")
+    parser.add_argument('--row-scale', type=float, default=1.0,
+                        help="Facteur appliqué au nombre de lignes de chaque scénario")
+    parser.add_argument('--no-end-to-end', action='store_true', help="Ne mesure pas la génération complète")
+    args = parser.parse_args()
+
+    scenarios = [{**scenario, 'rowCount': max(1, int(scenario['rowCount'] * args.row_scale))}
+                 for scenario in DEFAULT_SCENARIOS]
+    benchmarkResults = runBenchmarks(scenarios, args.strategies, endToEnd=not args.no_end_to_end)
+    printResults(benchmarkResults)
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(benchmarkResults, indent=2), encoding='utf-8')
+    if args.compare is not None:
+        regressions = compareResults(json.loads(args.compare.read_text(encoding='utf-8')), benchmarkResults,
+                                     args.threshold)
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
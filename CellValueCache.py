@@ -0,0 +1,99 @@
+from functools import lru_cache
+import html
+from typing import Any
+
+
+class CellValueCache:
+    """
+    Cache LRU borné de conversion des valeurs de cellules en str (et optionnellement d'échappement HTML).
+    Chaque valeur distincte n'est convertie qu'une fois et la même chaîne est réutilisée pour toutes
+    ses occurrences, ce qui réduit le temps de conversion et la mémoire des lignes conservées
+    lorsque les colonnes contiennent peu de valeurs distinctes.
+    Le gain de temps est surtout sensible avec l'échappement HTML ou pour les cellules non textuelles
+    (nombres, dates) : pour une cellule déjà de type str, str() ne fait aucune copie.
+    Les compteurs hits, misses et hitRate permettent d'ajuster maxSize.
+    """
+
+    def __init__(self, maxSize: int = 65536, escapeHtml: bool = False) -> None:
+        """
+        :param maxSize: Nombre maximal de valeurs distinctes conservées
+        :param escapeHtml: Si True, les valeurs converties sont échappées pour être insérées dans du HTML
+        :raise ValueError: si maxSize n'est pas strictement positif
+        """
+        if maxSize < 1:
+            raise ValueError("La taille du cache doit être strictement positive.")
+        self.maxSize = maxSize
+        self.escapeHtml = escapeHtml
+        # typed=True distingue 1, 1.0 et True, dont les conversions en str diffèrent
+        self.convert = lru_cache(maxsize=maxSize, typed=True)(self._escapedStr if escapeHtml else str)
+
+    @staticmethod
+    def _escapedStr(value: Any) -> str:
+        """
+        Convertit une valeur en str échappée pour le HTML (&, <, >, " et ').
+        """
+        return html.escape(str(value))
+
+    @property
+    def hits(self) -> int:
+        """
+        Nombre de conversions servies par le cache.
+        """
+        return self.convert.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        """
+        Nombre de conversions effectivement calculées.
+        """
+        return self.convert.cache_info().misses
+
+    @property
+    def size(self) -> int:
+        """
+        Nombre de valeurs distinctes actuellement conservées.
+        """
+        return self.convert.cache_info().currsize
+
+    @property
+    def hitRate(self) -> float:
+        """
+        Proportion des conversions servies par le cache (0.0 si aucune conversion).
+        """
+        cacheInfo = self.convert.cache_info()
+        total = cacheInfo.hits + cacheInfo.misses
+        return cacheInfo.hits / total if total > 0 else 0.0
+
+    def clear(self) -> None:
+        """
+        Vide le cache et remet les compteurs à zéro.
+        """
+        self.convert.cache_clear()
+
+
+#=====================================================================================
+# Tests de la classe CellValueCache
+#=====================================================================================
+import timeit
+
+
+def _main() -> None:
+    """
+    Compare la conversion directe et la conversion avec cache sur une colonne à faible cardinalité.
+    """
+    executionCount = 100
+    cellValues = [f"Société n°{i % 50} & associés" for i in range(100000)]
+
+    executionTime = timeit.timeit(lambda: [str(value) for value in cellValues], number=executionCount)
+    print(f"str : {executionTime:.2f} secondes")
+    executionTime = timeit.timeit(lambda: [html.escape(str(value)) for value in cellValues], number=executionCount)
+    print(f"str + html.escape : {executionTime:.2f} secondes")
+
+    cache = CellValueCache(maxSize=1024, escapeHtml=True)
+    executionTime = timeit.timeit(lambda: list(map(cache.convert, cellValues)), number=executionCount)
+    print(f"CellValueCache (échappement HTML) : {executionTime:.2f} secondes, "
+          f"taux de succès {cache.hitRate:.2%}, {cache.size} valeurs distinctes")
+
+
+if __name__ == '__main__':
+    _main()
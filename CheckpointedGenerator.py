@@ -0,0 +1,454 @@
+from array import array
+import hashlib
+from itertools import accumulate
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from Mailer import Mailer
+from MailingData import MailingData
+from TemplateManager import TemplateManager
+
+
+class CheckpointedGenerator:
+    """
+    Classe pour générer un mailing avec des points de reprise et pour le régénérer de façon incrémentale.
+    À côté du fichier de sortie sont conservés :
+    - <sortie>.checkpoint : état JSON de la génération (empreinte du modèle, champs, description du fichier
+      de données, nombre de lignes validées, position de la fin de leurs contenus dans la sortie, fin de la génération),
+    - <sortie>.rows : pour chaque ligne validée, l'empreinte de ses valeurs (BLAKE2b sur 8 octets) et la position
+      de son contenu dans la sortie, sous forme de 2 entiers de 8 octets.
+
+    Modes de génération (cf. generate()) :
+    - 'full' : génération complète, avec un point de reprise toutes les checkpointEvery lignes,
+    - 'resume' : reprise d'une génération interrompue : le fichier de sortie est conservé jusqu'au dernier point
+      de reprise, les lignes déjà produites sont lues mais ni converties ni remplies, et la génération continue,
+    - 'incremental' : régénération après modification du fichier de données : seules les lignes dont l'empreinte
+      a changé sont remplies, les contenus des autres sont recopiés par plages contiguës depuis l'ancienne sortie.
+      Les lignes sont comparées à position égale : une ligne insérée ou supprimée fait remplir toutes les suivantes.
+      La nouvelle sortie est écrite dans un fichier temporaire qui ne remplace l'ancienne qu'à la fin :
+      une régénération interrompue laisse l'ancienne sortie et son état intacts,
+    - 'auto' : reprise si une génération a été interrompue et que le fichier de données n'a pas changé depuis,
+      régénération incrémentale si une génération compatible existe, génération complète sinon.
+    """
+
+    modes = ('auto', 'full', 'resume', 'incremental')
+
+    stateSuffix = '.checkpoint'
+    rowsSuffix = '.rows'
+    stateVersion = 1
+
+    # Taille d'un enregistrement du fichier <sortie>.rows : empreinte et position du contenu
+    _rowRecordSize = 2 * array('q').itemsize
+
+    # Taille à partir de laquelle une plage de contenus recopiés l'est par Mailer.addJoinedMailingsFromFile()
+    # plutôt qu'à travers le tampon d'écriture (qui doit être vidé avant chaque copie de fichier à fichier)
+    _minFileCopyLength = 256 * 1024
+
+    def __init__(self, template: TemplateManager, batchSize: int = 1000, checkpointEvery: int = 10000,
+                 durable: bool = True) -> None:
+        """
+        :param template: Modèle à remplir, construit avec les fieldNames des données
+        :param batchSize: Nombre de lignes lues et remplies par lot
+        :param checkpointEvery: Nombre de lignes après lequel un point de reprise est enregistré
+                                (à la fin du lot qui atteint ce nombre)
+        :param durable: Si True, la sortie est écrite sur le support (os.fsync) avant chaque point de reprise
+        :raise ValueError: si batchSize ou checkpointEvery n'est pas strictement positif
+        """
+        if batchSize < 1:
+            raise ValueError("La taille des lots doit être strictement positive.")
+        if checkpointEvery < 1:
+            raise ValueError("L'intervalle entre deux points de reprise doit être strictement positif.")
+        self.template = template
+        self.batchSize = batchSize
+        self.checkpointEvery = checkpointEvery
+        self.durable = durable
+        # Bilan de la dernière génération
+        self.mode: Optional[str] = None
+        self.renderedCount = 0
+        self.reusedCount = 0
+        self.skippedCount = 0
+
+    def generate(self, data: MailingData, outputFile: Path, mode: str = 'auto') -> int:
+        """
+        Génère le mailing de data dans outputFile selon le mode demandé (cf. CheckpointedGenerator).
+        Le mode effectivement utilisé est disponible dans l'attribut mode, et les nombres de contenus remplis,
+        recopiés de l'ancienne sortie et déjà produits avant une interruption dans renderedCount, reusedCount
+        et skippedCount.
+        :return: Nombre de contenus du fichier de sortie
+        :raise ValueError: si le mode est inconnu, ou si le mode 'resume' ou 'incremental' est demandé
+                           sans génération précédente compatible
+        """
+        if mode not in self.modes:
+            raise ValueError(f"Mode de génération inconnu : {mode} (modes acceptés : {', '.join(self.modes)}).")
+        state = self._loadState(data, outputFile)
+        sameSource = state is not None and state['source'] == self._describe(data.dataFile)
+
+        if mode == 'auto':
+            if state is None:
+                mode = 'full'
+            elif not state['complete'] and sameSource:
+                mode = 'resume'
+            else:
+                mode = 'incremental'
+        elif mode == 'resume':
+            if state is None:
+                raise ValueError(f"Aucune génération compatible à reprendre pour {outputFile}.")
+            if not sameSource:
+                raise ValueError(f"Le fichier de données a changé depuis l'interruption de la génération de {outputFile} : "
+                                 "utiliser le mode 'incremental'.")
+        elif mode == 'incremental' and state is None:
+            raise ValueError(f"Aucune génération compatible à mettre à jour pour {outputFile}.")
+
+        self.mode = mode
+        self.renderedCount = self.reusedCount = self.skippedCount = 0
+        if mode == 'incremental':
+            if state['complete'] and sameSource:
+                # Ni le modèle ni les données n'ont changé : la sortie est à jour
+                self.reusedCount = state['committedRows']
+                return state['committedRows']
+            return self._generateIncrementally(data, outputFile, state)
+        return self._generate(data, outputFile, state if mode == 'resume' else None)
+
+    def _generate(self, data: MailingData, outputFile: Path, state: Optional[Dict[str, Any]]) -> int:
+        """
+        Génère le mailing depuis le début (state None) ou depuis le dernier point de reprise de state,
+        en enregistrant un point de reprise toutes les checkpointEvery lignes.
+        """
+        startRow = 0 if state is None else state['committedRows']
+        resumeOffset = None if state is None else state['outputOffset']
+        self.skippedCount = startRow
+        newState = self._newState(data, startRow, len(Mailer.htmlHeader) if resumeOffset is None else resumeOffset)
+        with Mailer(outputFile, resumeOffset=resumeOffset) as mailer, \
+                open(self._rowsFile(outputFile), 'wb' if state is None else 'r+b') as rows:
+            # Supprime les enregistrements des lignes écrites après le dernier point de reprise
+            rows.truncate(startRow * self._rowRecordSize)
+            rows.seek(startRow * self._rowRecordSize)
+            self._writeState(outputFile, newState)
+
+            rowNumber = startRow
+            position = newState['outputOffset']
+            uncommittedCount = 0
+            for rowCount, fieldColumns in data.nextFieldValuesAsColumns(batchSize=self.batchSize, startRow=startRow):
+                joinedContents, contentLengths = self.template.fillOut__withPresizedBytesBatchAndLengths(
+                    fieldColumns, Mailer.separatorBytes, rowCount)
+                mailer.addJoinedMailingsBytes(joinedContents, rowCount)
+                rowRecords = array('q')
+                for rowHash, contentStart in zip(self._hashRows(fieldColumns, rowCount),
+                                                 self._contentStarts(contentLengths)):
+                    rowRecords.append(rowHash)
+                    rowRecords.append(position + contentStart)
+                rows.write(rowRecords.tobytes())
+                position += len(joinedContents)
+                rowNumber += rowCount
+                self.renderedCount += rowCount
+                uncommittedCount += rowCount
+                if uncommittedCount >= self.checkpointEvery:
+                    self._checkpoint(outputFile, mailer, rows, newState, rowNumber)
+                    uncommittedCount = 0
+            self._checkpoint(outputFile, mailer, rows, newState, rowNumber)
+        self._completeState(outputFile, newState)
+        return rowNumber
+
+    def _generateIncrementally(self, data: MailingData, outputFile: Path, state: Dict[str, Any]) -> int:
+        """
+        Régénère le mailing dans un fichier temporaire en ne remplissant que les lignes dont l'empreinte diffère
+        de celle de la ligne de même numéro dans la génération précédente, puis remplace l'ancienne sortie.
+        """
+        oldRowCount = state['committedRows']
+        oldRecords = array('q')
+        with open(self._rowsFile(outputFile), 'rb') as oldRows:
+            oldRecords.frombytes(oldRows.read(oldRowCount * self._rowRecordSize))
+        oldHashes = oldRecords[0::2]
+        # Position du contenu de chaque ligne, suivie de la fin du contenu de la dernière ligne validée
+        oldStarts = oldRecords[1::2]
+        oldStarts.append(state['outputOffset'])
+
+        temporaryOutputFile = outputFile.with_name(f"{outputFile.name}.{os.getpid()}.tmp")
+        temporaryRowsFile = self._rowsFile(temporaryOutputFile)
+        newState = self._newState(data, 0, len(Mailer.htmlHeader))
+        separator = Mailer.separatorBytes
+        try:
+            with open(outputFile, 'rb') as oldOutput, \
+                    mmap.mmap(oldOutput.fileno(), 0, access=mmap.ACCESS_READ) as oldContents, \
+                    memoryview(oldContents) as oldView, \
+                    Mailer(temporaryOutputFile) as mailer, \
+                    open(temporaryRowsFile, 'wb') as rows:
+                rowNumber = 0
+                position = len(Mailer.htmlHeader)
+                for rowCount, fieldColumns in data.nextFieldValuesAsColumns(batchSize=self.batchSize):
+                    rowHashes = self._hashRows(fieldColumns, rowCount)
+                    reused = [rowNumber + i < oldRowCount and oldHashes[rowNumber + i] == rowHash
+                              for i, rowHash in enumerate(rowHashes)]
+                    # Remplit en un seul lot les lignes modifiées
+                    changedRows = [i for i in range(rowCount) if not reused[i]]
+                    if len(changedRows) == rowCount:
+                        changedColumns = fieldColumns
+                    else:
+                        changedColumns = [[column[i] for i in changedRows] for column in fieldColumns]
+                    joinedContents, renderedLengths = (
+                        self.template.fillOut__withPresizedBytesBatchAndLengths(changedColumns, separator,
+                                                                                 len(changedRows))
+                        if len(changedRows) > 0 else (b'', []))
+                    renderedStarts = self._contentStarts(renderedLengths)
+                    renderedView = memoryview(joinedContents)
+
+                    # Écrit les plages contiguës de contenus recopiés ou remplis, dans l'ordre des lignes
+                    rowRecords = array('q')
+                    renderedIndex = 0
+                    i = 0
+                    while i < rowCount:
+                        runStart = i
+                        isReused = reused[i]
+                        while i < rowCount and reused[i] == isReused:
+                            i += 1
+                        if isReused:
+                            starts = oldStarts[rowNumber + runStart:rowNumber + i + 1]
+                            if starts[-1] - starts[0] >= self._minFileCopyLength:
+                                mailer.addJoinedMailingsFromFile(oldOutput, starts[0], starts[-1] - starts[0])
+                            else:
+                                with oldView[starts[0]:starts[-1]] as span:
+                                    mailer.addJoinedMailingsBytes(span, i - runStart)
+                            self.reusedCount += i - runStart
+                        else:
+                            starts = renderedStarts[renderedIndex:renderedIndex + i - runStart + 1]
+                            with renderedView[starts[0]:starts[-1]] as span:
+                                mailer.addJoinedMailingsBytes(span, i - runStart)
+                            renderedIndex += i - runStart
+                            self.renderedCount += i - runStart
+                        for rowHash, contentStart in zip(rowHashes[runStart:i], starts):
+                            rowRecords.append(rowHash)
+                            rowRecords.append(position + contentStart - starts[0])
+                        position += starts[-1] - starts[0]
+                    renderedView.release()
+                    rows.write(rowRecords.tobytes())
+                    rowNumber += rowCount
+                self._checkpoint(temporaryOutputFile, mailer, rows, newState, rowNumber, writeState=False)
+
+            # L'état est supprimé avant le remplacement des fichiers : une interruption entre les deux
+            # entraîne une génération complète plutôt que l'utilisation d'un état incohérent
+            self._stateFile(outputFile).unlink(missing_ok=True)
+            os.replace(temporaryOutputFile, outputFile)
+            os.replace(temporaryRowsFile, self._rowsFile(outputFile))
+        finally:
+            temporaryOutputFile.unlink(missing_ok=True)
+            temporaryRowsFile.unlink(missing_ok=True)
+        self._completeState(outputFile, newState)
+        return rowNumber
+
+    def _checkpoint(self, outputFile: Path, mailer: Mailer, rows: BinaryIO, state: Dict[str, Any], rowNumber: int,
+                    writeState: bool = True) -> None:
+        """
+        Enregistre un point de reprise : la sortie et les enregistrements des lignes sont écrits sur le disque
+        avant l'état qui les valide.
+        """
+        outputOffset = mailer.flush(durable=self.durable)
+        rows.flush()
+        if self.durable:
+            os.fsync(rows.fileno())
+        state['committedRows'] = rowNumber
+        state['outputOffset'] = outputOffset
+        if writeState:
+            self._writeState(outputFile, state)
+
+    def _completeState(self, outputFile: Path, state: Dict[str, Any]) -> None:
+        """
+        Enregistre la fin de la génération, après la fermeture du fichier de sortie.
+        """
+        state['complete'] = True
+        state['outputSize'] = state['outputOffset'] + len(Mailer.htmlFooter)
+        self._writeState(outputFile, state)
+
+    def _newState(self, data: MailingData, committedRows: int, outputOffset: int) -> Dict[str, Any]:
+        return {
+            'version': self.stateVersion,
+            'template': self.template.fingerprint,
+            'fieldNames': data.fieldNames,
+            'source': self._describe(data.dataFile),
+            'committedRows': committedRows,
+            'outputOffset': outputOffset,
+            'complete': False,
+        }
+
+    def _loadState(self, data: MailingData, outputFile: Path) -> Optional[Dict[str, Any]]:
+        """
+        Lit l'état de la génération précédente de outputFile.
+        :return: L'état, ou None s'il est absent, illisible, produit par un autre modèle ou d'autres champs,
+                 ou si le fichier de sortie ou celui des empreintes ne lui correspondent pas
+        """
+        try:
+            state = json.loads(self._stateFile(outputFile).read_text(encoding='utf-8'))
+            outputSize = outputFile.stat().st_size
+            rowsSize = self._rowsFile(outputFile).stat().st_size
+        except (OSError, ValueError):
+            return None
+        if (not isinstance(state, dict) or state.get('version') != self.stateVersion or
+                state.get('template') != self.template.fingerprint or state.get('fieldNames') != data.fieldNames):
+            return None
+        if rowsSize < state['committedRows'] * self._rowRecordSize or outputSize < state['outputOffset']:
+            return None
+        if state['complete'] and outputSize != state['outputSize']:
+            return None
+        return state
+
+    def _writeState(self, outputFile: Path, state: Dict[str, Any]) -> None:
+        """
+        Écrit l'état de façon atomique (fichier temporaire renommé).
+        """
+        stateFile = self._stateFile(outputFile)
+        temporaryFile = stateFile.with_name(f"{stateFile.name}.{os.getpid()}.tmp")
+        with open(temporaryFile, 'w', encoding='utf-8') as output:
+            json.dump(state, output)
+            if self.durable:
+                output.flush()
+                os.fsync(output.fileno())
+        os.replace(temporaryFile, stateFile)
+
+    def _stateFile(self, outputFile: Path) -> Path:
+        return outputFile.with_name(outputFile.name + self.stateSuffix)
+
+    def _rowsFile(self, outputFile: Path) -> Path:
+        return outputFile.with_name(outputFile.name + self.rowsSuffix)
+
+    @staticmethod
+    def _describe(dataFile: Path) -> Dict[str, Any]:
+        """
+        Décrit l'état du fichier de données pour détecter sa modification depuis la génération précédente.
+        """
+        fileStat = dataFile.stat()
+        return {'path': str(dataFile.resolve()), 'size': fileStat.st_size, 'mtime': fileStat.st_mtime_ns}
+
+    @staticmethod
+    def _contentStarts(contentLengths: List[int]) -> List[int]:
+        """
+        Retourne la position de début de chaque contenu d'un bloc de contenus suivis chacun de Mailer.separatorBytes,
+        suivie de la fin du bloc. Les positions sont calculées d'après les longueurs des contenus
+        (cf. TemplateManager.fillOut__withPresizedBytesBatchAndLengths()) et non en recherchant le séparateur,
+        qui peut aussi apparaître dans le modèle ou dans les valeurs des champs.
+        """
+        separatorLength = len(Mailer.separatorBytes)
+        return list(accumulate((contentLength + separatorLength for contentLength in contentLengths), initial=0))
+
+    @staticmethod
+    def _hashRows(fieldColumns: List[List[str]], rowCount: int) -> List[int]:
+        """
+        Retourne l'empreinte BLAKE2b sur 8 octets (entier signé) des valeurs de chaque ligne d'un lot de rowCount lignes
+        fourni sous forme de colonnes (les lignes d'un lot sans colonne ont toutes l'empreinte de la ligne vide).
+        """
+        blake2b = hashlib.blake2b
+        fromBytes = int.from_bytes
+        rowValues = zip(*fieldColumns) if len(fieldColumns) > 0 else [()] * rowCount
+        return [fromBytes(blake2b('\0'.join(fieldValues).encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+                for fieldValues in rowValues]
+
+
+#=====================================================================================
+# Tests de la classe CheckpointedGenerator
+#=====================================================================================
+import csv
+import tempfile
+import time
+
+
+class _SimulatedCrash(Exception):
+    pass
+
+
+def _main() -> None:
+    """
+    Interrompt une génération volumineuse, la reprend, puis modifie quelques lignes du fichier de données
+    et compare le temps de la régénération incrémentale à celui d'une génération complète.
+    """
+    from Benchmark import generateRows, generateTemplate, writeDataFiles
+
+    scenario = {'fieldCount': 10, 'valueLength': 20, 'staticLength': 2000, 'repeatCount': 1, 'rowCount': 200000}
+    fieldNames, rows = generateRows(scenario)
+    with tempfile.TemporaryDirectory() as tmpDir:
+        templateFile = Path(tmpDir) / 'template.html'
+        templateFile.write_text(generateTemplate(scenario), encoding='utf-8')
+        _, csvFile = writeDataFiles(Path(tmpDir), fieldNames, rows)
+        data = MailingData(csvFile)
+        template = TemplateManager(htmlFile=templateFile, providedFieldNames=data.fieldNames)
+        referenceFile = Path(tmpDir) / 'reference.html'
+        outputFile = Path(tmpDir) / 'output.html'
+
+        generator = CheckpointedGenerator(template, checkpointEvery=20000)
+        start = time.perf_counter()
+        generator.generate(data, referenceFile, mode='full')
+        fullTime = time.perf_counter() - start
+        print(f"Génération complète : {fullTime:.2f} secondes pour {len(rows)} lignes")
+
+        # Interruption au 150e lot
+        renderedBatches = []
+        fillOut = template.fillOut__withPresizedBytesBatchAndLengths
+
+        def crashingFillOut(fieldColumns, separator, rowCount):
+            if len(renderedBatches) == 150:
+                raise _SimulatedCrash()
+            renderedBatches.append(True)
+            return fillOut(fieldColumns, separator, rowCount)
+
+        template.fillOut__withPresizedBytesBatchAndLengths = crashingFillOut
+        try:
+            generator.generate(data, outputFile)
+        except _SimulatedCrash:
+            print(f"Génération interrompue après {len(renderedBatches) * generator.batchSize} lignes")
+        del template.fillOut__withPresizedBytesBatchAndLengths
+
+        start = time.perf_counter()
+        generator.generate(data, outputFile)
+        print(f"Mode {generator.mode} : {time.perf_counter() - start:.2f} secondes, {generator.skippedCount} lignes "
+              f"ignorées, {generator.renderedCount} remplies, sortie identique : "
+              f"{outputFile.read_bytes() == referenceFile.read_bytes()}")
+
+        # Modification de 100 lignes réparties dans le fichier de données
+        for rowNumber in range(0, len(rows), len(rows) // 100):
+            rows[rowNumber][0] = f"modifié {rowNumber}"
+        with open(csvFile, 'w', encoding='utf-8', newline='') as output:
+            csv.writer(output).writerows([['DESTINATAIRES', 'DESTINATAIRES_COPIE'] + fieldNames] +
+                                         [[f"destinataire{i}@example.com", ''] + row for i, row in enumerate(rows)])
+        data = MailingData(csvFile)
+
+        start = time.perf_counter()
+        generator.generate(data, referenceFile, mode='full')
+        fullTime = time.perf_counter() - start
+        start = time.perf_counter()
+        generator.generate(data, outputFile)
+        incrementalTime = time.perf_counter() - start
+        print(f"Après modification : génération complète {fullTime:.2f} secondes, mode {generator.mode} "
+              f"{incrementalTime:.2f} secondes ({generator.renderedCount} lignes remplies, {generator.reusedCount} "
+              f"recopiées), sortie identique : {outputFile.read_bytes() == referenceFile.read_bytes()}")
+
+        start = time.perf_counter()
+        generator.generate(data, outputFile)
+        print(f"Sans modification : mode {generator.mode} en {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        # Modèle contenant lui-même le séparateur des contenus : les positions des lignes ne peuvent pas
+        # être retrouvées en recherchant le séparateur
+        templateFile.write_text('<p>Bonjour [---NOM---]</p>\n<hr>\n<p>[---VILLE---]</p>', encoding='utf-8')
+        separatorRows = [[f"Nom {i}", f"Ville {i}"] for i in range(50)]
+
+        def writeSeparatorData() -> MailingData:
+            with open(csvFile, 'w', encoding='utf-8', newline='') as output:
+                csv.writer(output).writerows([['DESTINATAIRES', 'DESTINATAIRES_COPIE', 'NOM', 'VILLE']] +
+                                             [[f"destinataire{i}@example.com", ''] + row
+                                              for i, row in enumerate(separatorRows)])
+            return MailingData(csvFile)
+
+        data = writeSeparatorData()
+        template = TemplateManager(htmlFile=templateFile, providedFieldNames=data.fieldNames)
+        generator = CheckpointedGenerator(template, batchSize=16)
+        generator.generate(data, outputFile, mode='full')
+        separatorRows[20][1] = "Ville modifiée"
+        data = writeSeparatorData()
+        generator.generate(data, referenceFile, mode='full')
+        generator.generate(data, outputFile)
+        print(f"Modèle contenant le séparateur : mode {generator.mode} ({generator.renderedCount} ligne remplie, "
+              f"{generator.reusedCount} recopiées), sortie identique : "
+              f"{outputFile.read_bytes() == referenceFile.read_bytes()}")
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,347 @@
+from abc import ABC, abstractmethod
+import codecs
+import csv
+import mmap
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, FrozenSet, Generator, Iterator, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+import zipfile
+
+import pyexcel_io
+from pyexcel_io import constants
+import pyexcel_xlsx
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class DataSource(ABC):
+    """
+    Source de lignes de données pour MailingData. La première ligne est l'en-tête.
+    Les cellules vides sont retournées sous forme de chaîne vide.
+    """
+
+    @abstractmethod
+    def readHeader(self) -> List[Any]:
+        """
+        Retourne la première ligne (en-tête) de la source, ou une liste vide si la source est vide.
+        """
+
+    @abstractmethod
+    def dataRows(self, columnIndices: Optional[Sequence[int]] = None) -> Iterator[Sequence[Any]]:
+        """
+        Retourne un itérateur sur les lignes de données (hors en-tête).
+        Peut être appelée plusieurs fois : chaque appel repart de la première ligne de données.
+        :param columnIndices: Indices croissants des colonnes à retourner (projection), ou None pour toutes.
+                              Les lignes projetées contiennent uniquement ces colonnes, dans cet ordre,
+                              et les cellules manquantes en fin de ligne valent ''.
+        """
+
+
+def projectRows(rows: Iterator[Sequence[Any]], columnIndices: Sequence[int]) -> Iterator[Sequence[Any]]:
+    """
+    Projette des lignes sur les colonnes columnIndices, pour les sources qui ne savent pas
+    éviter la lecture des autres colonnes. Les cellules manquantes en fin de ligne valent ''.
+    """
+    width = max(columnIndices, default=-1) + 1
+    if len(columnIndices) == 1:
+        (columnIndex,) = columnIndices
+        getColumns: Callable[[Sequence[Any]], Sequence[Any]] = lambda row: (row[columnIndex],)
+    else:
+        getColumns = itemgetter(*columnIndices)
+    for row in rows:
+        if len(row) >= width:
+            yield getColumns(row)
+        else:
+            yield [row[i] if i < len(row) else '' for i in columnIndices]
+
+
+class XlsxDataSource(DataSource):
+    """
+    Première feuille d'un fichier xlsx, lue par pyexcel_xlsx.
+    """
+
+    def __init__(self, xlsxFile: Path, streaming: bool = False) -> None:
+        """
+        :param xlsxFile: Fichier xlsx
+        :param streaming: Si True, les lignes sont lues à la demande depuis le fichier (mémoire constante)
+                          au lieu de charger toute la feuille en mémoire. Comme en lecture complète,
+                          les lignes et colonnes masquées sont ignorées.
+        """
+        self._xlsxFile = xlsxFile
+        self._streaming = streaming
+        self._sheet: Optional[List[List[Any]]] = None
+        # Positions (à partir de 0) des lignes et colonnes masquées de la feuille, ignorées en mode streaming
+        self._hiddenRows: FrozenSet[int] = frozenset()
+        self._hiddenColumns: FrozenSet[int] = frozenset()
+        if streaming:
+            self._hiddenRows, self._hiddenColumns = self._readHiddenRowsAndColumns()
+        else:
+            # Ouvre le fichier xlsx et conserve la première feuille
+            data: dict = pyexcel_xlsx.get_data(str(xlsxFile))
+            self._sheet = next(iter(data.values()))
+
+    def readHeader(self) -> List[Any]:
+        if self._streaming:
+            # Lit uniquement la première ligne puis referme le fichier
+            rows = self._streamRows()
+            firstRow = next(rows, None)
+            rows.close()
+        else:
+            firstRow = self._sheet[0] if self._sheet else None
+        return list(firstRow) if firstRow else []
+
+    def dataRows(self, columnIndices: Optional[Sequence[int]] = None) -> Iterator[Sequence[Any]]:
+        """
+        Retourne un itérateur sur les lignes de données, sans copie de la feuille en mémoire.
+        En mode streaming, le fichier est relu à chaque appel et la projection est faite par pyexcel_io :
+        les cellules des autres colonnes ne sont ni converties ni conservées, et la lecture d'une ligne
+        s'arrête après la dernière colonne demandée. Sans streaming, la feuille est déjà en mémoire
+        et seules les lignes retournées sont projetées.
+        """
+        if self._streaming:
+            rows = islice(self._streamRows(columnIndices), 1, None)
+            if columnIndices is None:
+                return rows
+            # Les cellules vides en fin de ligne ne sont pas retournées par pyexcel_io
+            return projectRows(rows, range(len(columnIndices)))
+        rows = islice(self._sheet, 1, None)
+        return rows if columnIndices is None else projectRows(rows, columnIndices)
+
+    def _streamRows(self, columnIndices: Optional[Sequence[int]] = None) -> Generator[List[Any], None, None]:
+        """
+        Lit paresseusement les lignes de la 1ère feuille du fichier xlsx (openpyxl en lecture seule).
+        Les cellules vides sont retournées sous forme de chaîne vide, comme en lecture complète.
+        Le fichier est refermé dès que le générateur est épuisé ou fermé.
+        Les lignes et colonnes masquées sont ignorées, comme par pyexcel_xlsx en lecture complète
+        (qui ne peut pas les détecter en lecture seule, cf. _readHiddenRowsAndColumns()).
+        :param columnIndices: Indices croissants des seules colonnes à lire, parmi les colonnes non masquées,
+                              ou None pour toutes
+        """
+        options = {}
+        if columnIndices is not None or self._hiddenColumns:
+            options['skip_column_func'] = self._makeColumnFilter(columnIndices, self._hiddenColumns)
+        if self._hiddenRows:
+            options['skip_row_func'] = self._makeRowFilter(self._hiddenRows)
+        data, reader = pyexcel_io.iget_data(str(self._xlsxFile), skip_hidden_row_and_column=False, **options)
+        try:
+            for row in next(iter(data.values())):
+                yield ['' if cell is None else cell for cell in row]
+        finally:
+            reader.close()
+
+    def _readHiddenRowsAndColumns(self) -> Tuple[FrozenSet[int], FrozenSet[int]]:
+        """
+        Retourne les positions (à partir de 0) des lignes et des colonnes masquées de la 1ère feuille visible,
+        lues directement dans le XML de la feuille : openpyxl ne les fournit pas en lecture seule.
+        Le XML est d'abord parcouru en octets à la recherche d'un attribut hidden, et n'est analysé
+        (élément par élément, en mémoire constante) que s'il en contient.
+        """
+        hiddenRows = set()
+        hiddenColumns = set()
+        with zipfile.ZipFile(self._xlsxFile) as archive:
+            sheetPath = self._firstVisibleSheetPath(archive)
+            if sheetPath is None or not self._containsBytes(archive, sheetPath, b' hidden='):
+                return frozenset(), frozenset()
+            with archive.open(sheetPath) as sheetXml:
+                rowNumber = 0
+                for _, element in ElementTree.iterparse(sheetXml):
+                    tag = element.tag.rpartition('}')[2]
+                    if tag == 'row':
+                        rowNumber = int(element.get('r', rowNumber + 1))
+                        if element.get('hidden') in ('1', 'true'):
+                            hiddenRows.add(rowNumber - 1)
+                        element.clear()
+                    elif tag == 'col' and element.get('hidden') in ('1', 'true'):
+                        hiddenColumns.update(range(int(element.get('min')) - 1, int(element.get('max'))))
+        return frozenset(hiddenRows), frozenset(hiddenColumns)
+
+    @staticmethod
+    def _firstVisibleSheetPath(archive: zipfile.ZipFile) -> Optional[str]:
+        """
+        Retourne le chemin dans l'archive de la 1ère feuille non masquée (celle lue par pyexcel_xlsx), ou None.
+        """
+        relationshipsNamespace = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        relationships = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        targets = {relationship.get('Id'): relationship.get('Target') for relationship in relationships}
+        for sheet in workbook.iter('{http://schemas.openxmlformats.org/spreadsheetml/2006/main}sheet'):
+            if sheet.get('state') == 'hidden':
+                continue
+            target = targets.get(sheet.get(f'{{{relationshipsNamespace}}}id'))
+            if target is None:
+                return None
+            # Cible absolue (/xl/worksheets/sheet1.xml) ou relative au classeur (worksheets/sheet1.xml)
+            return target.lstrip('/') if target.startswith('/') else str(PurePosixPath('xl') / target)
+        return None
+
+    @staticmethod
+    def _containsBytes(archive: zipfile.ZipFile, path: str, pattern: bytes, chunkSize: int = 1 << 20) -> bool:
+        """
+        Indique si le fichier path de l'archive contient pattern, en le décompressant par blocs.
+        """
+        with archive.open(path) as member:
+            tail = b''
+            for chunk in iter(lambda: member.read(chunkSize), b''):
+                if pattern in tail + chunk[:len(pattern)] or pattern in chunk:
+                    return True
+                tail = chunk[-len(pattern) + 1:]
+        return False
+
+    @staticmethod
+    def _makeColumnFilter(columnIndices: Optional[Sequence[int]],
+                          hiddenColumns: FrozenSet[int] = frozenset()) -> Callable[[int, int, int], int]:
+        """
+        Retourne la fonction de sélection des colonnes attendue par pyexcel_io (skip_column_func).
+        :param columnIndices: Indices des colonnes à lire parmi les colonnes non masquées, ou None pour toutes
+        :param hiddenColumns: Positions des colonnes masquées dans la feuille, jamais lues
+        """
+        if columnIndices is None:
+            return lambda columnIndex, start, limit: (constants.SKIP_DATA if columnIndex in hiddenColumns
+                                                      else constants.TAKE_DATA)
+        # Positions dans la feuille des colonnes demandées, en sautant les colonnes masquées
+        lastIndex = max(columnIndices, default=-1)
+        visiblePositions = []
+        position = 0
+        while len(visiblePositions) <= lastIndex:
+            if position not in hiddenColumns:
+                visiblePositions.append(position)
+            position += 1
+        takenIndices = frozenset(visiblePositions[i] for i in columnIndices)
+        lastIndex = visiblePositions[lastIndex] if lastIndex >= 0 else -1
+
+        def columnFilter(columnIndex: int, start: int, limit: int) -> int:
+            if columnIndex > lastIndex:
+                return constants.STOP_ITERATION
+            return constants.TAKE_DATA if columnIndex in takenIndices else constants.SKIP_DATA
+
+        return columnFilter
+
+    @staticmethod
+    def _makeRowFilter(hiddenRows: FrozenSet[int]) -> Callable[[int, int, int], int]:
+        """
+        Retourne la fonction de sélection des lignes attendue par pyexcel_io (skip_row_func), qui ignore les lignes masquées.
+        """
+        return lambda rowIndex, start, limit: constants.SKIP_DATA if rowIndex in hiddenRows else constants.TAKE_DATA
+
+
+class CsvDataSource(DataSource):
+    """
+    Fichier CSV projeté en mémoire (mmap) et décodé à la demande : seules les pages du fichier
+    effectivement lues sont chargées, et le fichier n'est jamais copié en entier.
+    Toutes les valeurs sont des chaînes.
+    """
+
+    def __init__(self, csvFile: Path, delimiter: str = ',', encoding: str = 'utf-8-sig') -> None:
+        """
+        :param csvFile: Fichier CSV
+        :param delimiter: Séparateur de colonnes
+        :param encoding: Encodage du fichier (par défaut UTF-8 avec ou sans BOM)
+        :raise FileNotFoundError: si le fichier n'existe pas
+        """
+        if not csvFile.is_file():
+            raise FileNotFoundError(csvFile)
+        self._csvFile = csvFile
+        self._delimiter = delimiter
+        self._encoding = encoding
+
+    def readHeader(self) -> List[Any]:
+        rows = self._readRows()
+        header = next(rows, [])
+        rows.close()
+        return header
+
+    def dataRows(self, columnIndices: Optional[Sequence[int]] = None) -> Iterator[Sequence[Any]]:
+        rows = islice(self._readRows(), 1, None)
+        # Le format CSV impose d'analyser chaque ligne en entier : seules les colonnes utiles sont conservées
+        return rows if columnIndices is None else projectRows(rows, columnIndices)
+
+    def _readRows(self) -> Generator[List[str], None, None]:
+        """
+        Lit les lignes du fichier CSV projeté en mémoire. Les lignes vides sont ignorées.
+        Le fichier est refermé dès que le générateur est épuisé ou fermé.
+        """
+        with open(self._csvFile, 'rb') as csvFile:
+            if csvFile.seek(0, 2) == 0:
+                # Un fichier vide ne peut pas être projeté en mémoire
+                return
+            with mmap.mmap(csvFile.fileno(), 0, access=mmap.ACCESS_READ) as mappedFile:
+                lines = codecs.iterdecode(iter(mappedFile.readline, b''), self._encoding)
+                for row in csv.reader(lines, delimiter=self._delimiter):
+                    if len(row) > 0:
+                        yield row
+
+
+class ArrowDataSource(DataSource):
+    """
+    Fichier Parquet (.parquet) ou Arrow IPC (.arrow, .feather), lu par lots d'enregistrements avec pyarrow.
+    L'en-tête est le nom des colonnes du schéma.
+    """
+
+    def __init__(self, arrowFile: Path, batchSize: int = 65536) -> None:
+        """
+        :param arrowFile: Fichier Parquet ou Arrow IPC
+        :param batchSize: Nombre de lignes par lot d'enregistrements lu
+        :raise ImportError: si pyarrow n'est pas installé
+        :raise FileNotFoundError: si le fichier n'existe pas
+        """
+        if pyarrow is None:
+            raise ImportError("Le module pyarrow est nécessaire pour lire les fichiers Parquet et Arrow.")
+        if not arrowFile.is_file():
+            raise FileNotFoundError(arrowFile)
+        self._arrowFile = arrowFile
+        self._batchSize = batchSize
+        self._isParquet = arrowFile.suffix.lower() == '.parquet'
+
+    def readHeader(self) -> List[Any]:
+        if self._isParquet:
+            schema = pyarrow.parquet.read_schema(str(self._arrowFile))
+        else:
+            with pyarrow.ipc.open_file(pyarrow.memory_map(str(self._arrowFile))) as reader:
+                schema = reader.schema
+        return list(schema.names)
+
+    def dataRows(self, columnIndices: Optional[Sequence[int]] = None) -> Iterator[Sequence[Any]]:
+        for recordBatch in self._recordBatches(columnIndices):
+            columns = [['' if value is None else value for value in column.to_pylist()]
+                       for column in recordBatch.columns]
+            yield from zip(*columns)
+
+    def _recordBatches(self, columnIndices: Optional[Sequence[int]] = None) -> Iterator[Any]:
+        """
+        Retourne un itérateur sur les lots d'enregistrements du fichier.
+        :param columnIndices: Indices des seules colonnes à lire, ou None pour toutes
+        """
+        if self._isParquet:
+            parquetFile = pyarrow.parquet.ParquetFile(str(self._arrowFile))
+            # Format colonne : les colonnes non demandées ne sont pas lues du tout
+            columnNames = None
+            if columnIndices is not None:
+                columnNames = [parquetFile.schema_arrow.names[i] for i in columnIndices]
+            yield from parquetFile.iter_batches(batch_size=self._batchSize, columns=columnNames)
+            return
+        # Fichier Arrow IPC projeté en mémoire : les lots sont lus sans copie
+        with pyarrow.ipc.open_file(pyarrow.memory_map(str(self._arrowFile))) as reader:
+            for i in range(reader.num_record_batches):
+                recordBatch = reader.get_batch(i)
+                yield recordBatch if columnIndices is None else recordBatch.select(list(columnIndices))
+
+
+def openDataSource(dataFile: Path, streaming: bool = False) -> DataSource:
+    """
+    Retourne la source de données adaptée à l'extension du fichier :
+    .csv (CsvDataSource), .parquet, .arrow, .feather (ArrowDataSource), sinon xlsx (XlsxDataSource).
+    :param streaming: Lecture à la demande pour les fichiers xlsx (les autres formats sont toujours lus à la demande)
+    """
+    suffix = dataFile.suffix.lower()
+    if suffix == '.csv':
+        return CsvDataSource(dataFile)
+    if suffix in ('.parquet', '.arrow', '.feather'):
+        return ArrowDataSource(dataFile)
+    return XlsxDataSource(dataFile, streaming=streaming)
@@ -0,0 +1,463 @@
+from bisect import bisect_left
+import cProfile
+import functools
+import io
+import json
+import os
+from pathlib import Path
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, Iterator, Mapping, Optional, Sequence, TypeVar
+
+T = TypeVar('T')
+
+
+class Histogram:
+    """
+    Histogramme à intervalles fixes, compatible avec le type histogram de Prometheus.
+    """
+
+    # Bornes supérieures par défaut, en secondes : de 1 µs à 10 s, 10 intervalles par décade,
+    # soit un rapport de 10 ** 0.1 (environ 1,26) entre deux bornes successives
+    defaultBuckets = tuple(round(10 ** (exponent / 10), 15) for exponent in range(-60, 11))
+
+    def __init__(self, buckets: Sequence[float] = defaultBuckets) -> None:
+        self.buckets = tuple(sorted(buckets))
+        # Le dernier compteur correspond à l'intervalle +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Retourne la borne supérieure de l'intervalle contenant le quantile q (0 < q <= 1), ou 0.0 si l'histogramme est vide.
+        C'est un majorant du quantile, qui le surestime au plus du rapport entre deux bornes successives
+        (environ 26 % avec les bornes par défaut).
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulativeCount = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            cumulativeCount += count
+            if cumulativeCount >= rank:
+                return bucket
+        return float('inf')
+
+    def asDict(self) -> Dict[str, Any]:
+        return {'buckets': list(self.buckets), 'counts': self.counts, 'sum': self.sum, 'count': self.count}
+
+
+class StageStats:
+    """
+    Mesures d'une étape : nombre d'appels, temps total, temps propre (hors étapes imbriquées) et histogramme des durées.
+    """
+
+    def __init__(self) -> None:
+        self.callCount = 0
+        self.totalTime = 0.0
+        self.selfTime = 0.0
+        self.histogram = Histogram()
+
+    def record(self, elapsedTime: float, selfTime: float) -> None:
+        self.callCount += 1
+        self.totalTime += elapsedTime
+        self.selfTime += selfTime
+        self.histogram.observe(elapsedTime)
+
+    def asDict(self) -> Dict[str, Any]:
+        return {
+            'callCount': self.callCount,
+            'totalTime': self.totalTime,
+            'selfTime': self.selfTime,
+            'p50': self.histogram.quantile(0.50),
+            'p99': self.histogram.quantile(0.99),
+            'histogram': self.histogram.asDict(),
+        }
+
+
+class _StageProfiler:
+    """
+    Profilage échantillonné d'une étape : un appel sur sampleEvery est exécuté sous cProfile
+    et/ou mesuré par tracemalloc (pic de mémoire allouée pendant l'appel).
+    """
+
+    def __init__(self, useCProfile: bool, useTracemalloc: bool, sampleEvery: int) -> None:
+        self.useCProfile = useCProfile
+        self.useTracemalloc = useTracemalloc
+        self.sampleEvery = sampleEvery
+        self.profile = cProfile.Profile() if useCProfile else None
+        self._callCount = 0
+        self.sampleCount = 0
+        self.maxAllocatedBytes = 0
+        self.totalAllocatedBytes = 0
+
+
+class Instrumentation:
+    """
+    Instrumentation optionnelle des étapes de la génération d'un mailing : durées par étape (avec histogramme),
+    temps propre de chaque étape hors étapes imbriquées, compteurs, et profilage échantillonné d'étapes
+    par cProfile ou tracemalloc. Les mesures sont exportables en JSON ou au format texte de Prometheus.
+    Les classes MailingData, TemplateManager et Mailer acceptent un paramètre instrumentation : lorsqu'il vaut None,
+    aucune méthode n'est enveloppée et l'instrumentation ne coûte rien par ligne.
+    Étapes mesurées : 'load' (ouverture des données), 'read' (lecture d'une ligne), 'convert' (ligne ou lot convertis,
+    hors 'read'), 'render' (remplissage du modèle), 'encode' (encodage UTF-8 des valeurs), 'write' (ajout au fichier
+    de sortie), 'close' (vidage final du tampon et fermeture).
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self._profilers: Dict[str, _StageProfiler] = {}
+        # Pile par thread du temps passé dans les étapes imbriquées de chaque étape en cours
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cProfileActive = False
+        self._startedTracemalloc = False
+        # Fichier d'export par défaut de export() (cf. fromEnvironment())
+        self.exportFile: Optional[Path] = None
+
+    @classmethod
+    def fromEnvironment(cls, environment: Optional[Mapping[str, str]] = None) -> Optional['Instrumentation']:
+        """
+        Crée une instrumentation d'après les variables d'environnement, sans modifier le code appelant :
+        MAILING_METRICS (fichier d'export .json ou .prom, active l'instrumentation),
+        MAILING_PROFILE (étapes profilées par cProfile, séparées par des virgules),
+        MAILING_TRACEMALLOC (étapes mesurées par tracemalloc) et MAILING_SAMPLE_EVERY (1 appel sur N, 1 par défaut).
+        :return: L'instrumentation, ou None si aucune de ces variables n'est définie
+        """
+        environment = os.environ if environment is None else environment
+        if not any(environment.get(name) for name in ('MAILING_METRICS', 'MAILING_PROFILE', 'MAILING_TRACEMALLOC')):
+            return None
+        instrumentation = cls()
+        instrumentation.exportFile = Path(environment['MAILING_METRICS']) if environment.get('MAILING_METRICS') else None
+        sampleEvery = int(environment.get('MAILING_SAMPLE_EVERY', '1'))
+        profiledStages = [stage for stage in environment.get('MAILING_PROFILE', '').split(',') if stage]
+        tracedStages = [stage for stage in environment.get('MAILING_TRACEMALLOC', '').split(',') if stage]
+        for stage in set(profiledStages) | set(tracedStages):
+            instrumentation.profileStage(stage, useCProfile=stage in profiledStages,
+                                         useTracemalloc=stage in tracedStages, sampleEvery=sampleEvery)
+        return instrumentation
+
+    def stage(self, name: str) -> '_StageTimer':
+        """
+        Retourne un gestionnaire de contexte qui mesure le bloc comme un appel de l'étape name.
+        """
+        return _StageTimer(self, name)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Ajoute value au compteur name.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def wrapFunction(self, name: str, function: Callable[..., T]) -> Callable[..., T]:
+        """
+        Retourne une fonction qui mesure chaque appel de function comme un appel de l'étape name.
+        """
+        enter, leave = self._enter, self._leave
+
+        @functools.wraps(function)
+        def instrumentedFunction(*args, **kwargs):
+            token = enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                leave(name, token)
+
+        return instrumentedFunction
+
+    def instrumentMethods(self, instance: Any, methodStages: Mapping[str, str]) -> None:
+        """
+        Remplace, sur cette seule instance, chaque méthode de methodStages par sa version mesurée
+        (nom de la méthode -> nom de l'étape). Les autres instances de la classe ne sont pas ralenties.
+        """
+        for methodName, stageName in methodStages.items():
+            setattr(instance, methodName, self.wrapFunction(stageName, getattr(instance, methodName)))
+
+    def timeIterator(self, name: str, iterator: Iterable[T], counter: Optional[str] = None) -> Iterator[T]:
+        """
+        Retourne un itérateur qui mesure l'obtention de chaque élément de iterator comme un appel de l'étape name
+        et, si counter est fourni, compte les éléments obtenus.
+        """
+        iterator = iter(iterator)
+        enter, leave = self._enter, self._leave
+        itemCount = 0
+        try:
+            while True:
+                token = enter(name)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    leave(name, token)
+                itemCount += 1
+                yield item
+        finally:
+            if counter is not None:
+                self.count(counter, itemCount)
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    def profileStage(self, name: str, useCProfile: bool = True, useTracemalloc: bool = False, sampleEvery: int = 1) -> None:
+        """
+        Active le profilage échantillonné de l'étape name : un appel sur sampleEvery est exécuté sous cProfile
+        (cf. profileReport(), dumpProfile()) et/ou mesuré par tracemalloc (cf. asDict()).
+        Les appels profilés sont plus lents et leur durée est incluse dans les mesures de l'étape.
+        :raise ValueError: si sampleEvery n'est pas strictement positif
+        """
+        if sampleEvery < 1:
+            raise ValueError("La fréquence d'échantillonnage doit être strictement positive.")
+        self._profilers[name] = _StageProfiler(useCProfile, useTracemalloc, sampleEvery)
+
+    def profileReport(self, name: str, limit: int = 20) -> str:
+        """
+        Retourne les fonctions les plus coûteuses (temps cumulé) des appels profilés de l'étape name.
+        """
+        profiler = self._profilers.get(name)
+        if profiler is None or profiler.profile is None or profiler.sampleCount == 0:
+            return f"Aucun appel profilé pour l'étape {name}."
+        output = io.StringIO()
+        pstats.Stats(profiler.profile, stream=output).sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    def dumpProfile(self, name: str, profileFile: Path) -> None:
+        """
+        Écrit le profil cProfile de l'étape name, lisible par pstats ou snakeviz.
+        """
+        profiler = self._profilers.get(name)
+        if profiler is not None and profiler.profile is not None:
+            profiler.profile.dump_stats(str(profileFile))
+
+    def close(self) -> None:
+        """
+        Arrête tracemalloc s'il a été démarré par l'instrumentation.
+        """
+        if self._startedTracemalloc:
+            tracemalloc.stop()
+            self._startedTracemalloc = False
+
+    def asDict(self) -> Dict[str, Any]:
+        """
+        Retourne toutes les mesures sous une forme sérialisable en JSON.
+        """
+        profiles = {}
+        for name, profiler in self._profilers.items():
+            profiles[name] = {'sampleCount': profiler.sampleCount}
+            if profiler.useTracemalloc:
+                profiles[name]['maxAllocatedBytes'] = profiler.maxAllocatedBytes
+                profiles[name]['meanAllocatedBytes'] = (profiler.totalAllocatedBytes / profiler.sampleCount
+                                                        if profiler.sampleCount > 0 else 0)
+        return {
+            'stages': {name: stats.asDict() for name, stats in self.stages.items()},
+            'counters': dict(self.counters),
+            'profiles': profiles,
+        }
+
+    def exportJson(self, jsonFile: Path) -> None:
+        self._writeAtomically(jsonFile, json.dumps(self.asDict(), indent=2))
+
+    def exportPrometheus(self, textFile: Path, prefix: str = 'mailing') -> None:
+        """
+        Écrit les mesures au format texte de Prometheus (collecteur textfile de node_exporter).
+        Le fichier est remplacé atomiquement pour ne jamais être lu à moitié écrit.
+        """
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Durée des appels de chaque étape.",
+            f"# TYPE {prefix}_stage_duration_seconds histogram",
+        ]
+        for name, stats in self.stages.items():
+            cumulativeCount = 0
+            for bucket, count in zip(stats.histogram.buckets, stats.histogram.counts):
+                cumulativeCount += count
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{name}",le="{bucket:g}"}} {cumulativeCount}')
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {stats.histogram.count}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{name}"}} {stats.histogram.sum:.9f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{name}"}} {stats.histogram.count}')
+        lines.append(f"# HELP {prefix}_stage_self_seconds_total Temps propre de chaque étape, hors étapes imbriquées.")
+        lines.append(f"# TYPE {prefix}_stage_self_seconds_total counter")
+        for name, stats in self.stages.items():
+            lines.append(f'{prefix}_stage_self_seconds_total{{stage="{name}"}} {stats.selfTime:.9f}')
+        for name, value in self.counters.items():
+            metricName = f"{prefix}_{''.join(char if char.isalnum() else '_' for char in name)}_total"
+            lines.append(f"# TYPE {metricName} counter")
+            lines.append(f"{metricName} {value}")
+        self._writeAtomically(textFile, '\n'.join(lines) + '\n')
+
+    def export(self, metricsFile: Optional[Path] = None) -> None:
+        """
+        Exporte les mesures en JSON si le fichier a l'extension .json, sinon au format Prometheus.
+        :param metricsFile: Fichier d'export (par défaut celui de MAILING_METRICS, cf. fromEnvironment())
+        """
+        metricsFile = metricsFile if metricsFile is not None else self.exportFile
+        if metricsFile is None:
+            return
+        if metricsFile.suffix.lower() == '.json':
+            self.exportJson(metricsFile)
+        else:
+            self.exportPrometheus(metricsFile)
+
+    def report(self) -> str:
+        """
+        Retourne un tableau des étapes triées par temps propre décroissant : la première est le goulot d'étranglement.
+        Les colonnes p50≤ et p99≤ sont des majorants des quantiles (cf. Histogram.quantile()).
+        """
+        lines = [f"{'Étape':10} {'appels':>10} {'total s':>10} {'propre s':>10} {'p50≤ µs':>10} {'p99≤ µs':>10}"]
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].selfTime):
+            lines.append(f"{name:10} {stats.callCount:>10} {stats.totalTime:>10.3f} {stats.selfTime:>10.3f} "
+                         f"{stats.histogram.quantile(0.5) * 1e6:>10.1f} {stats.histogram.quantile(0.99) * 1e6:>10.1f}")
+        lines += [f"{name} : {value}" for name, value in self.counters.items()]
+        return '\n'.join(lines)
+
+    def _enter(self, name: str) -> tuple:
+        """
+        Début d'un appel de l'étape name. Retourne le jeton à passer à _leave().
+        """
+        try:
+            childTimes = self._local.childTimes
+        except AttributeError:
+            childTimes = self._local.childTimes = []
+        childTimes.append(0.0)
+        profiler = self._profilers.get(name)
+        sample = self._startSample(profiler) if profiler is not None else None
+        return time.perf_counter(), sample
+
+    def _leave(self, name: str, token: tuple) -> None:
+        """
+        Fin d'un appel de l'étape name : enregistre sa durée et son temps propre,
+        et ajoute sa durée au temps des étapes imbriquées de l'étape englobante.
+        """
+        elapsedTime = time.perf_counter() - token[0]
+        if token[1] is not None:
+            self._stopSample(self._profilers[name], token[1])
+        childTimes = self._local.childTimes
+        childTime = childTimes.pop()
+        if childTimes:
+            childTimes[-1] += elapsedTime
+        stats = self.stages.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.stages.setdefault(name, StageStats())
+        stats.record(elapsedTime, elapsedTime - childTime)
+
+    def _startSample(self, profiler: _StageProfiler) -> Optional[tuple]:
+        """
+        Démarre le profilage de l'appel en cours s'il fait partie de l'échantillon.
+        :return: (cProfile démarré, mémoire tracée au départ), ou None si l'appel n'est pas profilé
+        """
+        profiler._callCount += 1
+        if profiler._callCount % profiler.sampleEvery != 0:
+            return None
+        profiling = False
+        if profiler.profile is not None:
+            with self._lock:
+                # Un seul profileur cProfile peut être actif à la fois
+                profiling = not self._cProfileActive
+                self._cProfileActive = True
+        startMemory = None
+        if profiler.useTracemalloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._startedTracemalloc = True
+            tracemalloc.reset_peak()
+            startMemory = tracemalloc.get_traced_memory()[0]
+        if profiling:
+            profiler.profile.enable()
+        return profiling, startMemory
+
+    def _stopSample(self, profiler: _StageProfiler, sample: tuple) -> None:
+        profiling, startMemory = sample
+        if profiling:
+            profiler.profile.disable()
+            self._cProfileActive = False
+        if startMemory is not None:
+            allocatedBytes = max(0, tracemalloc.get_traced_memory()[1] - startMemory)
+            profiler.maxAllocatedBytes = max(profiler.maxAllocatedBytes, allocatedBytes)
+            profiler.totalAllocatedBytes += allocatedBytes
+        profiler.sampleCount += 1
+
+    @staticmethod
+    def _writeAtomically(outputFile: Path, text: str) -> None:
+        temporaryFile = outputFile.with_suffix(f"{outputFile.suffix}.{os.getpid()}.tmp")
+        temporaryFile.write_text(text, encoding='utf-8')
+        os.replace(temporaryFile, outputFile)
+
+
+class _StageTimer:
+    """
+    Gestionnaire de contexte mesurant un bloc comme un appel d'une étape (cf. Instrumentation.stage()).
+    """
+
+    def __init__(self, instrumentation: Instrumentation, name: str) -> None:
+        self._instrumentation = instrumentation
+        self._name = name
+        self._token: Optional[tuple] = None
+
+    def __enter__(self) -> '_StageTimer':
+        self._token = self._instrumentation._enter(self._name)
+        return self
+
+    def __exit__(self, excType, excValue, traceback) -> None:
+        self._instrumentation._leave(self._name, self._token)
+
+
+def instrumentedIterator(stageName: str, counter: Optional[str] = None) -> Callable:
+    """
+    Décorateur des méthodes génératrices d'une classe ayant un attribut instrumentation : si l'attribut n'est pas None,
+    l'obtention de chaque élément est mesurée comme un appel de l'étape stageName (cf. Instrumentation.timeIterator()).
+    Sans instrumentation, le générateur est retourné tel quel : aucun coût par élément.
+    """
+    def decorator(method: Callable[..., Iterator[T]]) -> Callable[..., Iterator[T]]:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs) -> Iterator[T]:
+            iterator = method(self, *args, **kwargs)
+            if self.instrumentation is None:
+                return iterator
+            return self.instrumentation.timeIterator(stageName, iterator, counter)
+        return wrapper
+    return decorator
+
+
+#=====================================================================================
+# Tests de la classe Instrumentation
+#=====================================================================================
+import tempfile
+
+
+def _main() -> None:
+    """
+    Génère un mailing instrumenté, affiche le temps propre de chaque étape, le profil de l'étape de remplissage
+    et les exports JSON et Prometheus.
+    """
+    from Mailer import Mailer
+    from MailingData import MailingData
+    from TemplateManager import TemplateManager
+
+    instrumentation = Instrumentation()
+    instrumentation.profileStage('render', useCProfile=True, useTracemalloc=True, sampleEvery=2)
+    data = MailingData(Path('data/simple_data.xlsx'), instrumentation=instrumentation)
+    template = TemplateManager(Path('data/simple_template.html'), data.fieldNames, instrumentation=instrumentation)
+    with tempfile.TemporaryDirectory() as tmpDir:
+        with Mailer(Path(tmpDir) / 'output.html', instrumentation=instrumentation) as mailer:
+            for fieldValues in data.nextFieldsValueAsList():
+                mailer.addMailingBytes(template.fillOut__withBytes(fieldValues))
+        print(instrumentation.report())
+        print(instrumentation.profileReport('render', limit=5))
+
+        instrumentation.exportJson(Path(tmpDir) / 'metrics.json')
+        instrumentation.exportPrometheus(Path(tmpDir) / 'metrics.prom')
+        print('\n'.join((Path(tmpDir) / 'metrics.prom').read_text(encoding='utf-8').splitlines()[-12:]))
+    instrumentation.close()
+
+
+if __name__ == '__main__':
+    _main()
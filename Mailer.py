@@ -1,4 +1,8 @@
 from pathlib import Path
+import os
+from typing import BinaryIO, Iterable, List, Optional
+
+from Instrumentation import Instrumentation
 
 
 class Mailer:
@@ -6,40 +10,246 @@ class Mailer:
     Classe pour gérer la génération d'un fichier HTML à partir de contenus formatés.
     """
 
-    def __init__(self, htmlOutputFile: Path) -> None:
-        """
-        Initialise le Mailer avec un fichier de sortie HTML.
-        et écrit l'entête HTML5 dans le fichier de sortie.
-        """
-        self.htmlOutputFile = open(htmlOutputFile, 'w', encoding='utf-8')
-        self.htmlOutputFile.write(
-"""<!DOCTYPE html>
+    # Séparateur ajouté après chaque contenu formaté, et sa version encodée en UTF-8
+    separator: str = '<hr>\n'
+    separatorBytes: bytes = separator.encode('utf-8')
+
+    # Entête HTML5 écrit à l'ouverture du fichier de sortie et balises fermantes écrites à sa fermeture
+    htmlHeader: bytes = """<!DOCTYPE html>
 <html lang="fr">
 <head>
     <meta charset="UTF-8">
     <title>Mailing</title>
 </head>
 <body>
-"""
-        )
+""".encode('utf-8')
+    htmlFooter: bytes = "</body>\n</html>\n".encode('utf-8')
+
+    # Nombre maximal de tampons par appel à os.writev() (IOV_MAX sous Linux et macOS)
+    _maxIoVectors: int = 1024
+
+    # Méthodes mesurées lorsqu'une instrumentation est fournie, et étape correspondante
+    instrumentedMethods: dict[str, str] = {
+        'addMailing': 'write',
+        'addMailings': 'write',
+        'addJoinedMailings': 'write',
+        'addMailingBytes': 'write',
+        'addJoinedMailingsBytes': 'write',
+        'addJoinedMailingsFromFile': 'write',
+        '_closeOutputFile': 'close',
+    }
+
+    def __init__(self, htmlOutputFile: Path, bufferSize: int = 1024 * 1024, flushEvery: int = 0,
+                 instrumentation: Optional[Instrumentation] = None, resumeOffset: Optional[int] = None) -> None:
+        """
+        Initialise le Mailer avec un fichier de sortie HTML.
+        et écrit l'entête HTML5 dans le fichier de sortie.
+        :param htmlOutputFile: Fichier HTML de sortie
+        :param bufferSize: Taille en octets du tampon d'écriture du fichier de sortie
+        :param flushEvery: Nombre de contenus ajoutés après lequel le tampon est vidé sur le disque
+                           (0 : le tampon n'est vidé que lorsqu'il est plein et à la fermeture)
+        :param instrumentation: Si fourni, les écritures de cette instance sont mesurées (étapes 'write' et 'close',
+                                cf. instrumentedMethods) et le nombre d'octets écrits est compté ('bytes_written')
+        :param resumeOffset: Si fourni, reprend un fichier de sortie existant : ses resumeOffset premiers octets
+                             (entête et contenus déjà écrits, cf. flush()) sont conservés, la suite est supprimée
+                             et les contenus ajoutés sont écrits à leur suite
+        :raise ValueError: si bufferSize n'est pas strictement positif, si flushEvery est négatif
+                           ou si resumeOffset n'est pas compris entre la taille de l'entête et celle du fichier
+        """
+        if bufferSize < 1:
+            raise ValueError("La taille du tampon doit être strictement positive.")
+        if flushEvery < 0:
+            raise ValueError("La fréquence de vidage du tampon ne peut pas être négative.")
+        self._bufferSize = bufferSize
+        self._flushEvery = flushEvery
+        self._unflushedCount = 0
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.instrumentMethods(self, self.instrumentedMethods)
+        # Le fichier est ouvert en binaire : chaque contenu est encodé une seule fois par Mailer
+        if resumeOffset is None:
+            self.htmlOutputFile = open(htmlOutputFile, 'wb', buffering=bufferSize)
+            self.htmlOutputFile.write(self.htmlHeader)
+        else:
+            if not len(self.htmlHeader) <= resumeOffset <= htmlOutputFile.stat().st_size:
+                raise ValueError(f"Position de reprise {resumeOffset} invalide pour le fichier {htmlOutputFile}.")
+            self.htmlOutputFile = open(htmlOutputFile, 'r+b', buffering=bufferSize)
+            # Supprime les balises fermantes ou les contenus écrits après la position de reprise
+            self.htmlOutputFile.truncate(resumeOffset)
+            self.htmlOutputFile.seek(resumeOffset)
+
+    def __enter__(self) -> 'Mailer':
+        return self
+
+    def __exit__(self, excType, excValue, traceback) -> None:
+        """
+        Ferme le fichier de sortie à la sortie du bloc with, y compris en cas d'exception.
+        """
+        self.close()
 
     def __del__(self):
         """
-        Destructeur qui ferme proprement le fichier de sortie HTML.
+        Destructeur qui ferme proprement le fichier de sortie HTML s'il ne l'a pas déjà été.
         """
-        self._closeOutputFile()
+        self.close()
 
     def addMailing(self, formattedContent: str) -> None:
         """
         Ajoute un contenu formaté dans le fichier HTML de sortie.
         :param formattedContent: Contenu HTML à ajouter.
         """
-        self.htmlOutputFile.write(formattedContent + '<hr>\n')
+        # Deux écritures dans le tampon plutôt qu'une concaténation qui copierait tout le contenu
+        self.htmlOutputFile.write(formattedContent.encode('utf-8'))
+        self.htmlOutputFile.write(self.separatorBytes)
+        self._countAddedMailings(1)
+
+    def addMailings(self, formattedContents: Iterable[str]) -> None:
+        """
+        Ajoute un lot de contenus formatés dans le fichier HTML de sortie.
+        Chaque contenu est encodé une seule fois puis le lot est écrit par écriture groupée (os.writev),
+        sans concaténation des contenus ni du séparateur.
+        :param formattedContents: Contenus HTML à ajouter.
+        """
+        buffers: List[bytes] = []
+        for formattedContent in formattedContents:
+            buffers.append(formattedContent.encode('utf-8'))
+            buffers.append(self.separatorBytes)
+        if len(buffers) == 0:
+            return
+        self._writeBuffers(buffers)
+        self._countAddedMailings(len(buffers) // 2)
+
+    def addJoinedMailings(self, joinedContents: str, mailingCount: int) -> None:
+        """
+        Ajoute un bloc de contenus formatés déjà suivis chacun du séparateur Mailer.separator
+        (cf. TemplateManager.fillOut__withPresizedBatch()) en une seule écriture.
+        :param joinedContents: Contenus HTML concaténés avec leurs séparateurs.
+        :param mailingCount: Nombre de contenus du bloc (le nombre de lignes du lot rempli) : le bloc n'est pas
+                             parcouru pour les compter, les contenus pouvant eux-mêmes contenir le séparateur
+        """
+        self.htmlOutputFile.write(joinedContents.encode('utf-8'))
+        self._countAddedMailings(mailingCount)
+
+    def addMailingBytes(self, formattedContent: bytes) -> None:
+        """
+        Ajoute un contenu formaté déjà encodé en UTF-8 (cf. TemplateManager.fillOut__withBytes())
+        dans le fichier HTML de sortie, sans décodage ni réencodage.
+        :param formattedContent: Contenu HTML encodé en UTF-8 à ajouter.
+        """
+        self.htmlOutputFile.write(formattedContent)
+        self.htmlOutputFile.write(self.separatorBytes)
+        self._countAddedMailings(1)
+
+    def addJoinedMailingsBytes(self, joinedContents: bytes, mailingCount: int) -> None:
+        """
+        Ajoute un bloc de contenus formatés encodés en UTF-8, déjà suivis chacun du séparateur
+        Mailer.separatorBytes (cf. TemplateManager.fillOut__withPresizedBytesBatch()), en une seule écriture.
+        :param joinedContents: Contenus HTML encodés et concaténés avec leurs séparateurs.
+        :param mailingCount: Nombre de contenus du bloc (cf. addJoinedMailings())
+        """
+        self.htmlOutputFile.write(joinedContents)
+        self._countAddedMailings(mailingCount)
+
+    def addJoinedMailingsFromFile(self, sourceFile: BinaryIO, offset: int, length: int) -> None:
+        """
+        Ajoute un bloc de contenus formatés déjà suivis chacun du séparateur Mailer.separatorBytes, recopié
+        depuis les octets [offset, offset + length[ d'un autre fichier (par exemple une sortie précédente,
+        cf. CheckpointedGenerator). Si possible, la copie est faite par le système (os.copy_file_range) sans passer
+        par la mémoire du processus, voire en partageant les blocs du fichier si le système de fichiers le permet.
+        :param sourceFile: Fichier source ouvert en lecture binaire
+        """
+        # Vide le tampon pour conserver l'ordre des écritures
+        self.htmlOutputFile.flush()
+        copied = 0
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while copied < length:
+                    written = os.copy_file_range(sourceFile.fileno(), self.htmlOutputFile.fileno(),
+                                                 length - copied, offset + copied)
+                    if written == 0:
+                        break
+                    copied += written
+            except OSError:
+                # Copie non prise en charge entre ces fichiers : le reste est recopié par lecture et écriture
+                pass
+        sourceFile.seek(offset + copied)
+        while copied < length:
+            block = sourceFile.read(min(self._bufferSize, length - copied))
+            if len(block) == 0:
+                raise ValueError("Le fichier source est plus court que le bloc à recopier.")
+            self.htmlOutputFile.write(block)
+            copied += len(block)
+
+    def flush(self, durable: bool = False) -> int:
+        """
+        Vide le tampon sur le disque.
+        :param durable: Si True, attend aussi que le système ait écrit le fichier sur le support (os.fsync)
+        :return: Position dans le fichier à la fin du dernier contenu ajouté, utilisable comme resumeOffset
+        """
+        self.htmlOutputFile.flush()
+        if durable:
+            os.fsync(self.htmlOutputFile.fileno())
+        self._unflushedCount = 0
+        return self.htmlOutputFile.tell()
+
+    def close(self) -> None:
+        """
+        Vide le tampon et ferme le fichier de sortie. Les appels suivants sont sans effet.
+        """
+        if getattr(self, 'htmlOutputFile', None) is not None:
+            self._closeOutputFile()
+
+    def _writeBuffers(self, buffers: List[bytes]) -> None:
+        """
+        Écrit une liste de tampons dans le fichier de sortie. Si le lot dépasse la taille
+        du tampon d'écriture, il est écrit directement sur le descripteur avec os.writev().
+        """
+        if not hasattr(os, 'writev') or sum(map(len, buffers)) < self._bufferSize:
+            self.htmlOutputFile.writelines(buffers)
+            return
+        # Vide le tampon pour conserver l'ordre des écritures puis écrit les tampons par groupes
+        self.htmlOutputFile.flush()
+        fileDescriptor = self.htmlOutputFile.fileno()
+        start = 0
+        while start < len(buffers):
+            group = buffers[start:start + self._maxIoVectors]
+            written = os.writev(fileDescriptor, group)
+            start += len(group)
+            # Gère les écritures partielles en réécrivant le reste du groupe
+            remaining = sum(map(len, group)) - written
+            while remaining > 0:
+                group = self._skipWrittenBytes(group, written)
+                written = os.writev(fileDescriptor, group)
+                remaining -= written
+
+    @staticmethod
+    def _skipWrittenBytes(buffers: List[bytes], written: int) -> List[bytes]:
+        """
+        Retourne les tampons restant à écrire après une écriture partielle de written octets.
+        """
+        for i, buffer in enumerate(buffers):
+            if written < len(buffer):
+                return [memoryview(buffer)[written:]] + buffers[i + 1:]
+            written -= len(buffer)
+        return []
+
+    def _countAddedMailings(self, count: int) -> None:
+        """
+        Vide le tampon sur le disque si flushEvery contenus ont été ajoutés depuis le dernier vidage.
+        """
+        if self._flushEvery == 0:
+            return
+        self._unflushedCount += count
+        if self._unflushedCount >= self._flushEvery:
+            self.htmlOutputFile.flush()
+            self._unflushedCount = 0
 
     def _closeOutputFile(self) -> None:
         """
         Écrit les balises fermantes du HTML5 et ferme le fichier de sortie.
         """
-        self.htmlOutputFile.write("</body>\n</html>\n")
+        self.htmlOutputFile.write(self.htmlFooter)
+        if self.instrumentation is not None:
+            self.instrumentation.count('bytes_written', self.htmlOutputFile.tell())
         self.htmlOutputFile.close()
-
+        self.htmlOutputFile = None
@@ -1,24 +1,83 @@
+from contextlib import nullcontext
 from pathlib import Path
-import pyexcel_xlsx
-from typing import Iterator, List, Dict, Any, Generator
+from itertools import islice
+import tempfile
+from typing import Iterator, Iterable, List, Dict, Any, Generator, Optional, Sequence, Tuple
+
+from CellValueCache import CellValueCache
+from DataSource import DataSource, openDataSource
+from Instrumentation import Instrumentation, instrumentedIterator
+from SnapshotCache import SnapshotCache
 
 
 class MailingData:
-    def __init__(self, excelFile: Path) -> None:
-        # Ouvre le fichier xlsx
-        data: dict = pyexcel_xlsx.get_data(str(excelFile))
-        # Créé un itérateur sur la première feuille
-        self._sheet: List[List[Any]] = next(iter(data.values()))
+    def __init__(self, excelFile: Path, streaming: bool = False, valueCache: Optional[CellValueCache] = None,
+                 dataSource: Optional[DataSource] = None, snapshotCache: Optional[SnapshotCache] = None,
+                 requiredFieldNames: Optional[Iterable[str]] = None,
+                 instrumentation: Optional[Instrumentation] = None) -> None:
+        """
+        :param excelFile: Fichier de données : xlsx (1ère feuille), CSV, Parquet ou Arrow (cf. openDataSource())
+        :param streaming: Si True, les lignes d'un fichier xlsx sont lues à la demande depuis le fichier
+                          (mémoire constante) au lieu de charger toute la feuille en mémoire. Comme en lecture
+                          complète, les lignes et colonnes masquées sont ignorées.
+        :param valueCache: Cache de conversion (et d'échappement HTML) des valeurs des cellules.
+                           Si None, les valeurs sont simplement converties par str().
+        :param dataSource: Source de données à utiliser à la place de celle déduite de l'extension de excelFile
+        :param snapshotCache: Cache d'instantanés sur disque : un fichier xlsx inchangé depuis sa dernière lecture
+                              est lu depuis son instantané au lieu d'être analysé à nouveau
+        :param requiredFieldNames: Champs effectivement utilisés (par exemple TemplateManager.readTemplateFieldNames()).
+                                   Si fourni, fieldNames et les lignes retournées sont limités à ces champs,
+                                   dans l'ordre de l'en-tête : les autres colonnes ne sont ni converties
+                                   ni conservées, et la source de données ne les lit pas si elle le permet.
+        :param instrumentation: Si fourni, mesure les étapes 'load' (ouverture de la source et lecture de l'en-tête),
+                                'read' (lecture de chaque ligne) et 'convert' (conversion de chaque ligne ou lot),
+                                et compte les lignes lues ('rows')
+        :raise ValueError: si la feuille est vide, si l'en-tête est invalide
+                           ou si un champ de requiredFieldNames est absent de l'en-tête
+        """
+        self.dataFile = excelFile
+        self.valueCache = valueCache
+        # Fonction de conversion des valeurs des cellules en str
+        self._convert = valueCache.convert if valueCache is not None else str
+        self.instrumentation = instrumentation
+        with instrumentation.stage('load') if instrumentation is not None else nullcontext():
+            if dataSource is not None:
+                self._source = dataSource
+            elif snapshotCache is not None:
+                self._source = snapshotCache.openDataSource(excelFile, streaming=streaming)
+            else:
+                self._source = openDataSource(excelFile, streaming=streaming)
+            firstRow = self._source.readHeader()
         # Vérifie que la feuille n'est pas vide
-        if self._sheet is None or len(self._sheet) == 0:
+        if not firstRow:
             raise ValueError("La feuille est vide.")
         # Extrait les noms de colonnes
-        self.header: List[str] = [str(col) for col in self._sheet[0]]
+        self.header: List[str] = [str(col) for col in firstRow]
         # Vérifie que la feuille contient au moins les colonnes 'DESTINATAIRES' et 'DESTINATAIRES_COPIE'
         self.checkHeaderValidity(self.header)
         # Stocke les noms des autres colonnes dans self.fieldsName
         self.fieldNames = self.header[2:]
+        # Indices des colonnes lues dans la source (None : toutes), les 2 premières étant toujours conservées
+        self._columnIndices: Optional[List[int]] = None
+        if requiredFieldNames is not None:
+            self._projectOn(set(requiredFieldNames))
+        # Noms des colonnes des lignes retournées par la source, après projection
+        self._rowHeader = self.header[:2] + self.fieldNames
 
+    def _projectOn(self, requiredFieldNames: set[str]) -> None:
+        """
+        Limite les colonnes lues aux 2 premières et aux champs requiredFieldNames.
+        Si requiredFieldNames est vide (modèle sans champ), fieldNames est vide et les lots de
+        nextFieldValuesAsColumns() ne contiennent aucune colonne : seul leur nombre de lignes est significatif.
+        :raise ValueError: si un champ de requiredFieldNames est absent de l'en-tête
+        """
+        missingFieldNames = requiredFieldNames.difference(self.fieldNames)
+        if missingFieldNames:
+            raise ValueError(f"Les champs suivants sont manquants : {', '.join(sorted(missingFieldNames))}")
+        self._columnIndices = [0, 1] + [i for i in range(2, len(self.header)) if self.header[i] in requiredFieldNames]
+        self.fieldNames = [self.header[i] for i in self._columnIndices[2:]]
+
+    @instrumentedIterator('convert')
     def nextFieldValuesAsDict(self) -> Generator[dict[str, str], None, None]:
         """
         Retourne un itérateur sur les lignes de la 1ère feuille du fichier xlsx,
@@ -26,11 +85,14 @@ class MailingData:
         Chaque ligne est un dictionnaire avec les noms de colonnes comme clés
         et les valeurs sont converties en str si besoin.
         """
-        for row in self._sheet[1:]:
+        convert = self._convert
+        rowHeader = self._rowHeader
+        for row in self._rows():
             # Exclut les 2 premières colonnes
-            rowDict = {self.header[i]: str(row[i]) for i in range(2, len(row))}
+            rowDict = {rowHeader[i]: convert(row[i]) for i in range(2, len(row))}
             yield rowDict
 
+    @instrumentedIterator('convert')
     def nextFieldsValueAsList(self) -> Generator[List[str], None, None]:
         """
         Retourne un itérateur sur les lignes de la 1ère feuille du fichier xlsx,
@@ -38,11 +100,72 @@ class MailingData:
         Chaque ligne est un dictionnaire avec les noms de colonnes comme clés
         et les valeurs sont converties en str si besoin.
         """
-        for row in self._sheet[1:]:
+        convert = self._convert
+        for row in self._rows():
             # Exclut les 2 premières colonnes
-            rowList = [str(row[i]) for i in range(2, len(row))]
+            rowList = [convert(row[i]) for i in range(2, len(row))]
             yield rowList
 
+    @instrumentedIterator('convert')
+    def nextRecipientsAndFieldValues(self) -> Generator[tuple[List[str], List[str], List[str]], None, None]:
+        """
+        Retourne un itérateur sur les lignes de la 1ère feuille du fichier xlsx, en excluant la première ligne (en-tête).
+        Chaque ligne est un tuple (destinataires, destinataires en copie, valeurs des champs) : les adresses
+        des colonnes DESTINATAIRES et DESTINATAIRES_COPIE (cf. splitAddresses()) et les valeurs des autres
+        colonnes converties en str comme par nextFieldsValueAsList().
+        """
+        convert = self._convert
+        for row in self._rows():
+            recipients = self.splitAddresses(row[0]) if len(row) > 0 else []
+            copyRecipients = self.splitAddresses(row[1]) if len(row) > 1 else []
+            yield recipients, copyRecipients, [convert(row[i]) for i in range(2, len(row))]
+
+    @staticmethod
+    def splitAddresses(cellValue: Any) -> List[str]:
+        """
+        Découpe le contenu d'une cellule de destinataires en adresses, séparées par ';' ou ','.
+        Les adresses vides sont ignorées.
+        """
+        addresses = str(cellValue).replace(',', ';').split(';')
+        return [address.strip() for address in addresses if address.strip()]
+
+    @instrumentedIterator('convert')
+    def nextFieldValuesAsColumns(self, batchSize: int = 1000,
+                                 startRow: int = 0) -> Generator[Tuple[int, List[List[str]]], None, None]:
+        """
+        Retourne un itérateur sur des lots d'au plus batchSize lignes de la 1ère feuille du fichier xlsx,
+        en excluant la première ligne (en-tête) et les 2 premières colonnes.
+        Chaque lot est un tuple (nombre de lignes du lot, colonnes), les colonnes (une par champ de fieldNames)
+        contenant les valeurs de chaque ligne du lot converties en str. Les cellules manquantes en fin de ligne
+        valent ''. Le nombre de lignes est fourni à part car il ne peut pas être déduit des colonnes
+        lorsque fieldNames est vide : il est à transmettre aux méthodes de remplissage par lot (rowCount).
+        :param batchSize: Nombre maximal de lignes par lot
+        :param startRow: Nombre de lignes de données ignorées au début, sans conversion de leurs valeurs
+        :raise ValueError: si batchSize n'est pas strictement positif ou si startRow est négatif
+        """
+        if batchSize < 1:
+            raise ValueError("La taille des lots doit être strictement positive.")
+        if startRow < 0:
+            raise ValueError("Le numéro de la première ligne ne peut pas être négatif.")
+        convert = self._convert
+        columnIndices = range(2, len(self._rowHeader))
+        rows = islice(self._rows(), startRow, None)
+        while True:
+            batch = list(islice(rows, batchSize))
+            if len(batch) == 0:
+                return
+            yield len(batch), [[convert(row[i]) if i < len(row) else '' for row in batch] for i in columnIndices]
+
+    def _rows(self) -> Iterator[Sequence[Any]]:
+        """
+        Retourne un itérateur sur les lignes de données (hors en-tête) de la source de données,
+        projetées sur les colonnes requises le cas échéant.
+        """
+        rows = self._source.dataRows(self._columnIndices)
+        if self.instrumentation is not None:
+            return self.instrumentation.timeIterator('read', rows, counter='rows')
+        return rows
+
     @staticmethod
     def checkHeaderValidity(header: List[str]) -> None:
         """
@@ -78,6 +201,56 @@ def _main() -> None:
         for row in mailingData.nextFieldsValueAsList():
             print(row)
 
+        for rowCount, columns in mailingData.nextFieldValuesAsColumns(batchSize=2):
+            print(rowCount, columns)
+
+        # Conversion avec cache et échappement HTML des valeurs
+        mailingData = MailingData(Path(xlsxFile), valueCache=CellValueCache(maxSize=1024, escapeHtml=True))
+        for row in mailingData.nextFieldsValueAsList():
+            print(row)
+        print(f"Taux de succès du cache : {mailingData.valueCache.hitRate:.2%}")
+
+        # Lecture en streaming : les lignes sont lues à la demande
+        mailingData = MailingData(Path(xlsxFile), streaming=True)
+        for row in mailingData.nextFieldsValueAsList():
+            print(row)
+
+        # Lignes et colonnes masquées (ligne 3 et colonne D) : ignorées en streaming comme en lecture complète
+        hiddenDataFile = Path('data/hidden_data.xlsx')
+        mailingData = MailingData(hiddenDataFile)
+        streamedMailingData = MailingData(hiddenDataFile, streaming=True)
+        print("Champs visibles :", streamedMailingData.fieldNames)
+        for row in streamedMailingData.nextFieldsValueAsList():
+            print(row)
+        print("Lectures identiques :", mailingData.fieldNames == streamedMailingData.fieldNames and
+              list(mailingData.nextFieldsValueAsList()) == list(streamedMailingData.nextFieldsValueAsList()))
+
+        # Lecture d'un fichier CSV projeté en mémoire
+        csvFile = Path('data/simple_data.csv')
+        mailingData = MailingData(csvFile)
+        for row in mailingData.nextFieldsValueAsList():
+            print(row)
+
+        # Projection : seules les colonnes utilisées sont lues et converties
+        mailingData = MailingData(Path(xlsxFile), streaming=True, requiredFieldNames=['CHAMP3', 'CHAMP1'])
+        print("Champs projetés :", mailingData.fieldNames)
+        for row in mailingData.nextFieldValuesAsDict():
+            print(row)
+
+        # Projection sur un modèle sans champ : aucune colonne de champ n'est lue, mais chaque lot
+        # indique son nombre de lignes, et chaque ligne donne un contenu
+        from Mailer import Mailer
+        from TemplateManager import TemplateManager
+        with tempfile.TemporaryDirectory() as tmpDir:
+            templateFile = Path(tmpDir) / 'static_template.html'
+            templateFile.write_text('<p>Contenu identique pour chaque destinataire</p>', encoding='utf-8')
+            mailingData = MailingData(Path(xlsxFile), requiredFieldNames=TemplateManager.readTemplateFieldNames(templateFile))
+            template = TemplateManager(htmlFile=templateFile, providedFieldNames=mailingData.fieldNames)
+            print("Champs projetés :", mailingData.fieldNames)
+            for rowCount, columns in mailingData.nextFieldValuesAsColumns(batchSize=2):
+                joinedContents = template.fillOut__withPresizedBytesBatch(columns, Mailer.separatorBytes, rowCount)
+                print(rowCount, columns, joinedContents.count(Mailer.separatorBytes), "contenus")
+
     except ValueError as e:
         print(f"Erreur : {e}")
     except FileNotFoundError as e:
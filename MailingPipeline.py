@@ -0,0 +1,264 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from Mailer import Mailer
+from MailingData import MailingData
+from TemplateManager import TemplateManager
+
+
+# Marque de fin de flux transmise d'une étape à la suivante
+_END = object()
+
+
+class PipelineStageStats:
+    """
+    Statistiques d'une étape du pipeline. Le temps total de l'étape se décompose en :
+    - waitTime : attente d'un lot de l'étape précédente (étape affamée),
+    - stallTime : attente de place dans la file de l'étape suivante (étape bloquée par la suivante),
+    - busyTime : traitement effectif.
+    L'occupation de la file de sortie est mesurée à chaque lot ajouté.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.batchCount = 0
+        self.totalTime = 0.0
+        self.waitTime = 0.0
+        self.stallTime = 0.0
+        self._occupancySum = 0
+        self.maxOccupancy = 0
+
+    @property
+    def busyTime(self) -> float:
+        return max(0.0, self.totalTime - self.waitTime - self.stallTime)
+
+    @property
+    def meanOccupancy(self) -> float:
+        """
+        Nombre moyen de lots présents dans la file de sortie lors de l'ajout d'un lot.
+        """
+        return self._occupancySum / self.batchCount if self.batchCount > 0 else 0.0
+
+    def recordOccupancy(self, occupancy: int) -> None:
+        self._occupancySum += occupancy
+        self.maxOccupancy = max(self.maxOccupancy, occupancy)
+
+    def asDict(self) -> Dict[str, Any]:
+        """
+        Retourne les statistiques sous une forme sérialisable en JSON.
+        """
+        return {
+            'batchCount': self.batchCount,
+            'totalTime': self.totalTime,
+            'busyTime': self.busyTime,
+            'waitTime': self.waitTime,
+            'stallTime': self.stallTime,
+            'meanOccupancy': self.meanOccupancy,
+            'maxOccupancy': self.maxOccupancy,
+        }
+
+
+class MailingPipeline:
+    """
+    Classe pour générer un mailing en faisant se chevaucher la lecture des données, le remplissage du modèle
+    et l'écriture du fichier de sortie. Chaque étape s'exécute dans son propre thread (l'écriture dans le thread
+    appelant) et les étapes sont reliées par des files bornées de queueDepth lots de batchSize lignes,
+    ce qui borne la mémoire utilisée. Les threads se chevauchent pendant que le GIL est relâché :
+    lectures et écritures de fichiers, décompression du fichier xlsx, compression éventuelle de la sortie.
+    Une exception levée par une étape arrête les autres étapes puis est relevée par run().
+    """
+
+    def __init__(self, template: TemplateManager, batchSize: int = 1000, queueDepth: int = 4) -> None:
+        """
+        :param template: Modèle à remplir, construit avec les fieldNames des données
+        :param batchSize: Nombre de lignes par lot transmis entre les étapes
+        :param queueDepth: Nombre maximal de lots en attente entre deux étapes
+        :raise ValueError: si batchSize ou queueDepth n'est pas strictement positif
+        """
+        if batchSize < 1:
+            raise ValueError("La taille des lots doit être strictement positive.")
+        if queueDepth < 1:
+            raise ValueError("La profondeur des files doit être strictement positive.")
+        self.template = template
+        self.batchSize = batchSize
+        self.queueDepth = queueDepth
+        self.stats: Dict[str, PipelineStageStats] = {}
+        self._stopEvent = threading.Event()
+
+    def run(self, data: MailingData, mailer: Mailer) -> int:
+        """
+        Remplit le modèle pour toutes les lignes de data et ajoute les contenus formatés au mailer,
+        dans l'ordre des lignes.
+        :return: Nombre de contenus ajoutés au mailer
+        """
+        self.stats = {name: PipelineStageStats(name) for name in ('read', 'render', 'write')}
+        self._stopEvent.clear()
+        readQueue: queue.Queue = queue.Queue(maxsize=self.queueDepth)
+        renderQueue: queue.Queue = queue.Queue(maxsize=self.queueDepth)
+        errors: List[BaseException] = []
+
+        threads = [
+            threading.Thread(target=self._runStage, name='MailingPipeline-read', daemon=True,
+                             args=(self.stats['read'], data.nextFieldValuesAsColumns(batchSize=self.batchSize),
+                                   None, readQueue, errors)),
+            threading.Thread(target=self._runStage, name='MailingPipeline-render', daemon=True,
+                             args=(self.stats['render'], self._queueItems(readQueue, self.stats['render']),
+                                   self._renderBatch, renderQueue, errors)),
+        ]
+        for thread in threads:
+            thread.start()
+
+        mailingCount = 0
+        writeStats = self.stats['write']
+        start = time.perf_counter()
+        try:
+            for rowCount, joinedContents in self._queueItems(renderQueue, writeStats):
+                mailer.addJoinedMailingsBytes(joinedContents, rowCount)
+                mailingCount += rowCount
+                writeStats.batchCount += 1
+        except BaseException as e:
+            errors.append(e)
+            self._stopEvent.set()
+        finally:
+            writeStats.totalTime = time.perf_counter() - start
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        return mailingCount
+
+    def _renderBatch(self, batch: Tuple[int, List[List[str]]]) -> Tuple[int, bytes]:
+        """
+        Remplit le modèle pour un lot de lignes, directement en bytes suivis du séparateur du Mailer.
+        :param batch: Nombre de lignes du lot et colonnes de valeurs (cf. MailingData.nextFieldValuesAsColumns())
+        :return: Nombre de lignes du lot et contenus formatés concaténés
+        """
+        rowCount, fieldColumns = batch
+        return rowCount, self.template.fillOut__withPresizedBytesBatch(fieldColumns, Mailer.separatorBytes, rowCount)
+
+    def _runStage(self, stats: PipelineStageStats, items: Iterator[Any], process: Optional[Callable[[Any], Any]],
+                  outputQueue: queue.Queue, errors: List[BaseException]) -> None:
+        """
+        Traite chaque élément de items et place le résultat dans outputQueue, puis la marque de fin.
+        Le temps passé à obtenir un élément de items est compté comme attente (waitTime) par _queueItems(),
+        ou comme traitement pour la 1ère étape qui lit les données.
+        """
+        start = time.perf_counter()
+        try:
+            for item in items:
+                result = process(item) if process is not None else item
+                stats.recordOccupancy(outputQueue.qsize())
+                stallStart = time.perf_counter()
+                if not self._put(outputQueue, result):
+                    return
+                stats.stallTime += time.perf_counter() - stallStart
+                stats.batchCount += 1
+        except BaseException as e:
+            errors.append(e)
+            self._stopEvent.set()
+        finally:
+            # Referme le fichier de données si la lecture est interrompue
+            if hasattr(items, 'close'):
+                items.close()
+            self._put(outputQueue, _END)
+            stats.totalTime = time.perf_counter() - start
+
+    def _queueItems(self, inputQueue: queue.Queue, stats: PipelineStageStats) -> Iterator[Any]:
+        """
+        Retourne un itérateur sur les éléments de inputQueue jusqu'à la marque de fin ou l'arrêt du pipeline,
+        en comptant le temps d'attente de chaque élément.
+        """
+        while True:
+            waitStart = time.perf_counter()
+            item = self._get(inputQueue)
+            stats.waitTime += time.perf_counter() - waitStart
+            if item is _END:
+                return
+            yield item
+
+    def _put(self, outputQueue: queue.Queue, item: Any) -> bool:
+        """
+        Ajoute un élément à la file en attendant qu'elle ait de la place.
+        :return: False si le pipeline a été arrêté entre-temps
+        """
+        while not self._stopEvent.is_set():
+            try:
+                outputQueue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, inputQueue: queue.Queue) -> Any:
+        """
+        Retire un élément de la file en attendant qu'il y en ait un.
+        :return: L'élément, ou _END si le pipeline a été arrêté entre-temps
+        """
+        while not self._stopEvent.is_set():
+            try:
+                return inputQueue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _END
+
+
+def generateMailing(data: MailingData, template: TemplateManager, mailer: Mailer, batchSize: int = 1000) -> int:
+    """
+    Génération séquentielle de référence : lecture, remplissage et écriture de chaque lot l'un après l'autre.
+    :return: Nombre de contenus ajoutés au mailer
+    """
+    mailingCount = 0
+    for rowCount, fieldColumns in data.nextFieldValuesAsColumns(batchSize=batchSize):
+        mailer.addJoinedMailingsBytes(template.fillOut__withPresizedBytesBatch(fieldColumns, Mailer.separatorBytes,
+                                                                               rowCount), rowCount)
+        mailingCount += rowCount
+    return mailingCount
+
+
+#=====================================================================================
+# Tests de la classe MailingPipeline
+#=====================================================================================
+from pathlib import Path
+import tempfile
+
+
+def _main() -> None:
+    """
+    Compare la génération séquentielle et la génération en pipeline d'un mailing volumineux,
+    depuis un fichier xlsx lu en streaming puis depuis un fichier CSV.
+    """
+    from Benchmark import generateRows, generateTemplate, writeDataFiles
+
+    scenario = {'fieldCount': 10, 'valueLength': 20, 'staticLength': 2000, 'repeatCount': 1, 'rowCount': 50000}
+    fieldNames, rows = generateRows(scenario)
+    with tempfile.TemporaryDirectory() as tmpDir:
+        templateFile = Path(tmpDir) / 'template.html'
+        templateFile.write_text(generateTemplate(scenario), encoding='utf-8')
+        for dataFile in writeDataFiles(Path(tmpDir), fieldNames, rows):
+            data = MailingData(dataFile, streaming=True)
+            template = TemplateManager(htmlFile=templateFile, providedFieldNames=data.fieldNames)
+
+            start = time.perf_counter()
+            with Mailer(Path(tmpDir) / 'output_sequential.html') as mailer:
+                generateMailing(data, template, mailer)
+            sequentialTime = time.perf_counter() - start
+            print(f"{dataFile.name} : séquentiel : {sequentialTime:.2f} secondes pour {len(rows)} lignes")
+
+            pipeline = MailingPipeline(template)
+            start = time.perf_counter()
+            with Mailer(Path(tmpDir) / 'output_pipeline.html') as mailer:
+                pipeline.run(data, mailer)
+            pipelineTime = time.perf_counter() - start
+            print(f"{dataFile.name} : pipeline : {pipelineTime:.2f} secondes (accélération x{sequentialTime / pipelineTime:.2f})")
+            for stats in pipeline.stats.values():
+                print(f"    {stats.name:6} : traitement {stats.busyTime:.2f} s, attente {stats.waitTime:.2f} s, "
+                      f"blocage {stats.stallTime:.2f} s, occupation moyenne de la file {stats.meanOccupancy:.1f}")
+
+            sameOutput = (Path(tmpDir) / 'output_sequential.html').read_bytes() == (Path(tmpDir) / 'output_pipeline.html').read_bytes()
+            print(f"Sorties identiques : {sameOutput}")
+
+
+if __name__ == '__main__':
+    _main()
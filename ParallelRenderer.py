@@ -0,0 +1,139 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import os
+from pathlib import Path
+from typing import Deque, Iterable, List, Optional, Tuple
+
+from Mailer import Mailer
+from MailingData import MailingData
+from TemplateManager import TemplateManager
+
+
+# Modèle segmenté transmis une seule fois à chaque processus de travail par _initWorker()
+_workerTemplate: Optional[TemplateManager] = None
+
+
+def _initWorker(template: TemplateManager) -> None:
+    """
+    Initialise un processus de travail avec le modèle déjà segmenté
+    (_contentSegments et _contentSegmentsFieldValuesIndices sont calculés dans le processus parent).
+    """
+    global _workerTemplate
+    _workerTemplate = template
+
+
+def _renderChunk(rowCount: int, fieldColumns: List[List[str]]) -> List[str]:
+    """
+    Remplit le modèle du processus de travail pour un lot de rowCount lignes fourni sous forme de colonnes.
+    """
+    return _workerTemplate.fillOut__withSegmentationAndColumns(fieldColumns, rowCount=rowCount)
+
+
+class ParallelRenderer:
+    """
+    Classe pour répartir le remplissage d'un modèle sur plusieurs processus.
+    Les lignes de données sont découpées en lots de chunkSize lignes, remplis en parallèle
+    par workerCount processus, puis écrits par le processus parent dans l'ordre d'origine des lignes.
+    """
+
+    def __init__(self, template: TemplateManager, workerCount: Optional[int] = None, chunkSize: int = 1000) -> None:
+        """
+        :param template: Modèle à remplir, envoyé une seule fois à chaque processus de travail
+        :param workerCount: Nombre de processus de travail (par défaut le nombre de cœurs)
+        :param chunkSize: Nombre de lignes par lot envoyé à un processus de travail
+        :raise ValueError: si workerCount ou chunkSize n'est pas strictement positif
+        """
+        if workerCount is None:
+            workerCount = os.cpu_count() or 1
+        if workerCount < 1:
+            raise ValueError("Le nombre de processus doit être strictement positif.")
+        if chunkSize < 1:
+            raise ValueError("La taille des lots doit être strictement positive.")
+        self.template = template
+        self.workerCount = workerCount
+        self.chunkSize = chunkSize
+
+    def render(self, data: MailingData, mailer: Mailer) -> int:
+        """
+        Remplit le modèle pour toutes les lignes de data et ajoute les contenus formatés au mailer.
+        :return: Nombre de contenus ajoutés au mailer
+        """
+        return self.renderBatches(data.nextFieldValuesAsColumns(batchSize=self.chunkSize), mailer)
+
+    def renderBatches(self, fieldColumnBatches: Iterable[Tuple[int, List[List[str]]]], mailer: Mailer) -> int:
+        """
+        Remplit le modèle pour chaque lot (nombre de lignes, colonnes) (cf. MailingData.nextFieldValuesAsColumns())
+        et ajoute les contenus formatés au mailer dans l'ordre des lots.
+        Le nombre de lots en cours de traitement est borné pour limiter la mémoire utilisée.
+        :return: Nombre de contenus ajoutés au mailer
+        """
+        mailingCount = 0
+        maxPendingChunks = 2 * self.workerCount
+        with ProcessPoolExecutor(max_workers=self.workerCount,
+                                 initializer=_initWorker, initargs=(self.template,)) as executor:
+            pendingChunks: Deque[Future] = deque()
+            for rowCount, fieldColumns in fieldColumnBatches:
+                pendingChunks.append(executor.submit(_renderChunk, rowCount, fieldColumns))
+                if len(pendingChunks) >= maxPendingChunks:
+                    mailingCount += self._addMailings(pendingChunks.popleft().result(), mailer)
+            while len(pendingChunks) > 0:
+                mailingCount += self._addMailings(pendingChunks.popleft().result(), mailer)
+        return mailingCount
+
+    @staticmethod
+    def _addMailings(formattedContents: List[str], mailer: Mailer) -> int:
+        """
+        Ajoute les contenus formatés d'un lot au mailer en une seule écriture groupée.
+        :return: Nombre de contenus ajoutés
+        """
+        mailer.addMailings(formattedContents)
+        return len(formattedContents)
+
+
+#=====================================================================================
+# Tests de la classe ParallelRenderer
+#=====================================================================================
+import tempfile
+import time
+
+
+def _main() -> None:
+    """
+    Compare le remplissage séquentiel et parallèle d'un modèle volumineux.
+    """
+    rowCount = 20000
+    fieldNames = ['CHAMP1', 'CHAMP2', 'CHAMP3']
+    fieldColumns = [[f"L{i} val {fieldName}" for i in range(rowCount)] for fieldName in fieldNames]
+    chunkSize = 1000
+    batches = [(min(chunkSize, rowCount - start), [column[start:start + chunkSize] for column in fieldColumns])
+               for start in range(0, rowCount, chunkSize)]
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        # Modèle volumineux : le modèle simple répété 50 fois
+        templateFile = Path(tmpDir) / 'large_template.html'
+        templateFile.write_text(Path('data/simple_template.html').read_text(encoding='utf-8') * 50, encoding='utf-8')
+        template = TemplateManager(htmlFile=templateFile, providedFieldNames=fieldNames)
+
+        start = time.perf_counter()
+        with Mailer(Path(tmpDir) / 'output_sequential.html') as mailer:
+            for batchRowCount, batch in batches:
+                ParallelRenderer._addMailings(template.fillOut__withSegmentationAndColumns(batch, rowCount=batchRowCount),
+                                              mailer)
+        sequentialTime = time.perf_counter() - start
+        print(f"Séquentiel : {sequentialTime:.2f} secondes pour {rowCount} lignes")
+
+        workerCount = 1
+        while workerCount <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            with Mailer(Path(tmpDir) / 'output_parallel.html') as mailer:
+                ParallelRenderer(template, workerCount=workerCount, chunkSize=chunkSize).renderBatches(batches, mailer)
+            parallelTime = time.perf_counter() - start
+            print(f"{workerCount} processus : {parallelTime:.2f} secondes (accélération x{sequentialTime / parallelTime:.2f})")
+            workerCount *= 2
+
+        sameOutput = (Path(tmpDir) / 'output_sequential.html').read_bytes() == (Path(tmpDir) / 'output_parallel.html').read_bytes()
+        print(f"Sorties identiques : {sameOutput}")
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,521 @@
+from array import array
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import gzip
+import os
+from pathlib import Path
+from typing import BinaryIO, Callable, Deque, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple, Union
+
+from Instrumentation import Instrumentation
+from Mailer import Mailer
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _compressGzip(data: bytes, level: int) -> bytes:
+    # mtime=0 : la sortie ne dépend que des données, deux générations identiques donnent les mêmes fichiers
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _compressZstd(data: bytes, level: int) -> bytes:
+    # Un compresseur par appel : les objets ZstdCompressor ne peuvent pas être partagés entre threads
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _decompressZstd(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+class ShardedMailer:
+    """
+    Classe pour générer un mailing découpé en plusieurs fichiers HTML (shards), éventuellement compressés.
+    Elle offre les mêmes méthodes d'ajout que Mailer et peut le remplacer (MailingPipeline, main.py, etc.).
+    Chaque shard est un document HTML5 complet, et un nouveau shard est commencé :
+    - shardBy='rows' : tous les shardSize contenus,
+    - shardBy='bytes' : avant le contenu qui ferait dépasser shardSize octets (non compressés) au shard,
+    - shardBy='recipient' : pour chaque contenu (un fichier par destinataire).
+
+    Les contenus sont regroupés en blocs d'environ chunkSize octets, toujours coupés entre deux contenus.
+    Avec compression, chaque bloc est compressé indépendamment (membre gzip ou trame zstd) par un groupe
+    de threads pendant que le remplissage continue, puis les blocs sont écrits dans l'ordre : le fichier
+    obtenu reste lisible par gzip -d / zstd -d et la compression ne s'ajoute pas au temps de remplissage.
+    Au plus maxPendingChunks blocs sont en attente de compression, ce qui borne la mémoire utilisée.
+
+    Un index (fichier <stem>.index.tsv) associe chaque numéro de contenu (à partir de 0) à son shard,
+    à la position et à la taille du bloc qui le contient, et à sa position et sa taille dans le bloc décompressé :
+    un contenu est relu sans parcourir le shard (cf. ShardIndex).
+    """
+
+    # Modes de découpage acceptés
+    shardModes: Tuple[str, ...] = ('rows', 'bytes', 'recipient')
+
+    # Compressions acceptées : extension des fichiers, niveau par défaut, fonction de compression
+    compressions: Dict[str, Tuple[str, int, Callable[[bytes, int], bytes]]] = {
+        'gzip': ('.gz', 6, _compressGzip),
+        'zstd': ('.zst', 3, _compressZstd),
+    }
+
+    indexSuffix: str = '.index.tsv'
+    indexHeader: str = 'row\tshard\tblockOffset\tblockLength\toffset\tlength\n'
+
+    # Méthodes mesurées lorsqu'une instrumentation est fournie, et étape correspondante
+    instrumentedMethods: Dict[str, str] = {
+        'addMailing': 'write',
+        'addMailings': 'write',
+        'addJoinedMailings': 'write',
+        'addMailingBytes': 'write',
+        'addJoinedMailingsBytes': 'write',
+        '_closeOutputFiles': 'close',
+    }
+
+    def __init__(self, outputDirectory: Path, stem: str = 'mailing', shardBy: str = 'rows', shardSize: int = 100000,
+                 compression: Optional[str] = None, compressionLevel: Optional[int] = None,
+                 compressionThreads: Optional[int] = None, chunkSize: int = 1024 * 1024,
+                 maxPendingChunks: Optional[int] = None, instrumentation: Optional[Instrumentation] = None) -> None:
+        """
+        :param outputDirectory: Répertoire des shards et de l'index (créé si besoin)
+        :param stem: Préfixe des noms de fichiers : <stem>_000000.html[.gz|.zst] et <stem>.index.tsv
+        :param shardBy: Mode de découpage : 'rows', 'bytes' ou 'recipient'
+        :param shardSize: Nombre de contenus ('rows') ou taille en octets ('bytes') maximal d'un shard
+        :param compression: None, 'gzip' ou 'zstd' (module zstandard nécessaire)
+        :param compressionLevel: Niveau de compression (par défaut 6 pour gzip et 3 pour zstd)
+        :param compressionThreads: Nombre de threads de compression (par défaut le nombre de processeurs)
+        :param chunkSize: Taille en octets, avant compression, à partir de laquelle un bloc est terminé
+        :param maxPendingChunks: Nombre maximal de blocs en cours de compression (par défaut 2 par thread)
+        :param instrumentation: Si fourni, les écritures de cette instance sont mesurées (étapes 'write' et 'close')
+                                et le nombre d'octets écrits est compté ('bytes_written')
+        :raise ValueError: si un paramètre est invalide
+        :raise ImportError: si la compression zstd est demandée sans le module zstandard
+        """
+        if shardBy not in self.shardModes:
+            raise ValueError(f"Mode de découpage inconnu : {shardBy} (modes acceptés : {', '.join(self.shardModes)}).")
+        if shardSize < 1:
+            raise ValueError("La taille des shards doit être strictement positive.")
+        if chunkSize < 1:
+            raise ValueError("La taille des blocs doit être strictement positive.")
+        if compression is not None and compression not in self.compressions:
+            raise ValueError(f"Compression inconnue : {compression} (compressions acceptées : {', '.join(self.compressions)}).")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("Le module zstandard est nécessaire pour la compression zstd.")
+
+        self.outputDirectory = outputDirectory
+        self.stem = stem
+        self.shardBy = shardBy
+        self.shardSize = shardSize
+        self.compression = compression
+        self._chunkSize = chunkSize
+        self._extension = '.html'
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._maxPendingChunks = 0
+        if compression is not None:
+            extension, defaultLevel, self._compress = self.compressions[compression]
+            self._extension += extension
+            self._compressionLevel = defaultLevel if compressionLevel is None else compressionLevel
+            threadCount = compressionThreads if compressionThreads is not None else (os.cpu_count() or 1)
+            self._executor = ThreadPoolExecutor(max_workers=threadCount, thread_name_prefix='ShardedMailer')
+            self._maxPendingChunks = maxPendingChunks if maxPendingChunks is not None else 2 * threadCount
+
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.instrumentMethods(self, self.instrumentedMethods)
+
+        # Nombre de contenus ajoutés (numéro du prochain contenu) et liste des shards écrits
+        self.mailingCount = 0
+        self.shardFiles: List[Path] = []
+        # Shard en cours : fichier, nombre de contenus et taille non compressée
+        self._shardFile: Optional[BinaryIO] = None
+        self._shardRowCount = 0
+        self._shardLength = 0
+        # Bloc en cours : tampons, taille, et (numéro, position, taille) de chaque contenu du bloc
+        self._chunk: List[Union[bytes, memoryview]] = []
+        self._chunkLength = 0
+        self._chunkRows: List[Tuple[int, int, int]] = []
+        # Blocs terminés dans l'ordre d'écriture : shard, bloc ou compression en cours, contenus, dernier bloc du shard
+        self._pendingChunks: Deque[Tuple[BinaryIO, str, Union[List[Union[bytes, memoryview]], Future],
+                                         List[Tuple[int, int, int]], bool]] = deque()
+
+        outputDirectory.mkdir(parents=True, exist_ok=True)
+        self.indexFile = outputDirectory / f"{stem}{self.indexSuffix}"
+        self._index: Optional[TextIO] = open(self.indexFile, 'w', encoding='utf-8', newline='\n')
+        self._index.write(self.indexHeader)
+
+    def __enter__(self) -> 'ShardedMailer':
+        return self
+
+    def __exit__(self, excType, excValue, traceback) -> None:
+        """
+        Termine et ferme tous les fichiers à la sortie du bloc with, y compris en cas d'exception.
+        """
+        self.close()
+
+    def __del__(self):
+        """
+        Destructeur qui termine proprement les fichiers s'ils ne l'ont pas déjà été.
+        """
+        self.close()
+
+    def addMailing(self, formattedContent: str) -> None:
+        """
+        Ajoute un contenu formaté.
+        :param formattedContent: Contenu HTML à ajouter.
+        """
+        self._addContent(formattedContent.encode('utf-8'))
+
+    def addMailings(self, formattedContents: Iterable[str]) -> None:
+        """
+        Ajoute un lot de contenus formatés.
+        :param formattedContents: Contenus HTML à ajouter.
+        """
+        for formattedContent in formattedContents:
+            self._addContent(formattedContent.encode('utf-8'))
+
+    def addJoinedMailings(self, joinedContents: str, mailingCount: int,
+                          contentLengths: Optional[Sequence[int]] = None) -> None:
+        """
+        Ajoute un bloc de contenus formatés déjà suivis chacun du séparateur Mailer.separator
+        (cf. TemplateManager.fillOut__withPresizedBatch()).
+        :param joinedContents: Contenus HTML concaténés avec leurs séparateurs.
+        :param mailingCount: Nombre de contenus du bloc (cf. Mailer.addJoinedMailings())
+        :param contentLengths: Longueurs en octets UTF-8 des contenus, séparateur non compris (cf. addJoinedMailingsBytes())
+        """
+        self.addJoinedMailingsBytes(joinedContents.encode('utf-8'), mailingCount, contentLengths)
+
+    def addMailingBytes(self, formattedContent: bytes) -> None:
+        """
+        Ajoute un contenu formaté déjà encodé en UTF-8 (cf. TemplateManager.fillOut__withBytes()).
+        :param formattedContent: Contenu HTML encodé en UTF-8 à ajouter.
+        """
+        self._addContent(formattedContent)
+
+    def addJoinedMailingsBytes(self, joinedContents: bytes, mailingCount: int,
+                               contentLengths: Optional[Sequence[int]] = None) -> None:
+        """
+        Ajoute un bloc de contenus formatés encodés en UTF-8, déjà suivis chacun du séparateur
+        Mailer.separatorBytes (cf. TemplateManager.fillOut__withPresizedBytesBatch()).
+        Chaque contenu est indexé d'après contentLengths (cf. TemplateManager.fillOut__withPresizedBytesBatchAndLengths()),
+        ou à défaut en parcourant le bloc au séparateur, ce qui suppose que les contenus ne le contiennent pas.
+        Les contenus consécutifs d'un même bloc de sortie sont ajoutés en une seule vue, sans copie.
+        :param joinedContents: Contenus HTML encodés et concaténés avec leurs séparateurs.
+        :param mailingCount: Nombre de contenus du bloc (cf. Mailer.addJoinedMailingsBytes())
+        :param contentLengths: Longueurs en octets des contenus, séparateur non compris, dans l'ordre du bloc
+        :raise ValueError: si les longueurs fournies ne correspondent pas au bloc, ou si le nombre de contenus trouvés
+                           au séparateur diffère de mailingCount (séparateur présent dans un contenu) ;
+                           rien n'est alors ajouté
+        """
+        separatorLength = len(Mailer.separatorBytes)
+        if contentLengths is None:
+            if len(joinedContents) > 0 and not joinedContents.endswith(Mailer.separatorBytes):
+                # Dernier contenu non suivi du séparateur
+                joinedContents += Mailer.separatorBytes
+            contentLengths = []
+            start = 0
+            while start < len(joinedContents):
+                end = joinedContents.find(Mailer.separatorBytes, start)
+                contentLengths.append(end - start)
+                start = end + separatorLength
+            if len(contentLengths) != mailingCount:
+                raise ValueError(f"Le bloc contient {len(contentLengths)} séparateurs pour {mailingCount} contenus : "
+                                 f"fournir les longueurs des contenus (contentLengths).")
+        elif len(contentLengths) != mailingCount:
+            raise ValueError(f"{len(contentLengths)} longueurs fournies pour {mailingCount} contenus.")
+        elif sum(contentLengths) + mailingCount * separatorLength != len(joinedContents):
+            raise ValueError("Les longueurs des contenus ne correspondent pas à la taille du bloc.")
+
+        view = memoryview(joinedContents)
+        # Début des contenus comptés mais pas encore ajoutés au bloc en cours
+        spanStart = 0
+        start = 0
+        for contentLength in contentLengths:
+            if self._shardFile is None or self._isShardFull(contentLength):
+                self._appendSpan(view[spanStart:start])
+                spanStart = start
+                self._startShard()
+            self._countContent(contentLength)
+            start += contentLength + separatorLength
+            if self._chunkLength >= self._chunkSize:
+                self._appendSpan(view[spanStart:start])
+                spanStart = start
+                self._endChunk(isLastChunk=False)
+        self._appendSpan(view[spanStart:start])
+
+    def close(self) -> None:
+        """
+        Termine le shard en cours, attend la fin des compressions, écrit les derniers blocs et ferme l'index.
+        Les appels suivants sont sans effet.
+        """
+        if getattr(self, '_index', None) is not None:
+            self._closeOutputFiles()
+
+    def _addContent(self, formattedContent: bytes) -> None:
+        """
+        Ajoute un contenu encodé au bloc en cours, en commençant un nouveau shard si nécessaire,
+        et termine le bloc s'il atteint chunkSize octets.
+        """
+        if self._shardFile is None or self._isShardFull(len(formattedContent)):
+            self._startShard()
+        self._countContent(len(formattedContent))
+        self._chunk.append(formattedContent)
+        self._chunk.append(Mailer.separatorBytes)
+        if self._chunkLength >= self._chunkSize:
+            self._endChunk(isLastChunk=False)
+
+    def _countContent(self, contentLength: int) -> None:
+        """
+        Enregistre la position dans le bloc en cours d'un contenu de contentLength octets suivi du séparateur,
+        avant que ses octets soient ajoutés au bloc.
+        """
+        self._chunkRows.append((self.mailingCount, self._chunkLength, contentLength))
+        addedLength = contentLength + len(Mailer.separatorBytes)
+        self._chunkLength += addedLength
+        self._shardLength += addedLength
+        self._shardRowCount += 1
+        self.mailingCount += 1
+
+    def _appendSpan(self, span: memoryview) -> None:
+        """
+        Ajoute au bloc en cours les octets de contenus déjà comptés par _countContent().
+        """
+        if len(span) > 0:
+            self._chunk.append(span)
+
+    def _isShardFull(self, contentLength: int) -> bool:
+        """
+        Indique si le contenu de contentLength octets doit être écrit dans un nouveau shard.
+        """
+        if self.shardBy == 'rows':
+            return self._shardRowCount >= self.shardSize
+        if self.shardBy == 'bytes':
+            # Un contenu plus grand que shardSize est écrit seul dans son shard
+            return (self._shardRowCount > 0 and
+                    self._shardLength + contentLength + len(Mailer.separatorBytes) + len(Mailer.htmlFooter) > self.shardSize)
+        return self._shardRowCount >= 1
+
+    def _startShard(self) -> None:
+        """
+        Termine le shard en cours puis ouvre le suivant et commence son 1er bloc par l'entête HTML5.
+        """
+        if self._shardFile is not None:
+            self._endShard()
+        shardFile = self.outputDirectory / f"{self.stem}_{len(self.shardFiles):06d}{self._extension}"
+        self.shardFiles.append(shardFile)
+        self._shardFile = open(shardFile, 'wb')
+        self._chunk = [Mailer.htmlHeader]
+        self._chunkLength = len(Mailer.htmlHeader)
+        self._shardRowCount = 0
+        self._shardLength = self._chunkLength
+
+    def _endShard(self) -> None:
+        """
+        Termine le dernier bloc du shard en cours par les balises fermantes du HTML5.
+        Le fichier est fermé lorsque ce bloc est écrit.
+        """
+        self._chunk.append(Mailer.htmlFooter)
+        self._chunkLength += len(Mailer.htmlFooter)
+        self._endChunk(isLastChunk=True)
+        self._shardFile = None
+
+    def _endChunk(self, isLastChunk: bool) -> None:
+        """
+        Soumet le bloc en cours à la compression (ou l'écrit directement sans compression) puis écrit
+        les blocs terminés tant que plus de maxPendingChunks blocs sont en attente.
+        """
+        chunk: Union[List[Union[bytes, memoryview]], Future] = self._chunk
+        if self._executor is not None:
+            chunk = self._executor.submit(self._compress, b''.join(self._chunk), self._compressionLevel)
+        self._pendingChunks.append((self._shardFile, self.shardFiles[-1].name, chunk, self._chunkRows, isLastChunk))
+        self._chunk = []
+        self._chunkLength = 0
+        self._chunkRows = []
+        while len(self._pendingChunks) > self._maxPendingChunks:
+            self._writePendingChunk()
+
+    def _writePendingChunk(self) -> None:
+        """
+        Écrit le plus ancien bloc terminé (en attendant sa compression) et indexe ses contenus.
+        """
+        shardFile, shardName, chunk, chunkRows, isLastChunk = self._pendingChunks.popleft()
+        buffers = [chunk.result()] if isinstance(chunk, Future) else chunk
+        blockOffset = shardFile.tell()
+        blockLength = sum(map(len, buffers))
+        shardFile.writelines(buffers)
+        self._index.writelines([f"{row}\t{shardName}\t{blockOffset}\t{blockLength}\t{offset}\t{length}\n"
+                                for row, offset, length in chunkRows])
+        if isLastChunk:
+            if self.instrumentation is not None:
+                self.instrumentation.count('bytes_written', shardFile.tell())
+            shardFile.close()
+
+    def _closeOutputFiles(self) -> None:
+        """
+        Termine le shard en cours et écrit tous les blocs en attente, puis arrête les threads de compression
+        et ferme l'index. En cas d'erreur de compression, les fichiers sont fermés avant que l'erreur soit relevée.
+        """
+        try:
+            if self._shardFile is not None:
+                self._endShard()
+            while len(self._pendingChunks) > 0:
+                self._writePendingChunk()
+        finally:
+            for shardFile, _, _, _, _ in self._pendingChunks:
+                shardFile.close()
+            self._pendingChunks.clear()
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+            self._index.close()
+            self._index = None
+
+
+class ShardIndex:
+    """
+    Index des contenus d'un mailing écrit par ShardedMailer, pour relire un contenu à partir de son numéro
+    sans parcourir ni décompresser tout son shard : seul le bloc qui le contient est lu puis décompressé.
+    """
+
+    # Fonction de décompression selon l'extension des shards
+    decompressions: Dict[str, Callable[[bytes], bytes]] = {
+        '.gz': gzip.decompress,
+        '.zst': _decompressZstd,
+    }
+
+    def __init__(self, indexFile: Path) -> None:
+        """
+        :param indexFile: Index <stem>.index.tsv écrit par ShardedMailer, dans le répertoire des shards
+        :raise ValueError: si le fichier n'est pas un index de ShardedMailer
+        """
+        self.directory = indexFile.parent
+        self.shardNames: List[str] = []
+        shardNumbers: Dict[str, int] = {}
+        # Un tableau par colonne plutôt qu'un tuple par contenu : quelques octets par contenu indexé
+        self._shards = array('I')
+        self._blockOffsets = array('q')
+        self._blockLengths = array('q')
+        self._offsets = array('q')
+        self._lengths = array('q')
+        with open(indexFile, encoding='utf-8') as index:
+            if index.readline() != ShardedMailer.indexHeader:
+                raise ValueError(f"{indexFile} n'est pas un index de mailing.")
+            for row, line in enumerate(index):
+                rowNumber, shardName, blockOffset, blockLength, offset, length = line.rstrip('\n').split('\t')
+                if int(rowNumber) != row:
+                    raise ValueError(f"Index {indexFile} incohérent à la ligne {row + 2}.")
+                if shardName not in shardNumbers:
+                    shardNumbers[shardName] = len(self.shardNames)
+                    self.shardNames.append(shardName)
+                self._shards.append(shardNumbers[shardName])
+                self._blockOffsets.append(int(blockOffset))
+                self._blockLengths.append(int(blockLength))
+                self._offsets.append(int(offset))
+                self._lengths.append(int(length))
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def locate(self, row: int) -> Tuple[Path, int, int, int, int]:
+        """
+        :return: Shard du contenu numéro row, position et taille de son bloc dans le shard,
+                 position et taille du contenu dans le bloc décompressé
+        :raise IndexError: si le contenu n'existe pas
+        """
+        return (self.directory / self.shardNames[self._shards[row]], self._blockOffsets[row], self._blockLengths[row],
+                self._offsets[row], self._lengths[row])
+
+    def readMailing(self, row: int) -> bytes:
+        """
+        Relit le contenu formaté numéro row, encodé en UTF-8 et sans séparateur.
+        :raise IndexError: si le contenu n'existe pas
+        """
+        shardFile, blockOffset, blockLength, offset, length = self.locate(row)
+        with open(shardFile, 'rb') as shard:
+            shard.seek(blockOffset)
+            block = shard.read(blockLength)
+        decompress = self.decompressions.get(shardFile.suffix)
+        if decompress is not None:
+            block = decompress(block)
+        return block[offset:offset + length]
+
+
+#=====================================================================================
+# Tests de la classe ShardedMailer
+#=====================================================================================
+import tempfile
+import time
+
+
+def _main() -> None:
+    """
+    Compare l'écriture d'un mailing volumineux en un seul fichier, en shards et en shards compressés,
+    vérifie que chaque configuration produit les mêmes contenus et relit quelques contenus par l'index.
+    """
+    from Benchmark import generateRows, generateTemplate
+    from MailingPipeline import MailingPipeline
+    from TemplateManager import TemplateManager
+
+    scenario = {'fieldCount': 10, 'valueLength': 20, 'staticLength': 2000, 'repeatCount': 1, 'rowCount': 50000}
+    fieldNames, rows = generateRows(scenario)
+    fieldColumns = [list(column) for column in zip(*rows)]
+    batchSize = 1000
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        templateFile = Path(tmpDir) / 'template.html'
+        templateFile.write_text(generateTemplate(scenario), encoding='utf-8')
+        template = TemplateManager(htmlFile=templateFile, providedFieldNames=fieldNames)
+        batches = [template.fillOut__withPresizedBytesBatchAndLengths([column[start:start + batchSize]
+                                                                       for column in fieldColumns], Mailer.separatorBytes)
+                   for start in range(0, len(rows), batchSize)]
+
+        start = time.perf_counter()
+        with Mailer(Path(tmpDir) / 'output.html') as mailer:
+            for joinedContents, contentLengths in batches:
+                mailer.addJoinedMailingsBytes(joinedContents, len(contentLengths))
+        print(f"Mailer : {time.perf_counter() - start:.2f} secondes pour {len(rows)} contenus")
+        expectedContents = b''.join(joinedContents for joinedContents, _ in batches).split(Mailer.separatorBytes)
+
+        configurations = [
+            {'shardBy': 'rows', 'shardSize': 10000},
+            {'shardBy': 'bytes', 'shardSize': 16 * 1024 * 1024},
+            {'shardBy': 'rows', 'shardSize': 10000, 'compression': 'gzip', 'compressionThreads': 1},
+            {'shardBy': 'rows', 'shardSize': 10000, 'compression': 'gzip'},
+        ]
+        if zstandard is not None:
+            configurations.append({'shardBy': 'rows', 'shardSize': 10000, 'compression': 'zstd'})
+        for i, configuration in enumerate(configurations):
+            outputDirectory = Path(tmpDir) / f"shards_{i}"
+            start = time.perf_counter()
+            with ShardedMailer(outputDirectory, **configuration) as mailer:
+                for joinedContents, contentLengths in batches:
+                    mailer.addJoinedMailingsBytes(joinedContents, len(contentLengths), contentLengths)
+            elapsedTime = time.perf_counter() - start
+            totalSize = sum(shardFile.stat().st_size for shardFile in mailer.shardFiles)
+            index = ShardIndex(mailer.indexFile)
+            sameContents = all(index.readMailing(row) == expectedContents[row] for row in range(0, len(index), 997))
+            print(f"{configuration} : {elapsedTime:.2f} secondes, {len(mailer.shardFiles)} shards, "
+                  f"{totalSize / 1024 / 1024:.1f} Mo, contenus relus identiques : {sameContents and len(index) == len(rows)}")
+
+        # Contenus contenant eux-mêmes le séparateur : ils ne sont indexés correctement que d'après leurs longueurs
+        contents = [b'<p>A</p>' + Mailer.separatorBytes + b'<p>1</p>', b'<p>B</p>' + Mailer.separatorBytes + b'<p>2</p>']
+        joinedContents = b''.join(content + Mailer.separatorBytes for content in contents)
+        with ShardedMailer(Path(tmpDir) / 'separators') as mailer:
+            try:
+                mailer.addJoinedMailingsBytes(joinedContents, len(contents))
+            except ValueError as e:
+                print(f"Sans les longueurs : {e}")
+            mailer.addJoinedMailingsBytes(joinedContents, len(contents), list(map(len, contents)))
+        index = ShardIndex(mailer.indexFile)
+        print(f"Avec les longueurs, contenus relus identiques : {[index.readMailing(row) for row in range(len(index))] == contents}")
+
+        # Un fichier par destinataire, alimenté par le pipeline de génération
+        from MailingData import MailingData
+        data = MailingData(Path('data/simple_data.xlsx'))
+        simpleTemplate = TemplateManager(htmlFile=Path('data/simple_template.html'), providedFieldNames=data.fieldNames)
+        with ShardedMailer(Path(tmpDir) / 'recipients', shardBy='recipient', compression='gzip') as mailer:
+            MailingPipeline(simpleTemplate).run(data, mailer)
+        print(f"Un fichier par destinataire : {[shardFile.name for shardFile in mailer.shardFiles]}")
+        print(ShardIndex(mailer.indexFile).readMailing(0).decode('utf-8'))
+
+
+if __name__ == '__main__':
+    _main()
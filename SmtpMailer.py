@@ -0,0 +1,535 @@
+import asyncio
+import base64
+from email.message import EmailMessage
+import email.policy
+from email.utils import formatdate, make_msgid
+import ssl
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Tuple
+
+
+class SmtpError(Exception):
+    """
+    Réponse d'erreur d'un serveur SMTP. code vaut None si la connexion a été perdue.
+    """
+
+    def __init__(self, code: Optional[int], message: str) -> None:
+        super().__init__(f"{code} {message}" if code is not None else message)
+        self.code = code
+        self.message = message
+
+    @property
+    def isTransient(self) -> bool:
+        """
+        True si l'envoi peut être retenté : erreur temporaire (4xx) ou connexion perdue.
+        """
+        return self.code is None or 400 <= self.code < 500
+
+
+class SmtpConnection:
+    """
+    Connexion SMTP persistante sur laquelle plusieurs messages sont envoyés successivement.
+    Si le serveur annonce l'extension PIPELINING (RFC 2920), les commandes MAIL, RCPT et DATA
+    d'un message sont envoyées en un seul aller-retour.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._timeout = timeout
+        self.extensions: Dict[str, str] = {}
+        # Date (horloge de la boucle asyncio) avant laquelle le prochain message ne doit pas être envoyé
+        self.nextSendTime = 0.0
+
+    @classmethod
+    async def open(cls, host: str, port: int, timeout: float = 30.0, useTls: bool = False, startTls: bool = False,
+                   sslContext: Optional[ssl.SSLContext] = None, username: Optional[str] = None,
+                   password: Optional[str] = None, localHostname: str = 'localhost') -> 'SmtpConnection':
+        """
+        Ouvre une connexion SMTP : accueil, EHLO, puis si demandé STARTTLS et authentification AUTH PLAIN.
+        :param useTls: Connexion chiffrée dès l'ouverture (SMTPS, port 465)
+        :param startTls: Chiffrement de la connexion par la commande STARTTLS (port 587)
+        :raise SmtpError: si le serveur refuse une étape de l'ouverture
+        """
+        if (useTls or startTls) and sslContext is None:
+            sslContext = ssl.create_default_context()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=sslContext if useTls else None), timeout)
+        connection = cls(reader, writer, timeout)
+        try:
+            await connection._expect((220,))
+            await connection._hello(localHostname)
+            if startTls:
+                await connection._command(b'STARTTLS', (220,))
+                await writer.start_tls(sslContext, server_hostname=host)
+                await connection._hello(localHostname)
+            if username is not None:
+                credentials = base64.b64encode(f"\0{username}\0{password or ''}".encode('utf-8'))
+                await connection._command(b'AUTH PLAIN ' + credentials, (235,))
+        except BaseException:
+            connection.abort()
+            raise
+        return connection
+
+    async def sendMessage(self, sender: str, recipients: Sequence[str], message: bytes) -> List[str]:
+        """
+        Envoie un message à ses destinataires.
+        :param message: Message complet (en-têtes et corps) avec des fins de ligne CRLF
+        :return: Destinataires refusés par le serveur (le message est envoyé aux autres)
+        :raise SmtpError: si le message n'a pu être envoyé à aucun destinataire
+        """
+        # Corps en UTF-8 8 bits : le déclare si le serveur l'annonce (RFC 6152)
+        bodyParameter = ' BODY=8BITMIME' if '8BITMIME' in self.extensions else ''
+        commands = [f"MAIL FROM:<{sender}>{bodyParameter}".encode('utf-8')]
+        commands += [f"RCPT TO:<{recipient}>".encode('utf-8') for recipient in recipients]
+        commands.append(b'DATA')
+        if 'PIPELINING' in self.extensions:
+            # Un seul aller-retour pour toutes les commandes de l'enveloppe
+            self._writer.write(b''.join(command + b'\r\n' for command in commands))
+            await self._drain()
+            replies = [await self._readReply() for _ in commands]
+        else:
+            replies = []
+            for command in commands:
+                replies.append(await self._commandReply(command))
+                if replies[0][0] != 250:
+                    break
+        (mailCode, mailMessage), *recipientReplies = replies[:len(commands) - 1]
+        refusedRecipients = [recipient for recipient, (code, _) in zip(recipients, recipientReplies)
+                             if code not in (250, 251)]
+        dataCode, dataMessage = replies[-1] if len(replies) == len(commands) else (None, '')
+
+        if mailCode != 250 or dataCode != 354 or len(refusedRecipients) == len(recipients):
+            if dataCode == 354:
+                # Le serveur attend le corps du message, et DATA ne peut pas être annulé : '.' seul termine
+                # et valide un message vide. Il n'est délivré à personne, car aucun destinataire n'a été accepté
+                # (ou MAIL FROM a été refusé), et la connexion reste utilisable pour le message suivant
+                self._writer.write(b'.\r\n')
+                await self._drain()
+                await self._readReply()
+            await self._reset()
+            if mailCode != 250:
+                raise SmtpError(mailCode, mailMessage)
+            refusedCodes = [(code, message) for code, message in recipientReplies if code not in (250, 251)]
+            raise SmtpError(*(refusedCodes[0] if refusedCodes else (dataCode, dataMessage)))
+
+        self._writer.write(self._dotStuff(message))
+        await self._drain()
+        code, reply = await self._readReply()
+        if code != 250:
+            raise SmtpError(code, reply)
+        return refusedRecipients
+
+    async def quit(self) -> None:
+        """
+        Termine la session SMTP et ferme la connexion, sans lever d'exception.
+        """
+        try:
+            await self._command(b'QUIT', (221,))
+        except (OSError, SmtpError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        self.abort()
+
+    def abort(self) -> None:
+        """
+        Ferme immédiatement la connexion.
+        """
+        self._writer.close()
+
+    @staticmethod
+    def _dotStuff(message: bytes) -> bytes:
+        """
+        Prépare le corps du message pour la commande DATA : double les points en début de ligne
+        et ajoute la ligne finale '.'.
+        """
+        if message.startswith(b'.'):
+            message = b'.' + message
+        message = message.replace(b'\r\n.', b'\r\n..')
+        if not message.endswith(b'\r\n'):
+            message += b'\r\n'
+        return message + b'.\r\n'
+
+    async def _hello(self, localHostname: str) -> None:
+        """
+        Envoie EHLO et mémorise les extensions annoncées par le serveur.
+        """
+        _, reply = await self._command(f"EHLO {localHostname}".encode('utf-8'), (250,))
+        self.extensions = {}
+        for line in reply.splitlines()[1:]:
+            keyword, _, parameters = line.partition(' ')
+            self.extensions[keyword.upper()] = parameters
+
+    async def _reset(self) -> None:
+        """
+        Annule la transaction en cours pour pouvoir réutiliser la connexion.
+        """
+        await self._command(b'RSET', (250,))
+
+    async def _command(self, command: bytes, expectedCodes: Tuple[int, ...]) -> Tuple[int, str]:
+        """
+        Envoie une commande et vérifie le code de la réponse.
+        :raise SmtpError: si le code de la réponse n'est pas dans expectedCodes
+        """
+        code, reply = await self._commandReply(command)
+        if code not in expectedCodes:
+            raise SmtpError(code, reply)
+        return code, reply
+
+    async def _commandReply(self, command: bytes) -> Tuple[int, str]:
+        self._writer.write(command + b'\r\n')
+        await self._drain()
+        return await self._readReply()
+
+    async def _expect(self, expectedCodes: Tuple[int, ...]) -> Tuple[int, str]:
+        code, reply = await self._readReply()
+        if code not in expectedCodes:
+            raise SmtpError(code, reply)
+        return code, reply
+
+    async def _drain(self) -> None:
+        await asyncio.wait_for(self._writer.drain(), self._timeout)
+
+    async def _readReply(self) -> Tuple[int, str]:
+        """
+        Lit une réponse, éventuellement sur plusieurs lignes ('250-...' puis '250 ...').
+        :raise SmtpError: si la connexion est fermée ou si la réponse est mal formée
+        """
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self._reader.readline(), self._timeout)
+            if not line.endswith(b'\n'):
+                raise SmtpError(None, "Connexion SMTP fermée par le serveur.")
+            line = line.rstrip(b'\r\n').decode('utf-8', errors='replace')
+            if len(line) < 3 or not line[:3].isdigit():
+                raise SmtpError(None, f"Réponse SMTP invalide : {line!r}")
+            lines.append(line[4:])
+            if line[3:4] != '-':
+                return int(line[:3]), '\n'.join(lines)
+
+
+class SmtpMailer:
+    """
+    Classe pour envoyer les contenus formatés par SMTP, en remplacement de l'écriture dans un fichier HTML (cf. Mailer).
+    Les messages sont placés dans une file bornée (maxInFlight) : addMailing() attend lorsque la file est pleine,
+    ce qui ralentit le remplissage du modèle au rythme des envois. poolSize tâches asyncio vident la file,
+    chacune sur sa propre connexion SMTP persistante, avec au plus maxRatePerConnection messages par seconde.
+    Un envoi en échec temporaire (code 4xx, connexion perdue, délai dépassé) est retenté au plus maxRetries fois,
+    avec un délai doublé à chaque tentative. Les envois définitivement en échec sont listés dans failedMailings.
+    Si une tâche d'envoi s'arrête sur une autre exception, addMailing() et close() la relèvent au lieu d'attendre
+    indéfiniment une place dans la file ou la fin des envois.
+    Utilisation :
+        async with SmtpMailer('smtp.example.com', 587, sender='noreply@example.com', startTls=True) as mailer:
+            await mailer.addMailing(content, recipients, copyRecipients)
+    """
+
+    def __init__(self, host: str, port: int = 25, sender: str = '', subject: str = '', poolSize: int = 4,
+                 maxInFlight: int = 100, maxRatePerConnection: float = 0.0, maxRetries: int = 3,
+                 retryDelay: float = 1.0, timeout: float = 30.0, useTls: bool = False, startTls: bool = False,
+                 sslContext: Optional[ssl.SSLContext] = None, username: Optional[str] = None,
+                 password: Optional[str] = None) -> None:
+        """
+        :param host: Serveur SMTP
+        :param port: Port du serveur SMTP
+        :param sender: Adresse de l'expéditeur (en-tête From et enveloppe)
+        :param subject: Objet des messages
+        :param poolSize: Nombre de connexions SMTP simultanées
+        :param maxInFlight: Nombre maximal de messages en attente d'envoi
+        :param maxRatePerConnection: Nombre maximal de messages par seconde et par connexion (0 : pas de limite)
+        :param maxRetries: Nombre maximal de nouvelles tentatives d'un envoi en échec temporaire
+        :param retryDelay: Délai en secondes avant la 1ère nouvelle tentative
+        :param timeout: Délai maximal en secondes d'attente d'une réponse du serveur
+        :param useTls: Connexion chiffrée dès l'ouverture (SMTPS)
+        :param startTls: Chiffrement de la connexion par la commande STARTTLS
+        :param sslContext: Contexte TLS (par défaut ssl.create_default_context())
+        :param username: Identifiant d'authentification (AUTH PLAIN), ou None pour ne pas s'authentifier
+        :param password: Mot de passe d'authentification
+        :raise ValueError: si poolSize ou maxInFlight n'est pas strictement positif,
+                           ou si maxRatePerConnection, maxRetries ou retryDelay est négatif
+        """
+        if poolSize < 1:
+            raise ValueError("Le nombre de connexions doit être strictement positif.")
+        if maxInFlight < 1:
+            raise ValueError("Le nombre de messages en attente doit être strictement positif.")
+        if maxRatePerConnection < 0 or maxRetries < 0 or retryDelay < 0:
+            raise ValueError("Le débit maximal, le nombre de tentatives et le délai ne peuvent pas être négatifs.")
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.subject = subject
+        self.poolSize = poolSize
+        self.maxInFlight = maxInFlight
+        self.maxRatePerConnection = maxRatePerConnection
+        self.maxRetries = maxRetries
+        self.retryDelay = retryDelay
+        self._connectionOptions: Dict[str, Any] = {
+            'timeout': timeout, 'useTls': useTls, 'startTls': startTls, 'sslContext': sslContext,
+            'username': username, 'password': password,
+        }
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # Statistiques d'envoi
+        self.sentCount = 0
+        self.retryCount = 0
+        self.connectionCount = 0
+        self.refusedRecipients: List[str] = []
+        self.failedMailings: List[Tuple[List[str], str]] = []
+
+    async def __aenter__(self) -> 'SmtpMailer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, excType, excValue, traceback) -> None:
+        """
+        Attend l'envoi des messages en attente puis ferme les connexions, sauf en cas d'exception
+        où les envois en attente sont abandonnés.
+        """
+        if excType is None:
+            await self.close()
+        else:
+            await self.abort()
+
+    async def start(self) -> None:
+        """
+        Crée la file d'envoi et démarre les tâches d'envoi. Les connexions sont ouvertes au 1er message.
+        """
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxInFlight)
+        self._workers = [asyncio.create_task(self._sendQueuedMailings()) for _ in range(self.poolSize)]
+
+    async def addMailing(self, formattedContent: str, recipients: Sequence[str],
+                         copyRecipients: Sequence[str] = ()) -> None:
+        """
+        Ajoute un contenu formaté à la file d'envoi. Attend si maxInFlight messages sont déjà en attente.
+        :param formattedContent: Contenu HTML du message
+        :param recipients: Adresses des destinataires (en-tête To)
+        :param copyRecipients: Adresses des destinataires en copie (en-tête Cc)
+        :raise RuntimeError: si le SmtpMailer n'est pas démarré
+        :raise Exception: l'exception qui a arrêté une tâche d'envoi, le cas échéant
+        """
+        if self._queue is None:
+            raise RuntimeError("Le SmtpMailer doit être démarré par start() ou par async with.")
+        self._raiseWorkerFailure()
+        if len(recipients) + len(copyRecipients) == 0:
+            self.failedMailings.append(([], "Aucun destinataire."))
+            return
+        mailing = (formattedContent, list(recipients), list(copyRecipients))
+        if not self._queue.full():
+            self._queue.put_nowait(mailing)
+            return
+        await self._awaitWhileWorkersRun(self._queue.put(mailing))
+
+    async def close(self) -> None:
+        """
+        Attend l'envoi de tous les messages en attente, termine les sessions SMTP et arrête les tâches d'envoi.
+        Les appels suivants sont sans effet.
+        """
+        if self._queue is None:
+            return
+        try:
+            await self._awaitWhileWorkersRun(self._queue.join())
+        except BaseException:
+            await self.abort()
+            raise
+        for _ in self._workers:
+            await self._queue.put(None)
+        await asyncio.gather(*self._workers)
+        self._queue = None
+        self._workers = []
+
+    async def abort(self) -> None:
+        """
+        Arrête les tâches d'envoi sans attendre les messages en attente.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue = None
+        self._workers = []
+
+    def buildMessage(self, formattedContent: str, recipients: Sequence[str], copyRecipients: Sequence[str]) -> bytes:
+        """
+        Construit le message MIME HTML encodé, avec des fins de ligne CRLF.
+        """
+        message = EmailMessage()
+        message['From'] = self.sender
+        if recipients:
+            message['To'] = ', '.join(recipients)
+        if copyRecipients:
+            message['Cc'] = ', '.join(copyRecipients)
+        message['Subject'] = self.subject
+        message['Date'] = formatdate(localtime=True)
+        # Domaine de l'expéditeur fourni : make_msgid() n'a pas à résoudre le nom de la machine à chaque message
+        message['Message-ID'] = make_msgid(domain=self.sender.rpartition('@')[2] or 'localhost')
+        message.set_content(formattedContent, subtype='html', charset='utf-8')
+        return message.as_bytes(policy=email.policy.SMTP)
+
+    async def _awaitWhileWorkersRun(self, awaitable: Awaitable[Any]) -> None:
+        """
+        Attend awaitable (place libre dans la file ou fin des envois) tant que les tâches d'envoi fonctionnent.
+        :raise Exception: l'exception qui a arrêté une tâche d'envoi avant la fin de l'attente
+        """
+        waiting = asyncio.ensure_future(awaitable)
+        await asyncio.wait([waiting, *self._workers], return_when=asyncio.FIRST_COMPLETED)
+        if not waiting.done():
+            waiting.cancel()
+            self._raiseWorkerFailure()
+            raise RuntimeError("Les tâches d'envoi SMTP se sont arrêtées.")
+        waiting.result()
+
+    def _raiseWorkerFailure(self) -> None:
+        """
+        Relève l'exception qui a arrêté une tâche d'envoi, s'il y en a une.
+        """
+        for worker in self._workers:
+            if worker.done() and not worker.cancelled() and worker.exception() is not None:
+                raise worker.exception()
+
+    async def _sendQueuedMailings(self) -> None:
+        """
+        Tâche d'envoi : envoie les messages de la file sur une connexion persistante jusqu'à recevoir None.
+        """
+        connection: Optional[SmtpConnection] = None
+        try:
+            while True:
+                mailing = await self._queue.get()
+                try:
+                    if mailing is None:
+                        return
+                    connection = await self._sendMailing(connection, *mailing)
+                finally:
+                    self._queue.task_done()
+        finally:
+            if connection is not None:
+                if asyncio.current_task().cancelling():
+                    connection.abort()
+                else:
+                    await connection.quit()
+
+    async def _sendMailing(self, connection: Optional[SmtpConnection], formattedContent: str,
+                           recipients: List[str], copyRecipients: List[str]) -> Optional[SmtpConnection]:
+        """
+        Envoie un message en retentant les échecs temporaires.
+        :return: Connexion à réutiliser pour le message suivant (None si elle a été perdue)
+        """
+        envelopeRecipients = recipients + copyRecipients
+        try:
+            message = self.buildMessage(formattedContent, recipients, copyRecipients)
+        except (ValueError, TypeError) as e:
+            # Adresse ou en-tête invalide : le message ne pourra jamais être envoyé
+            self.failedMailings.append((envelopeRecipients, str(e)))
+            return connection
+        for attempt in range(self.maxRetries + 1):
+            try:
+                if connection is None:
+                    connection = await SmtpConnection.open(self.host, self.port, **self._connectionOptions)
+                    self.connectionCount += 1
+                await self._waitForRateLimit(connection)
+                self.refusedRecipients += await connection.sendMessage(self.sender, envelopeRecipients, message)
+                self.sentCount += 1
+                return connection
+            except (SmtpError, OSError, asyncio.TimeoutError) as e:
+                error = e if isinstance(e, SmtpError) else SmtpError(None, str(e) or type(e).__name__)
+            if error.code is None or error.code == 421:
+                # Connexion perdue ou fermée par le serveur : une nouvelle connexion sera ouverte
+                if connection is not None:
+                    connection.abort()
+                connection = None
+            if not error.isTransient or attempt == self.maxRetries:
+                self.failedMailings.append((envelopeRecipients, str(error)))
+                return connection
+            self.retryCount += 1
+            await asyncio.sleep(self.retryDelay * 2 ** attempt)
+        return connection
+
+    async def _waitForRateLimit(self, connection: SmtpConnection) -> None:
+        """
+        Attend si besoin pour ne pas dépasser maxRatePerConnection messages par seconde sur la connexion.
+        """
+        if self.maxRatePerConnection == 0:
+            return
+        now = asyncio.get_running_loop().time()
+        if connection.nextSendTime > now:
+            await asyncio.sleep(connection.nextSendTime - now)
+        connection.nextSendTime = max(now, connection.nextSendTime) + 1 / self.maxRatePerConnection
+
+
+async def sendMailing(data: Any, template: Any, mailer: SmtpMailer) -> int:
+    """
+    Remplit le modèle pour chaque ligne de données et envoie chaque contenu à ses destinataires
+    (colonnes DESTINATAIRES et DESTINATAIRES_COPIE).
+    :param data: Données du mailing (MailingData)
+    :param template: Modèle construit avec data.fieldNames (TemplateManager)
+    :return: Nombre de messages ajoutés à la file d'envoi
+    """
+    count = 0
+    for recipients, copyRecipients, fieldValues in data.nextRecipientsAndFieldValues():
+        await mailer.addMailing(template.fillOut__withCompiledPlan(fieldValues), recipients, copyRecipients)
+        count += 1
+    return count
+
+
+#=====================================================================================
+# Tests de la classe SmtpMailer
+#=====================================================================================
+from pathlib import Path
+import tempfile
+import time
+
+
+def _main() -> None:
+    """
+    Envoie un mailing à un serveur SMTP local (aiosmtpd) qui simule une latence de traitement,
+    avec un nombre croissant de connexions.
+    """
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        print("Le module aiosmtpd est nécessaire pour ce test : pip install aiosmtpd")
+        return
+
+    from Benchmark import generateRows, writeDataFiles
+    from MailingData import MailingData
+    from TemplateManager import TemplateManager
+
+    class LatencyHandler:
+        """
+        Serveur SMTP de test : compte les messages reçus après une latence de 20 ms par message.
+        """
+        def __init__(self) -> None:
+            self.receivedCount = 0
+
+        async def handle_DATA(self, server, session, envelope) -> str:
+            await asyncio.sleep(0.02)
+            self.receivedCount += 1
+            return '250 OK'
+
+    handler = LatencyHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=8025)
+    controller.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmpDir:
+            fieldNames, rows = generateRows({'fieldCount': 3, 'valueLength': 13, 'rowCount': 200})
+            _, csvFile = writeDataFiles(Path(tmpDir), fieldNames, rows)
+            data = MailingData(csvFile)
+            template = TemplateManager(Path('data/simple_template.html'), ['CHAMP1', 'CHAMP2', 'CHAMP3'])
+
+            for poolSize in (1, 4, 16):
+                async def run() -> SmtpMailer:
+                    async with SmtpMailer('127.0.0.1', 8025, sender='mailing@example.com', subject='Mailing',
+                                          poolSize=poolSize) as mailer:
+                        await sendMailing(data, template, mailer)
+                    return mailer
+
+                start = time.perf_counter()
+                mailer = asyncio.run(run())
+                duration = time.perf_counter() - start
+                print(f"{poolSize} connexion(s) : {mailer.sentCount} messages envoyés en {duration:.2f} s "
+                      f"({mailer.sentCount / duration:.0f} messages/s), {mailer.connectionCount} connexion(s) ouverte(s), "
+                      f"{len(mailer.failedMailings)} échec(s)")
+    finally:
+        controller.stop()
+    print(f"Messages reçus par le serveur : {handler.receivedCount}")
+
+
+if __name__ == '__main__':
+    _main()
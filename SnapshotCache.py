@@ -0,0 +1,246 @@
+import hashlib
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from DataSource import DataSource, XlsxDataSource, openDataSource
+
+
+class SnapshotDataSource(DataSource):
+    """
+    Instantané binaire d'une source de données, projeté en mémoire (mmap).
+    Format : en-tête magique, puis pour chaque lot de lignes une colonne après l'autre, chaque colonne
+    étant ses valeurs converties en str, jointes par '\\0' et encodées en UTF-8 ; à la fin, les métadonnées
+    JSON (en-tête, index des lots, description du fichier source) suivies de leur longueur sur 8 octets.
+    Un lot de colonnes est décodé en un seul appel puis découpé par str.split(), sans boucle Python par cellule.
+    """
+
+    magic = b'MAILDATA-SNAPSHOT-1\n'
+    _trailer = struct.Struct('<Q')
+
+    def __init__(self, snapshotFile: Path) -> None:
+        """
+        :param snapshotFile: Fichier d'instantané écrit par SnapshotCache
+        :raise ValueError: si le fichier n'est pas un instantané valide
+        """
+        self._snapshotFile = snapshotFile
+        self.metadata = self.readMetadata(snapshotFile)
+
+    @classmethod
+    def readMetadata(cls, snapshotFile: Path) -> Dict[str, Any]:
+        """
+        Lit les métadonnées d'un instantané.
+        :raise ValueError: si le fichier n'est pas un instantané valide
+        """
+        with open(snapshotFile, 'rb') as snapshot:
+            if snapshot.read(len(cls.magic)) != cls.magic:
+                raise ValueError(f"{snapshotFile} n'est pas un instantané de données.")
+            snapshot.seek(-cls._trailer.size, os.SEEK_END)
+            (metadataLength,) = cls._trailer.unpack(snapshot.read(cls._trailer.size))
+            snapshot.seek(-cls._trailer.size - metadataLength, os.SEEK_END)
+            try:
+                return json.loads(snapshot.read(metadataLength).decode('utf-8'))
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise ValueError(f"Métadonnées de l'instantané {snapshotFile} illisibles.") from e
+
+    def readHeader(self) -> List[Any]:
+        return list(self.metadata['header'])
+
+    def dataRows(self, columnIndices: Optional[Sequence[int]] = None) -> Iterator[Sequence[Any]]:
+        for columns in self.dataColumns(columnIndices):
+            yield from zip(*columns)
+
+    def dataColumns(self, columnIndices: Optional[Sequence[int]] = None) -> Iterator[List[List[str]]]:
+        """
+        Retourne un itérateur sur les lots de lignes de l'instantané, sous forme de colonnes de str.
+        :param columnIndices: Indices des seules colonnes à décoder, ou None pour toutes.
+                              Les pages des autres colonnes ne sont jamais lues.
+        """
+        with open(self._snapshotFile, 'rb') as snapshot:
+            with mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as mappedFile:
+                for _, columnExtents in self.metadata['batches']:
+                    if columnIndices is not None:
+                        columnExtents = [columnExtents[i] for i in columnIndices]
+                    yield [mappedFile[offset:offset + length].decode('utf-8').split('\0')
+                           for offset, length in columnExtents]
+
+    @classmethod
+    def write(cls, snapshotFile: Path, source: DataSource, sourceDescription: Dict[str, Any],
+              batchSize: int = 4096) -> bool:
+        """
+        Écrit l'instantané d'une source de données. Les valeurs sont converties par str() et les lignes
+        complétées par '' jusqu'à la largeur de l'en-tête.
+        :return: False si une valeur contient '\\0' et ne peut pas être stockée (aucun fichier n'est écrit)
+        """
+        header = [str(column) for column in source.readHeader()]
+        columnCount = len(header)
+        batches = []
+        # Fichier temporaire de nom unique : plusieurs threads ou processus peuvent écrire le même instantané
+        output = tempfile.NamedTemporaryFile(dir=snapshotFile.parent, prefix=f"{snapshotFile.name}.", suffix='.tmp',
+                                             delete=False)
+        temporaryFile = Path(output.name)
+        try:
+            with output:
+                output.write(cls.magic)
+                rows = source.dataRows()
+                while True:
+                    batch = [row for _, row in zip(range(batchSize), rows)]
+                    if len(batch) == 0:
+                        break
+                    columnExtents = []
+                    for i in range(columnCount):
+                        columnText = '\0'.join([str(row[i]) if i < len(row) else '' for row in batch])
+                        if columnText.count('\0') != len(batch) - 1:
+                            return False
+                        encodedColumn = columnText.encode('utf-8')
+                        columnExtents.append([output.tell(), len(encodedColumn)])
+                        output.write(encodedColumn)
+                    batches.append([len(batch), columnExtents])
+                metadata = json.dumps({'header': header, 'batches': batches, 'source': sourceDescription})
+                encodedMetadata = metadata.encode('utf-8')
+                output.write(encodedMetadata)
+                output.write(cls._trailer.pack(len(encodedMetadata)))
+            os.replace(temporaryFile, snapshotFile)
+            return True
+        finally:
+            temporaryFile.unlink(missing_ok=True)
+
+
+class SnapshotCache:
+    """
+    Cache sur disque d'instantanés des fichiers xlsx, indexé par le chemin absolu du fichier.
+    Un instantané n'est réutilisé que si la taille et la date de modification du fichier (et, si demandé,
+    son empreinte SHA-256) sont inchangées. Les instantanés les moins récemment utilisés sont supprimés
+    lorsque la taille totale du cache dépasse maxSize.
+    """
+
+    suffix = '.snapshot'
+
+    def __init__(self, cacheDirectory: Path, maxSize: int = 1024 * 1024 * 1024, verifyHash: bool = False) -> None:
+        """
+        :param cacheDirectory: Répertoire des instantanés (créé si besoin)
+        :param maxSize: Taille totale maximale des instantanés, en octets
+        :param verifyHash: Si True, l'empreinte SHA-256 du fichier est aussi comparée (relecture complète du fichier)
+        :raise ValueError: si maxSize n'est pas strictement positif
+        """
+        if maxSize < 1:
+            raise ValueError("La taille du cache doit être strictement positive.")
+        cacheDirectory.mkdir(parents=True, exist_ok=True)
+        self.cacheDirectory = cacheDirectory
+        self.maxSize = maxSize
+        self.verifyHash = verifyHash
+        # Compteurs d'utilisation du cache
+        self.hits = 0
+        self.misses = 0
+
+    def openDataSource(self, dataFile: Path, streaming: bool = False) -> DataSource:
+        """
+        Retourne l'instantané du fichier xlsx s'il est à jour, sinon lit le fichier, écrit son instantané
+        et retourne ce dernier. Les autres formats, déjà rapides à lire, ne sont pas mis en cache.
+        :param streaming: Lecture à la demande du fichier xlsx lors de l'écriture de l'instantané
+        """
+        if dataFile.suffix.lower() not in ('.xlsx', '.xlsm'):
+            return openDataSource(dataFile, streaming=streaming)
+
+        snapshotFile = self._snapshotFile(dataFile, streaming)
+        sourceDescription = self._describe(dataFile, streaming)
+        try:
+            snapshot = SnapshotDataSource(snapshotFile)
+            if snapshot.metadata.get('source') == sourceDescription:
+                self.hits += 1
+                # Met à jour la date de dernière utilisation pour l'éviction
+                os.utime(snapshotFile)
+                return snapshot
+        except (OSError, ValueError):
+            pass
+
+        self.misses += 1
+        source = XlsxDataSource(dataFile, streaming=streaming)
+        try:
+            if not SnapshotDataSource.write(snapshotFile, source, sourceDescription):
+                return source
+        except OSError:
+            # L'instantané est une optimisation : une erreur d'écriture n'est pas bloquante
+            return source
+        self._evict(keep=snapshotFile)
+        return SnapshotDataSource(snapshotFile)
+
+    def _snapshotFile(self, dataFile: Path, streaming: bool) -> Path:
+        """
+        Le mode de lecture fait partie du nom : les instantanés des deux modes coexistent dans le cache.
+        """
+        pathHash = hashlib.sha256(str(dataFile.resolve()).encode('utf-8')).hexdigest()[:32]
+        readMode = 'streaming' if streaming else 'eager'
+        return self.cacheDirectory / f"{pathHash}-{readMode}{self.suffix}"
+
+    def _describe(self, dataFile: Path, streaming: bool) -> Dict[str, Any]:
+        """
+        Décrit l'état du fichier source, et le mode de lecture qui a produit l'instantané,
+        pour vérifier la validité de ce dernier.
+        """
+        fileStat = dataFile.stat()
+        description: Dict[str, Any] = {
+            'path': str(dataFile.resolve()),
+            'size': fileStat.st_size,
+            'mtime': fileStat.st_mtime_ns,
+            'streaming': streaming,
+        }
+        if self.verifyHash:
+            digest = hashlib.sha256()
+            with open(dataFile, 'rb') as data:
+                for block in iter(lambda: data.read(1024 * 1024), b''):
+                    digest.update(block)
+            description['sha256'] = digest.hexdigest()
+        return description
+
+    def _evict(self, keep: Optional[Path] = None) -> None:
+        """
+        Supprime les instantanés les moins récemment utilisés tant que la taille totale dépasse maxSize.
+        L'instantané keep, qui vient d'être écrit, est toujours conservé.
+        """
+        snapshots = []
+        for snapshotFile in self.cacheDirectory.glob(f"*{self.suffix}"):
+            try:
+                fileStat = snapshotFile.stat()
+            except OSError:
+                continue
+            snapshots.append((fileStat.st_mtime_ns, fileStat.st_size, snapshotFile))
+        totalSize = sum(size for _, size, _ in snapshots)
+        for _, size, snapshotFile in sorted(snapshots):
+            if totalSize <= self.maxSize:
+                break
+            if snapshotFile == keep:
+                continue
+            snapshotFile.unlink(missing_ok=True)
+            totalSize -= size
+
+
+#=====================================================================================
+# Tests de la classe SnapshotCache
+#=====================================================================================
+import time
+
+
+def _main() -> None:
+    """
+    Compare le temps jusqu'à la première ligne avec et sans instantané.
+    """
+    from MailingData import MailingData
+
+    xlsxFile = Path('data/simple_data.xlsx')
+    with tempfile.TemporaryDirectory() as tmpDir:
+        cache = SnapshotCache(Path(tmpDir))
+        for run, streaming in (('1ère exécution', False), ('2e exécution', False), ('Lecture à la demande', True)):
+            start = time.perf_counter()
+            mailingData = MailingData(xlsxFile, streaming=streaming, snapshotCache=cache)
+            firstRow = next(mailingData.nextFieldsValueAsList())
+            print(f"{run} : première ligne en {(time.perf_counter() - start) * 1000:.2f} ms : {firstRow}")
+        print(f"Instantanés réutilisés : {cache.hits}, écrits : {cache.misses}")
+
+
+if __name__ == '__main__':
+    _main()
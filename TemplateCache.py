@@ -0,0 +1,210 @@
+from collections import OrderedDict
+import hashlib
+import marshal
+import os
+from pathlib import Path
+import pickle
+import sys
+import threading
+from typing import List, Optional
+
+from TemplateManager import TemplateManager
+
+
+class TemplateCache:
+    """
+    Cache de modèles déjà segmentés (TemplateManager), indexé par l'empreinte SHA-256 du contenu HTML
+    et la liste ordonnée des noms de champs fournis.
+    Le cache en mémoire est de type LRU avec éviction selon la taille totale des modèles conservés.
+    Un répertoire de cache optionnel permet de conserver les modèles segmentés sur disque (pickle),
+    afin que le cache soit déjà chaud après un redémarrage. Ce répertoire ne doit contenir
+    que des fichiers écrits par TemplateCache : pickle n'est pas sûr pour des données non fiables.
+    Les modèles retournés sont partagés : seules les méthodes fillOut__withCompiledPlan(), fillOut__withGeneratedCode()
+    et fillOut__withSegmentationAndColumns() peuvent être appelées simultanément depuis plusieurs threads.
+    La fonction de remplissage générée n'est compilée qu'au 1er appel de fillOut__withGeneratedCode() :
+    la construction d'un modèle et sa lecture depuis le disque ne la compilent pas.
+    La clé comprend la version du format des modèles (TemplateManager.formatVersion) : un modèle enregistré
+    par une autre version de TemplateManager n'est pas relu, il est segmenté à nouveau.
+    """
+
+    def __init__(self, maxSize: int = 64 * 1024 * 1024, cacheDirectory: Optional[Path] = None) -> None:
+        """
+        :param maxSize: Taille mémoire totale approximative (en octets) des modèles conservés en mémoire
+        :param cacheDirectory: Répertoire du cache sur disque (aucun cache sur disque si None)
+        :raise ValueError: si maxSize n'est pas strictement positif
+        """
+        if maxSize < 1:
+            raise ValueError("La taille du cache doit être strictement positive.")
+        self.maxSize = maxSize
+        self.cacheDirectory = cacheDirectory
+        if cacheDirectory is not None:
+            cacheDirectory.mkdir(parents=True, exist_ok=True)
+        self._templates: OrderedDict[str, TemplateManager] = OrderedDict()
+        self._templateSizes: dict[str, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        # Compteurs pour dimensionner le cache
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+
+    def getTemplate(self, htmlFile: Path, providedFieldNames: List[str]) -> TemplateManager:
+        """
+        Retourne le modèle segmenté correspondant au contenu de htmlFile et aux champs fournis.
+        Le fichier est toujours relu pour calculer son empreinte, mais il n'est segmenté
+        que s'il n'est présent ni en mémoire ni sur disque.
+        :raise ValueError: si tous les champs du modèle ne sont pas dans la liste providedFieldNames
+        """
+        key = self._computeKey(htmlFile.read_bytes(), providedFieldNames)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template
+
+        template = self._loadFromDisk(key)
+        if template is not None:
+            self.diskHits += 1
+        else:
+            self.misses += 1
+            template = TemplateManager(htmlFile=htmlFile, providedFieldNames=providedFieldNames)
+            self._saveToDisk(key, template)
+
+        with self._lock:
+            self._store(key, template)
+        return template
+
+    def clear(self) -> None:
+        """
+        Vide le cache en mémoire (le cache sur disque est conservé).
+        """
+        with self._lock:
+            self._templates.clear()
+            self._templateSizes.clear()
+            self._size = 0
+
+    @staticmethod
+    def _computeKey(content: bytes, providedFieldNames: List[str]) -> str:
+        """
+        Calcule la clé du cache à partir de la version du format des modèles, du contenu du modèle et de l'ordre
+        des champs fournis, qui détermine les indices calculés par TemplateManager._computeFieldValuesIndices().
+        """
+        digest = hashlib.sha256(f"TemplateManager {TemplateManager.formatVersion}\0".encode('ascii'))
+        digest.update(content)
+        for fieldName in providedFieldNames:
+            digest.update(b'\0')
+            digest.update(fieldName.encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _templateSize(template: TemplateManager) -> int:
+        """
+        Estime la taille mémoire d'un modèle segmenté : contenu, segments en str et en bytes, et code compilé
+        de la fonction de remplissage générée s'il existe déjà (modèle relu sur disque), estimé par sa taille marshal.
+        """
+        size = (sys.getsizeof(template._content) + sum(map(sys.getsizeof, template._compiledSegments))
+                + sum(map(sys.getsizeof, template._compiledSegmentsBytes)))
+        if template._renderCode is not None:
+            size += len(marshal.dumps(template._renderCode))
+        return size
+
+    def _store(self, key: str, template: TemplateManager) -> None:
+        """
+        Ajoute un modèle au cache en mémoire puis évince les modèles les moins récemment utilisés
+        tant que la taille maximale est dépassée. Doit être appelée avec le verrou acquis.
+        """
+        if key in self._templates:
+            self._templates.move_to_end(key)
+            return
+        templateSize = self._templateSize(template)
+        self._templates[key] = template
+        self._templateSizes[key] = templateSize
+        self._size += templateSize
+        # Conserve toujours au moins le dernier modèle, même s'il dépasse à lui seul la taille maximale
+        while self._size > self.maxSize and len(self._templates) > 1:
+            evictedKey, _ = self._templates.popitem(last=False)
+            self._size -= self._templateSizes.pop(evictedKey)
+
+    def _cacheFile(self, key: str) -> Path:
+        return self.cacheDirectory / f"{key}.pickle"
+
+    def _loadFromDisk(self, key: str) -> Optional[TemplateManager]:
+        """
+        Charge un modèle segmenté depuis le cache sur disque.
+        :return: le modèle, ou None s'il est absent, illisible ou d'une autre version du format
+        """
+        if self.cacheDirectory is None:
+            return None
+        try:
+            with open(self._cacheFile(key), 'rb') as cacheFile:
+                template = pickle.load(cacheFile)
+        except Exception:
+            # Fichier tronqué, corrompu ou écrit par une autre version des classes (UnpicklingError, EOFError,
+            # AttributeError, ImportError, TypeError, ValueError, etc.) : le modèle est segmenté à nouveau
+            return None
+        if not isinstance(template, TemplateManager) or template.__dict__.get('formatVersion') != TemplateManager.formatVersion:
+            return None
+        return template
+
+    def _saveToDisk(self, key: str, template: TemplateManager) -> None:
+        """
+        Enregistre un modèle segmenté dans le cache sur disque. L'écriture passe par un fichier temporaire
+        renommé ensuite, pour qu'un autre processus ne lise jamais un fichier partiellement écrit.
+        """
+        if self.cacheDirectory is None:
+            return
+        cacheFile = self._cacheFile(key)
+        temporaryFile = cacheFile.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(temporaryFile, 'wb') as output:
+                pickle.dump(template, output, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporaryFile, cacheFile)
+        except OSError:
+            # Le cache sur disque est une optimisation : une erreur d'écriture n'est pas bloquante
+            temporaryFile.unlink(missing_ok=True)
+
+
+#=====================================================================================
+# Tests de la classe TemplateCache
+#=====================================================================================
+import tempfile
+import timeit
+
+
+def _main() -> None:
+    """
+    Compare le chargement d'un modèle volumineux avec et sans cache.
+    """
+    executionCount = 1000
+    fieldNames = ['CHAMP1', 'CHAMP2', 'CHAMP3']
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        # Modèle volumineux : le modèle simple répété 1000 fois
+        templateFile = Path(tmpDir) / 'large_template.html'
+        templateFile.write_text(Path('data/simple_template.html').read_text(encoding='utf-8') * 1000, encoding='utf-8')
+
+        executionTime = timeit.timeit(
+            lambda: TemplateManager(htmlFile=templateFile, providedFieldNames=fieldNames),
+            number=executionCount
+        )
+        print(f"Sans cache : {executionTime:.2f} secondes pour {executionCount} chargements")
+
+        cache = TemplateCache(cacheDirectory=Path(tmpDir) / 'cache')
+        executionTime = timeit.timeit(
+            lambda: cache.getTemplate(templateFile, fieldNames),
+            number=executionCount
+        )
+        print(f"Avec cache : {executionTime:.2f} secondes pour {executionCount} chargements "
+              f"({cache.hits} en mémoire, {cache.diskHits} sur disque, {cache.misses} segmentations)")
+
+        # Simule un redémarrage : le cache en mémoire est vide mais le cache sur disque est chaud
+        restartedCache = TemplateCache(cacheDirectory=Path(tmpDir) / 'cache')
+        template = restartedCache.getTemplate(templateFile, fieldNames)
+        print(f"Après redémarrage : {restartedCache.diskHits} chargement depuis le disque, "
+              f"{restartedCache.misses} segmentation")
+        print(template.fillOut__withCompiledPlan(['VALEUR CHAMP1', 'VALEUR CHAMP2', 'VALEUR CHAMP3'])[:120])
+
+
+if __name__ == '__main__':
+    _main()
@@ -1,33 +1,113 @@
+import hashlib
+from functools import partial
+import importlib.util
+import marshal
 from pathlib import Path
+from operator import add, itemgetter
 import re
-from typing import List
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+from AhoCorasick import PlaceholderReplacer
+from Instrumentation import Instrumentation
+
+
+def _noFieldValues(fieldValues: Sequence[str]) -> tuple:
+    """
+    Extracteur des valeurs des champs d'un modèle sans champ (cf. TemplateManager._makeFieldValuesGetter()).
+    """
+    return ()
+
+
+def _singleFieldValue(fieldValueIndex: int, fieldValues: Sequence[str]) -> tuple:
+    """
+    Extracteur des valeurs des champs d'un modèle à un seul champ (cf. TemplateManager._makeFieldValuesGetter()).
+    """
+    return (fieldValues[fieldValueIndex],)
 
 
 class TemplateManager:
-    def __init__(self, htmlFile: Path, providedFieldNames: List[str]) -> None:
+    # Version du format des modèles sérialisés (pickle, cf. TemplateCache), à incrémenter à chaque modification
+    # des attributs conservés par __getstate__() : les modèles enregistrés dans un autre format ne sont pas relus
+    formatVersion: int = 5
+    # Nombre maximal de valeurs conservées dans le cache d'encodage avant qu'il soit vidé
+    maxEncodedValues: int = 100000
+    # Limites au-delà desquelles aucune fonction de remplissage n'est générée (cf. _makeRenderFunction()) :
+    # nombre de champs dans le modèle et taille du code source généré, en caractères
+    maxGeneratedFields: int = 10000
+    maxGeneratedSourceLength: int = 16 * 1024 * 1024
+    # Expression régulière des champs à remplacer du type [---nom---]
+    fieldPattern = re.compile(r'\[---(.*?)---\]')
+    # Méthodes mesurées lorsqu'une instrumentation est fournie, et étape correspondante
+    instrumentedMethods: dict[str, str] = {
+        'fillOut__withRegex': 'render',
+        'fillOut__withReplace': 'render',
+        'fillOut__withAhoCorasick': 'render',
+        'fillOut__withSegmentationAndDict': 'render',
+        'fillOut__withSegmentationAndList': 'render',
+        'fillOut__withSegmentationAndColumns': 'render',
+        'fillOut__withCompiledPlan': 'render',
+        'fillOut__withGeneratedCode': 'render',
+        'fillOut__withPresizedBatch': 'render',
+        'fillOut__withBytes': 'render',
+        'fillOut__withPresizedBytesBatch': 'render',
+        'fillOut__withPresizedBytesBatchAndLengths': 'render',
+        '_encodeColumn': 'encode',
+    }
+
+    def __init__(self, htmlFile: Path, providedFieldNames: List[str],
+                 instrumentation: Optional[Instrumentation] = None,
+                 delimiters: Sequence[Tuple[str, str]] = (('[---', '---]'),),
+                 missingFieldPolicy: Optional[str] = None, defaultValue: str = '') -> None:
         """
         Initialise la classe Template avec le contenu d'un fichier HTML et les noms de champs fournis.
-        Vérifie que tous les champs du modèle sont présents dans la liste fournie.
+        Vérifie que tous les champs du modèle sont présents dans la liste fournie, sauf si missingFieldPolicy est fourni.
         :param htmlFile: Fichier contenant le modèle HTML avec des champs à remplacer de la forme [---nom---]
         :param providedFieldNames: Liste de champs qui seront utilisés pour remplir le modèle
+        :param instrumentation: Si fourni, les méthodes de remplissage de cette instance sont mesurées
+                                (étapes 'render' et 'encode', cf. instrumentedMethods)
+        :param delimiters: Couples (délimiteur ouvrant, délimiteur fermant) des champs reconnus
+                           par fillOut__withAhoCorasick() ; les autres méthodes ne reconnaissent que [---nom---]
+        :param missingFieldPolicy: Traitement des champs du modèle absents des champs fournis, pour un modèle
+                                   dont certains champs sont facultatifs (cf. PlaceholderReplacer) :
+                                   - None : ValueError est levée dès la construction du modèle,
+                                   - 'leave' : le champ est laissé tel quel,
+                                   - 'default' : le champ est remplacé par defaultValue,
+                                   - 'error' : ValueError est levée (à la construction, et au remplissage par
+                                     fillOut__withAhoCorasick(), fillOut__withRegex() ou fillOut__withReplace()
+                                     pour un champ absent des valeurs fournies).
+                                   Avec None, ces trois méthodes laissent tels quels les champs absents
+                                   des valeurs fournies.
+        :param defaultValue: Valeur des champs absents avec la politique 'default'
+        :raise ValueError: si un champ du modèle est absent de providedFieldNames (politique None ou 'error'),
+                           ou si la politique est inconnue
         """
+        if missingFieldPolicy is not None and missingFieldPolicy not in PlaceholderReplacer.missingFieldPolicies:
+            raise ValueError(f"La politique des champs absents doit être parmi {', '.join(PlaceholderReplacer.missingFieldPolicies)}.")
+        self.delimiters = [tuple(delimiter) for delimiter in delimiters]
+        self.missingFieldPolicy = missingFieldPolicy
+        self.defaultValue = defaultValue
+
         # Lit le contenu du fichier HTML et le stocke dans l'attribut _content
         self._content = htmlFile.read_text(encoding='utf-8')
 
-        # Compile l'expression régulière pour trouver les champs à remplacer du type [---nom---]
-        self._fieldPattern = re.compile(r'\[---(.*?)---\]')
-
-        # Extrait les noms des champs du contenu HTML
-        self.templateFieldNames = self._fieldPattern.findall(self._content)
-
-        # Vérifie que les champs du modèle sont présents dans providedFieldNames
-        self._validateFieldNames(providedFieldNames)
+        # Expression régulière précompilée pour trouver les champs à remplacer du type [---nom---]
+        self._fieldPattern = self.fieldPattern
 
         # Découpe le contenu HTML au niveau des champs pour créer une liste de segments de contenu.
         # Par exemple, si le contenu est "Bonjour [---nom---], comment ça va en ce [---jour---] ?",
-        # les segments seront ['Bonjour ', '[---nom---]', ', comment ça va en ce ', '[---jour---]', ' ?']
+        # les segments seront ['Bonjour ', 'nom', ', comment ça va en ce ', 'jour', ' ?']
         self._contentSegments = self._fieldPattern.split(self._content)
 
+        if missingFieldPolicy is None:
+            # Extrait les noms des champs du contenu HTML
+            self.templateFieldNames = self._contentSegments[1::2]
+            # Vérifie que les champs du modèle sont présents dans providedFieldNames
+            self._validateFieldNames(providedFieldNames)
+        else:
+            # Les champs absents de providedFieldNames deviennent du texte statique, selon la politique
+            self._contentSegments = self._foldMissingFields(self._contentSegments, providedFieldNames)
+            self.templateFieldNames = self._contentSegments[1::2]
+
         # Indices des champs dans les segments de contenu
         # On commence à 1 et on saute deux en deux pour obtenir les indices des champs
         # Par exemple, pour le contenu ci-dessus, les indices seront [1, 3]
@@ -36,18 +116,93 @@ class TemplateManager:
         # Liste des indices des valeurs des champs à utiliser lors du remplissage par segmentation et liste
         self._contentSegmentsFieldValuesIndices = self._computeFieldValuesIndices(providedFieldNames)
 
+        # Plan de remplissage immuable, partageable entre threads : les segments sont figés dans un tuple
+        # et les valeurs des champs sont extraites dans l'ordre des champs du modèle en un seul appel
+        self._compiledSegments = tuple(self._contentSegments)
+        self._fieldValuesGetter = self._makeFieldValuesGetter(self._contentSegmentsFieldValuesIndices)
+
+        # Remplacement multi-motifs par automate d'Aho-Corasick, construit au 1er remplissage (cf. fillOut__withAhoCorasick())
+        self._placeholderReplacer: Optional[PlaceholderReplacer] = None
+
+        # Fonction de remplissage générée et compilée pour ce modèle au 1er appel de fillOut__withGeneratedCode(),
+        # et son code compilé, conservé lors de la sérialisation ; _renderIsGenerated est False si la fonction
+        # de remplissage est fillOut__withCompiledPlan(), à laquelle se ramène un modèle trop volumineux
+        self._renderFunction: Optional[Callable[[Sequence[str]], str]] = None
+        self._renderIsGenerated = False
+        self._renderCode = None
+
+        # Segments pré-encodés en UTF-8 pour le remplissage en bytes, et cache des valeurs déjà encodées
+        self._compiledSegmentsBytes = tuple(segment.encode('utf-8') for segment in self._compiledSegments)
+        self._encodedValues: dict[str, bytes] = {}
+
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.instrumentMethods(self, self.instrumentedMethods)
+
+    @classmethod
+    def readTemplateFieldNames(cls, htmlFile: Path) -> List[str]:
+        """
+        Retourne les noms des champs d'un modèle HTML, sans construire le modèle.
+        Permet de limiter la lecture des données aux seuls champs utilisés (cf. MailingData(requiredFieldNames=...))
+        avant de construire le modèle avec les noms des champs projetés.
+        """
+        return cls.fieldPattern.findall(htmlFile.read_text(encoding='utf-8'))
+
+    def __getstate__(self) -> dict:
+        """
+        Retourne l'état à sérialiser (pickle) : la fonction de remplissage générée n'est pas sérialisable,
+        mais son code compilé, s'il existe, est conservé par marshal avec le numéro de version du bytecode :
+        il n'est pas recompilé par une désérialisation avec la même version de Python.
+        """
+        state = self.__dict__.copy()
+        state['_renderFunction'] = None
+        state['_renderIsGenerated'] = False
+        # Les plans de remplissage par automate sont reconstruits au 1er remplissage
+        state['_placeholderReplacer'] = None
+        if self._renderCode is not None:
+            state['_renderCode'] = (importlib.util.MAGIC_NUMBER, marshal.dumps(self._renderCode))
+        # Version du format, vérifiée au chargement par TemplateCache
+        state['formatVersion'] = self.formatVersion
+        # L'instrumentation, et les méthodes qu'elle enveloppe, restent propres au processus
+        state['instrumentation'] = None
+        for methodName in self.instrumentedMethods:
+            state.pop(methodName, None)
+        # Le cache d'encodage est propre à chaque processus
+        state['_encodedValues'] = {}
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Restaure un modèle désérialisé sans relire ni redécouper le fichier HTML ni recompiler la fonction
+        de remplissage générée.
+        """
+        self.__dict__.update(state)
+        renderCode = self._renderCode
+        self._renderCode = None
+        if renderCode is not None and renderCode[0] == importlib.util.MAGIC_NUMBER:
+            try:
+                self._renderCode = marshal.loads(renderCode[1])
+            except (EOFError, ValueError, TypeError):
+                # Code illisible : la fonction sera recompilée au 1er remplissage
+                pass
+
     def fillOut__withRegex(self, fieldValues: dict[str, str]) -> str:
         """
         Remplace les champs dans le contenu HTML par les valeurs fournies avec la regex précompilée.
+        Les champs absents de fieldValues sont traités selon la politique missingFieldPolicy du constructeur.
+        :raise ValueError: avec la politique 'error', si un champ du modèle est absent de fieldValues
         """
+        self._checkMissingFieldValues(fieldValues)
+        # Valeur d'un champ absent : défaut de la politique 'default', sinon le champ lui-même
+        missingValue = self.defaultValue if self.missingFieldPolicy == 'default' else None
 
         def replacer(match: re.Match) -> str:
             """
             Fonction interne pour remplacer les champs trouvés par leur valeur
             """
             field_name: str = match.group(1)
-            # Retourne la valeur du champ si elle existe, sinon laisse le champ inchangé
-            return fieldValues.get(field_name, match.group(0))
+            # Retourne la valeur du champ si elle existe, sinon la valeur des champs absents ou le champ inchangé
+            return fieldValues.get(field_name, match.group(0) if missingValue is None else missingValue)
 
         # Remplace tous les champs trouvés dans le contenu
         return self._fieldPattern.sub(replacer, self._content)
@@ -55,17 +210,40 @@ class TemplateManager:
     def fillOut__withReplace(self, fieldValues: dict[str, str]) -> str:
         """
         Remplace les champs dans le contenu HTML par les valeurs fournies, sans regex.
+        Les champs absents de fieldValues sont traités selon la politique missingFieldPolicy du constructeur.
+        :raise ValueError: avec la politique 'error', si un champ du modèle est absent de fieldValues
         """
         result = self._content
+        for fieldName in self._checkMissingFieldValues(fieldValues):
+            # Politique 'default' : remplacés avant les valeurs fournies, qui ne sont ainsi jamais modifiées
+            result = result.replace(f"[---{fieldName}---]", self.defaultValue)
         for key, value in fieldValues.items():
             placeholder = f"[---{key}---]"
             result = result.replace(placeholder, value)
         return result
 
+    def fillOut__withAhoCorasick(self, fieldValues: dict[str, str]) -> str:
+        """
+        Remplace les champs dans le contenu HTML par les valeurs fournies avec un automate d'Aho-Corasick :
+        le modèle est parcouru une seule fois par ensemble de clés de fieldValues, en temps linéaire en sa longueur
+        quel que soit le nombre de champs, puis chaque remplissage se limite à un ''.join() (cf. PlaceholderReplacer).
+        Les champs sont reconnus avec les délimiteurs du constructeur, et les champs absents de fieldValues
+        sont traités selon sa politique missingFieldPolicy (laissés inchangés avec la politique None ou 'leave').
+        L'automate est construit au 1er appel.
+        :raise ValueError: avec la politique 'error', si un champ du modèle est absent de fieldValues
+        """
+        placeholderReplacer = self._placeholderReplacer
+        if placeholderReplacer is None:
+            placeholderReplacer = self._placeholderReplacer = PlaceholderReplacer(
+                self._content, delimiters=self.delimiters, missingFieldPolicy=self.missingFieldPolicy or 'leave',
+                defaultValue=self.defaultValue)
+        return placeholderReplacer.fillOut(fieldValues)
+
     def fillOut__withSegmentationAndDict(self, fieldValues: dict[str, str]) -> str:
         """
         Remplace les champs dans le contenu HTML par les valeurs fournies en utilisant le découpage
         du modèle en segments effectué dans le constructeur.
+        Les segments partagés sont modifiés : la méthode n'est pas utilisable depuis plusieurs threads.
         """
         # Remplace la valeur des champs dans la liste des segments
         for fieldName, fieldIndex in zip(self.templateFieldNames, self._contentSegmentsFieldIndices):
@@ -76,12 +254,235 @@ class TemplateManager:
         """
         Remplace les champs dans le contenu HTML par les valeurs fournies en utilisant le découpage
         du modèle en segments effectué dans le constructeur.
+        Les segments partagés sont modifiés : la méthode n'est pas utilisable depuis plusieurs threads.
         """
         # Remplace la valeur des champs dans la liste des segments
         for fieldValueIndex, fieldIndex in zip(self._contentSegmentsFieldValuesIndices, self._contentSegmentsFieldIndices):
             self._contentSegments[fieldIndex] = fieldValues[fieldValueIndex]
         return ''.join(self._contentSegments)
 
+    def fillOut__withSegmentationAndColumns(self, fieldColumns: List[List[str]], separator: Optional[str] = None,
+                                            rowCount: Optional[int] = None) -> Union[List[str], str]:
+        """
+        Remplit le modèle pour un lot de lignes fourni sous forme de colonnes
+        (cf. MailingData.nextFieldValuesAsColumns()) en utilisant le découpage du modèle en segments.
+        Les valeurs de chaque ligne sont affectées en une seule opération par tranche dans une copie locale
+        des segments, ce qui évite la boucle Python par champ.
+        :param fieldColumns: Liste de colonnes de valeurs, dans l'ordre des providedFieldNames du constructeur
+        :param separator: Si fourni, retourne une seule chaîne où chaque modèle rempli est suivi de separator
+        :param rowCount: Nombre de lignes du lot (cf. MailingData.nextFieldValuesAsColumns()), indispensable
+                         lorsqu'aucun champ n'est fourni (fieldColumns vide) ; sinon déduit de la 1ère colonne
+        :return: Liste des modèles remplis, ou chaîne unique si separator est fourni
+        :raise ValueError: si fieldColumns est vide et que rowCount n'est pas fourni
+        """
+        rowCount = self._batchRowCount(fieldColumns, rowCount)
+        segments = list(self._contentSegments)
+        if separator is not None:
+            # Ajoute le séparateur au dernier segment statique pour éviter une concaténation par ligne
+            segments[-1] += separator
+        fieldSlots = slice(1, len(segments), 2)
+
+        if len(self._contentSegmentsFieldIndices) == 0:
+            # Modèle sans champ : le contenu est identique pour toutes les lignes
+            filledTemplates = [''.join(segments)] * rowCount
+        else:
+            filledTemplates = []
+            # Colonnes dans l'ordre des champs du modèle, puis valeurs de chaque ligne
+            for fieldValues in zip(*[fieldColumns[i] for i in self._contentSegmentsFieldValuesIndices]):
+                segments[fieldSlots] = fieldValues
+                filledTemplates.append(''.join(segments))
+
+        if separator is not None:
+            return ''.join(filledTemplates)
+        return filledTemplates
+
+    def fillOut__withCompiledPlan(self, fieldValues: List[str]) -> str:
+        """
+        Remplace les champs dans le contenu HTML par les valeurs fournies en utilisant le plan de remplissage
+        immuable calculé dans le constructeur. Contrairement à fillOut__withSegmentationAndList(), les segments
+        partagés ne sont pas modifiés : le résultat est construit dans une liste propre à chaque appel,
+        la méthode peut donc être appelée simultanément depuis plusieurs threads.
+        """
+        segments = list(self._compiledSegments)
+        segments[1::2] = self._fieldValuesGetter(fieldValues)
+        return ''.join(segments)
+
+    def fillOut__withGeneratedCode(self, fieldValues: List[str]) -> str:
+        """
+        Remplace les champs dans le contenu HTML par les valeurs fournies en appelant la fonction générée
+        et compilée pour ce modèle au 1er appel : un seul appel par ligne, sans boucle Python
+        ni copie des segments (cf. _makeRenderFunction()).
+        Pour un modèle trop volumineux, c'est fillOut__withCompiledPlan() qui est appelée.
+        La méthode peut être appelée simultanément depuis plusieurs threads.
+        :raise TypeError: si une valeur d'un champ du modèle n'est pas une chaîne, comme les autres méthodes
+        """
+        renderFunction = self._renderFunction
+        if renderFunction is None:
+            renderFunction = self._getRenderFunction()
+        return renderFunction(fieldValues)
+
+    @property
+    def hasGeneratedCode(self) -> bool:
+        """
+        True si fillOut__withGeneratedCode() utilise une fonction générée pour ce modèle (la fonction est compilée
+        si elle ne l'a pas encore été).
+        """
+        self._getRenderFunction()
+        return self._renderIsGenerated
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Empreinte SHA-256 du contenu du modèle et des indices des valeurs de ses champs : deux modèles de même
+        empreinte produisent le même contenu formaté pour les mêmes valeurs (cf. CheckpointedGenerator).
+        """
+        digest = hashlib.sha256(self._content.encode('utf-8'))
+        digest.update(repr(self._contentSegmentsFieldValuesIndices).encode('ascii'))
+        if self.missingFieldPolicy is not None:
+            # Les champs absents sont remplacés selon la politique
+            digest.update(repr((self.missingFieldPolicy, self.defaultValue)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def fillOut__withPresizedBatch(self, fieldColumns: List[List[str]], separator: str = '',
+                                   rowCount: Optional[int] = None) -> str:
+        """
+        Remplit le modèle pour un lot de lignes fourni sous forme de colonnes et retourne tous les modèles
+        remplis, chacun suivi de separator, dans une seule chaîne.
+        Les segments de toutes les lignes du lot sont disposés à l'avance dans une seule liste (segments statiques
+        recopiés en C), puis chaque champ du modèle reçoit toute sa colonne de valeurs par une affectation par tranche.
+        Le nombre d'opérations Python dépend donc du nombre de champs du modèle et non du nombre de lignes,
+        et le résultat est construit par un unique ''.join(), qui alloue une seule fois la taille totale.
+        :param fieldColumns: Liste de colonnes de valeurs, dans l'ordre des providedFieldNames du constructeur
+        :param separator: Texte ajouté après chaque modèle rempli
+        :param rowCount: Nombre de lignes du lot (cf. MailingData.nextFieldValuesAsColumns()), indispensable
+                         lorsqu'aucun champ n'est fourni (fieldColumns vide) ; sinon déduit de la 1ère colonne
+        :raise ValueError: si les colonnes utilisées par le modèle n'ont pas toutes la même longueur,
+                           ou si fieldColumns est vide et que rowCount n'est pas fourni
+        """
+        rowSegments = list(self._compiledSegments)
+        rowSegments[-1] += separator
+        rowCount = self._batchRowCount(fieldColumns, rowCount)
+        stride = len(rowSegments)
+        batchSegments = rowSegments * rowCount
+        for slotIndex, fieldValueIndex in zip(self._contentSegmentsFieldIndices, self._contentSegmentsFieldValuesIndices):
+            batchSegments[slotIndex::stride] = fieldColumns[fieldValueIndex]
+        return ''.join(batchSegments)
+
+    def fillOut__withBytes(self, fieldValues: List[str]) -> bytes:
+        """
+        Remplace les champs dans le contenu HTML par les valeurs fournies et retourne le résultat encodé en UTF-8.
+        Les segments statiques sont encodés une seule fois dans le constructeur et chaque valeur distincte
+        n'est encodée qu'une fois grâce au cache d'encodage.
+        """
+        segments = list(self._compiledSegmentsBytes)
+        segments[1::2] = self._encodeColumn(self._fieldValuesGetter(fieldValues))
+        return b''.join(segments)
+
+    def fillOut__withPresizedBytesBatch(self, fieldColumns: List[List[str]], separator: bytes = b'',
+                                        rowCount: Optional[int] = None) -> bytes:
+        """
+        Équivalent de fillOut__withPresizedBatch() produisant directement des bytes UTF-8 :
+        les segments statiques sont déjà encodés et chaque colonne utilisée par le modèle n'est encodée
+        qu'une fois par lot, en réutilisant le cache d'encodage pour les valeurs répétées.
+        :param fieldColumns: Liste de colonnes de valeurs, dans l'ordre des providedFieldNames du constructeur
+        :param separator: Octets ajoutés après chaque modèle rempli
+        :param rowCount: Nombre de lignes du lot (cf. MailingData.nextFieldValuesAsColumns()), indispensable
+                         lorsqu'aucun champ n'est fourni (fieldColumns vide) ; sinon déduit de la 1ère colonne
+        :raise ValueError: si les colonnes utilisées par le modèle n'ont pas toutes la même longueur,
+                           ou si fieldColumns est vide et que rowCount n'est pas fourni
+        """
+        return b''.join(self._presizedBytesSegments(fieldColumns, separator, rowCount))
+
+    def fillOut__withPresizedBytesBatchAndLengths(self, fieldColumns: List[List[str]], separator: bytes = b'',
+                                                  rowCount: Optional[int] = None) -> Tuple[bytes, List[int]]:
+        """
+        Équivalent de fillOut__withPresizedBytesBatch() retournant aussi la longueur en octets de chaque modèle rempli,
+        séparateur non compris : les positions des lignes dans le lot se déduisent de ces longueurs,
+        sans rechercher le séparateur, qui peut aussi apparaître dans le modèle ou dans les valeurs.
+        :param fieldColumns: Liste de colonnes de valeurs, dans l'ordre des providedFieldNames du constructeur
+        :param separator: Octets ajoutés après chaque modèle rempli
+        :param rowCount: Nombre de lignes du lot (cf. MailingData.nextFieldValuesAsColumns()), indispensable
+                         lorsqu'aucun champ n'est fourni (fieldColumns vide) ; sinon déduit de la 1ère colonne
+        :return: Le lot rempli, et la liste des longueurs des modèles remplis, dans l'ordre des lignes
+        :raise ValueError: si les colonnes utilisées par le modèle n'ont pas toutes la même longueur,
+                           ou si fieldColumns est vide et que rowCount n'est pas fourni
+        """
+        batchSegments, contentLengths = self._presizedBytesSegmentsAndLengths(fieldColumns, separator, rowCount)
+        return b''.join(batchSegments), contentLengths
+
+    def _presizedBytesSegmentsAndLengths(self, fieldColumns: List[List[str]], separator: bytes = b'',
+                                         rowCount: Optional[int] = None) -> Tuple[List[bytes], List[int]]:
+        """
+        Retourne les segments encodés de toutes les lignes du lot (cf. _presizedBytesSegments()) et la longueur
+        en octets de chaque modèle rempli, séparateur non compris (cf. fillOut__withPresizedBytesBatchAndLengths()).
+        """
+        encodedColumns: dict[int, List[bytes]] = {}
+        batchSegments = self._presizedBytesSegments(fieldColumns, separator, rowCount, encodedColumns)
+        rowCount = len(batchSegments) // len(self._compiledSegmentsBytes)
+        # Longueur des segments statiques, puis ajout colonne par colonne de la longueur des valeurs de chaque champ
+        contentLengths = [sum(map(len, self._compiledSegmentsBytes[::2]))] * rowCount
+        for fieldValueIndex in self._contentSegmentsFieldValuesIndices:
+            contentLengths = list(map(add, contentLengths, map(len, encodedColumns[fieldValueIndex])))
+        return batchSegments, contentLengths
+
+    def _presizedBytesSegments(self, fieldColumns: List[List[str]], separator: bytes = b'',
+                               rowCount: Optional[int] = None,
+                               encodedColumns: Optional[dict[int, List[bytes]]] = None) -> List[bytes]:
+        """
+        Retourne les segments encodés de toutes les lignes du lot, ligne après ligne, sans les joindre :
+        chaque ligne occupe len(self._compiledSegmentsBytes) segments consécutifs, le dernier suivi de separator
+        (cf. fillOut__withPresizedBytesBatch() et TemplateRegistry).
+        :param encodedColumns: Si fourni, complété par les colonnes encodées, indexées comme fieldColumns
+        """
+        rowSegments = list(self._compiledSegmentsBytes)
+        rowSegments[-1] += separator
+        rowCount = self._batchRowCount(fieldColumns, rowCount)
+        stride = len(rowSegments)
+        batchSegments = rowSegments * rowCount
+        if encodedColumns is None:
+            encodedColumns = {}
+        for slotIndex, fieldValueIndex in zip(self._contentSegmentsFieldIndices, self._contentSegmentsFieldValuesIndices):
+            encodedColumn = encodedColumns.get(fieldValueIndex)
+            if encodedColumn is None:
+                encodedColumn = encodedColumns[fieldValueIndex] = self._encodeColumn(fieldColumns[fieldValueIndex])
+            batchSegments[slotIndex::stride] = encodedColumn
+        return batchSegments
+
+    @staticmethod
+    def _batchRowCount(fieldColumns: List[List[str]], rowCount: Optional[int]) -> int:
+        """
+        Retourne le nombre de lignes d'un lot de colonnes : rowCount s'il est fourni, sinon la longueur de la 1ère colonne.
+        :raise ValueError: si fieldColumns est vide et que rowCount n'est pas fourni : le nombre de lignes
+                           ne peut pas être déduit d'un lot sans colonne
+        """
+        if rowCount is not None:
+            return rowCount
+        if len(fieldColumns) == 0:
+            raise ValueError("Le nombre de lignes d'un lot sans colonne doit être fourni (rowCount).")
+        return len(fieldColumns[0])
+
+    def _encodeColumn(self, fieldColumn: Sequence[str]) -> List[bytes]:
+        """
+        Retourne les valeurs d'une colonne (ou d'une ligne) encodées en UTF-8. Les valeurs déjà présentes dans le cache
+        d'encodage sont récupérées sans boucle Python ; seules les autres passent par _encodeValue().
+        """
+        encodedColumn = list(map(self._encodedValues.get, fieldColumn))
+        if None in encodedColumn:
+            encodedColumn = list(map(self._encodeValue, fieldColumn))
+        return encodedColumn
+
+    def _encodeValue(self, value: str) -> bytes:
+        """
+        Retourne la valeur encodée en UTF-8, en la mémorisant pour les appels suivants.
+        Le cache est vidé lorsqu'il dépasse maxEncodedValues valeurs, pour borner la mémoire utilisée.
+        """
+        encodedValue = self._encodedValues.get(value)
+        if encodedValue is None:
+            if len(self._encodedValues) >= self.maxEncodedValues:
+                self._encodedValues.clear()
+            encodedValue = self._encodedValues[value] = value.encode('utf-8')
+        return encodedValue
+
     def _validateFieldNames(self, providedFieldNames: List[str]) -> None:
         """
         Vérifie que tous les champs du modèle sont présents dans la liste fournie.
@@ -93,11 +494,52 @@ class TemplateManager:
         if len(missingFields) > 0:
             raise ValueError(f"Les champs suivants sont manquants : {', '.join(missingFields)}")
 
+    def _checkMissingFieldValues(self, fieldValues: dict[str, str]) -> List[str]:
+        """
+        Recherche les champs du modèle absents de fieldValues, pour les méthodes de remplissage par dictionnaire.
+        Avec la politique None ou 'leave', ces champs sont laissés tels quels et ne sont pas recherchés.
+        :return: Les champs absents à remplacer par defaultValue (politique 'default'), sans doublon
+        :raise ValueError: avec la politique 'error', si des champs du modèle sont absents de fieldValues
+        """
+        if self.missingFieldPolicy not in ('default', 'error'):
+            return []
+        missingFields = [fieldName for fieldName in dict.fromkeys(self._fieldPattern.findall(self._content))
+                         if fieldName not in fieldValues]
+        if missingFields and self.missingFieldPolicy == 'error':
+            raise ValueError(f"Les champs suivants sont manquants : {', '.join(missingFields)}")
+        return missingFields
+
+    def _foldMissingFields(self, contentSegments: List[str], providedFieldNames: List[str]) -> List[str]:
+        """
+        Intègre aux segments statiques voisins les champs du modèle absents de providedFieldNames :
+        le champ est conservé tel quel (politique 'leave') ou remplacé par defaultValue (politique 'default').
+        :param contentSegments: Segments du modèle (statiques aux indices pairs, noms des champs aux indices impairs)
+        :return: Segments dont tous les champs sont dans providedFieldNames
+        :raise ValueError: avec la politique 'error', si des champs du modèle sont absents de providedFieldNames
+        """
+        providedFieldNameSet = set(providedFieldNames)
+        missingFields = [fieldName for fieldName in contentSegments[1::2] if fieldName not in providedFieldNameSet]
+        if len(missingFields) == 0:
+            return contentSegments
+        if self.missingFieldPolicy == 'error':
+            raise ValueError(f"Les champs suivants sont manquants : {', '.join(dict.fromkeys(missingFields))}")
+        foldedSegments = [contentSegments[0]]
+        for fieldName, staticSegment in zip(contentSegments[1::2], contentSegments[2::2]):
+            if fieldName in providedFieldNameSet:
+                foldedSegments.append(fieldName)
+                foldedSegments.append(staticSegment)
+            else:
+                missingValue = f"[---{fieldName}---]" if self.missingFieldPolicy == 'leave' else self.defaultValue
+                foldedSegments[-1] += missingValue + staticSegment
+        return foldedSegments
+
     def _computeFieldValuesIndices(self, providedFieldNames: List[str]) -> List[int]:
         """
         Calcule les indices des valeurs des champs à utiliser lors du remplissage par segmentation et
         les stocke dans l'attribut _contentSegmentsFieldValuesIndices.
-        :param providedFieldNames: Liste des noms de champs dans l'ordre dans lequel ils seront passés à fillOut__withSegmentationAndList()
+        :param providedFieldNames: Liste des noms de champs dans l'ordre dans lequel ils seront passés à fillOut__withSegmentationAndList().
+                                   Si les données sont projetées (MailingData(requiredFieldNames=...)), ce sont
+                                   les noms des champs projetés : les indices désignent alors les colonnes projetées.
         :return: Liste des indices des valeurs des champs
         """
         # Dictionnaire des indices des noms des champs tels qu'ils seront fournis à fillOut__withSegmentationAndList()
@@ -112,6 +554,67 @@ class TemplateManager:
 
         return contentSegmentsFieldValuesIndices
 
+    def _getRenderFunction(self) -> Callable[[Sequence[str]], str]:
+        """
+        Retourne la fonction de remplissage générée, construite au 1er appel (cf. _makeRenderFunction()).
+        Si plusieurs threads la construisent simultanément, ils obtiennent des fonctions équivalentes.
+        """
+        renderFunction = self._renderFunction
+        if renderFunction is None:
+            renderFunction = self._renderFunction = self._makeRenderFunction()
+        return renderFunction
+
+    def _makeRenderFunction(self) -> Callable[[Sequence[str]], str]:
+        """
+        Génère et compile une fonction de remplissage propre au modèle. Les segments statiques sont des constantes
+        de la fonction et chaque champ une expression v[i] : par exemple, pour le modèle
+        "Bonjour [---nom---], comment ça va en ce [---jour---] ?" et les champs fournis ['jour', 'nom'],
+            def render(v, join=''.join):
+                return join(('Bonjour ', v[1], ', comment ça va en ce ', v[0], ' ?',))
+        Segments et valeurs forment un seul tuple, dont ''.join() calcule la taille totale avant d'allouer
+        le résultat en une fois. Comme pour les autres méthodes, une valeur qui n'est pas une chaîne lève TypeError.
+        Le code compilé est conservé dans _renderCode, y compris lors de la sérialisation (cf. __getstate__()).
+        :return: La fonction générée, ou fillOut__withCompiledPlan si le modèle dépasse maxGeneratedFields champs,
+                 si le code source dépasse maxGeneratedSourceLength caractères, ou si la compilation échoue.
+                 C'est alors la méthode non instrumentée qui est retournée : l'appel à fillOut__withGeneratedCode()
+                 n'est compté qu'une fois par l'instrumentation.
+        """
+        # Méthode de la classe liée au modèle, et non l'attribut d'instance qui l'enveloppe si le modèle est instrumenté
+        compiledPlanFunction = TemplateManager.fillOut__withCompiledPlan.__get__(self)
+        if self._renderCode is None:
+            if len(self._contentSegmentsFieldValuesIndices) > self.maxGeneratedFields:
+                return compiledPlanFunction
+            items = [repr(self._compiledSegments[0])]
+            for fieldValueIndex, segment in zip(self._contentSegmentsFieldValuesIndices, self._compiledSegments[2::2]):
+                items.append(f"v[{fieldValueIndex}]")
+                items.append(repr(segment))
+            source = f"def render(v, join=''.join):\n    return join(({', '.join(items)},))\n"
+            if len(source) > self.maxGeneratedSourceLength:
+                return compiledPlanFunction
+            try:
+                self._renderCode = compile(source, f"<TemplateManager {len(items) // 2} champs>", 'exec')
+            except (SyntaxError, RecursionError, MemoryError, ValueError, OverflowError):
+                # Limite de l'analyseur ou du compilateur atteinte : le plan de remplissage reste utilisable
+                return compiledPlanFunction
+        namespace: dict = {}
+        exec(self._renderCode, namespace)
+        self._renderIsGenerated = True
+        return namespace['render']
+
+    @staticmethod
+    def _makeFieldValuesGetter(contentSegmentsFieldValuesIndices: List[int]) -> Callable[[Sequence[str]], Sequence[str]]:
+        """
+        Construit une fonction qui extrait d'une liste de valeurs celles des champs du modèle, dans l'ordre
+        des champs du modèle. L'extraction est faite par operator.itemgetter, sans boucle Python.
+        :param contentSegmentsFieldValuesIndices: Indices des valeurs des champs (cf. _computeFieldValuesIndices())
+        :return: Fonction sérialisable (pickle) retournant toujours une séquence, même pour un modèle avec 0 ou 1 champ
+        """
+        if len(contentSegmentsFieldValuesIndices) == 0:
+            return _noFieldValues
+        if len(contentSegmentsFieldValuesIndices) == 1:
+            return partial(_singleFieldValue, contentSegmentsFieldValuesIndices[0])
+        return itemgetter(*contentSegmentsFieldValuesIndices)
+
 #=====================================================================================
 # Tests de la classe Template
 #=====================================================================================
@@ -173,6 +676,30 @@ def _test_fillOut__withReplace(executionCount: int) -> None:
     print('-' * 80)
 
 
+def _test_fillOut__withAhoCorasick(executionCount: int) -> None:
+    """
+    Test de la méthode fillOut__withAhoCorasick
+    """
+    # Exemple de dictionnaire de valeurs pour les champs
+    fieldValues = {'CHAMP1': 'VALEUR CHAMP1', 'CHAMP2': 'VALEUR CHAMP2', 'CHAMP3': 'VALEUR CHAMP3'}
+
+    templateManager = TemplateManager(htmlFile=Path('data/simple_template.html'),
+                                      providedFieldNames=list(fieldValues.keys()))
+
+    # Remplace les champs dans le contenu HTML par les valeurs fournies
+    filledTemplate = templateManager.fillOut__withAhoCorasick(fieldValues)
+    print(filledTemplate)
+
+    # Profilage de l'exécution
+    executionTime = timeit.timeit(
+        lambda: templateManager.fillOut__withAhoCorasick(fieldValues),
+        number=executionCount
+    )
+    executionCountStr = f"{executionCount:,}".replace(',', ' ')
+    print(f"fillOut__withAhoCorasick: {executionTime:.2f} secondes pour {executionCountStr} exécutions")
+    print('-' * 80)
+
+
 def _test_fillOut__withSegmentationAndDict(executionCount: int) -> None:
     """
     Test de la méthode fillOut__withSegmentationAndDict
@@ -227,13 +754,234 @@ def _test_fillOut__withSegmentationAndList(executionCount: int) -> None:
     print('-' * 80)
 
 
+def _test_fillOut__withCompiledPlan(executionCount: int) -> None:
+    """
+    Test de la méthode fillOut__withCompiledPlan
+    """
+    # Exemple de liste de noms de champs
+    fieldNames = ['CHAMP1', 'CHAMP2', 'CHAMP3']
+    # Exemple de liste de valeurs pour les champs
+    fieldValues = ['VALEUR CHAMP1', 'VALEUR CHAMP2', 'VALEUR CHAMP3']
+
+    templateManager = TemplateManager(htmlFile=Path('data/simple_template.html'),
+                                      providedFieldNames=fieldNames)
+
+    # Remplace les champs dans le contenu HTML par les valeurs fournies
+    filledTemplate = templateManager.fillOut__withCompiledPlan(fieldValues)
+    print(filledTemplate)
+
+    # Profilage de l'exécution
+    executionTime = timeit.timeit(
+        lambda: templateManager.fillOut__withCompiledPlan(fieldValues),
+        number=executionCount
+    )
+    executionCountStr = f"{executionCount:,}".replace(',', ' ')
+    print(f"fillOut__withCompiledPlan: {executionTime:.2f} secondes pour {executionCountStr} exécutions")
+    print('-' * 80)
+
+
+def _test_fillOut__withGeneratedCode(executionCount: int) -> None:
+    """
+    Test de la méthode fillOut__withGeneratedCode
+    """
+    # Exemple de liste de noms de champs
+    fieldNames = ['CHAMP1', 'CHAMP2', 'CHAMP3']
+    # Exemple de liste de valeurs pour les champs
+    fieldValues = ['VALEUR CHAMP1', 'VALEUR CHAMP2', 'VALEUR CHAMP3']
+
+    templateManager = TemplateManager(htmlFile=Path('data/simple_template.html'),
+                                      providedFieldNames=fieldNames)
+
+    # Remplace les champs dans le contenu HTML par les valeurs fournies
+    filledTemplate = templateManager.fillOut__withGeneratedCode(fieldValues)
+    print(filledTemplate)
+    print(f"Fonction générée : {templateManager.hasGeneratedCode}, "
+          f"résultat identique : {filledTemplate == templateManager.fillOut__withCompiledPlan(fieldValues)}")
+
+    # Profilage de l'exécution
+    executionTime = timeit.timeit(
+        lambda: templateManager.fillOut__withGeneratedCode(fieldValues),
+        number=executionCount
+    )
+    executionCountStr = f"{executionCount:,}".replace(',', ' ')
+    print(f"fillOut__withGeneratedCode: {executionTime:.2f} secondes pour {executionCountStr} exécutions")
+    print('-' * 80)
+
+
+def _test_fillOut__withCompiledPlanAndThreads(executionCount: int, threadCount: int) -> None:
+    """
+    Test de la méthode fillOut__withCompiledPlan appelée simultanément depuis plusieurs threads
+    avec le même modèle. Le gain n'est visible que sur un Python sans GIL (3.13t).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import sys
+
+    fieldNames = ['CHAMP1', 'CHAMP2', 'CHAMP3']
+    templateManager = TemplateManager(htmlFile=Path('data/simple_template.html'),
+                                      providedFieldNames=fieldNames)
+
+    def fillOutMany(threadIndex: int) -> bool:
+        """
+        Remplit le modèle avec des valeurs propres au thread et vérifie chaque résultat.
+        """
+        fieldValues = [f"T{threadIndex} {fieldName}" for fieldName in fieldNames]
+        expected = templateManager.fillOut__withCompiledPlan(fieldValues)
+        return all(templateManager.fillOut__withCompiledPlan(fieldValues) == expected
+                   for _ in range(executionCount // threadCount))
+
+    gilEnabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    start = timeit.default_timer()
+    with ThreadPoolExecutor(max_workers=threadCount) as executor:
+        consistent = all(executor.map(fillOutMany, range(threadCount)))
+    executionTime = timeit.default_timer() - start
+    executionCountStr = f"{executionCount:,}".replace(',', ' ')
+    print(f"fillOut__withCompiledPlan ({threadCount} threads, GIL {'actif' if gilEnabled else 'désactivé'}): "
+          f"{executionTime:.2f} secondes pour {executionCountStr} exécutions, résultats cohérents : {consistent}")
+    print('-' * 80)
+
+
+def _test_fillOut__withSegmentationAndColumns(executionCount: int, batchSize: int = 1000) -> None:
+    """
+    Test de la méthode fillOut__withSegmentationAndColumns
+    """
+    # Exemple de liste de noms de champs
+    fieldNames = ['CHAMP1', 'CHAMP2', 'CHAMP3']
+    # Exemple de lot de valeurs pour les champs, sous forme de colonnes
+    fieldColumns = [['VALEUR CHAMP1'] * batchSize, ['VALEUR CHAMP2'] * batchSize, ['VALEUR CHAMP3'] * batchSize]
+
+    templateManager = TemplateManager(htmlFile=Path('data/simple_template.html'),
+                                      providedFieldNames=fieldNames)
+
+    # Remplace les champs dans le contenu HTML par les valeurs fournies
+    filledTemplate = templateManager.fillOut__withSegmentationAndColumns([column[:1] for column in fieldColumns])[0]
+    print(filledTemplate)
+
+    # Profilage de l'exécution (executionCount modèles remplis, par lots de batchSize)
+    executionTime = timeit.timeit(
+        lambda: templateManager.fillOut__withSegmentationAndColumns(fieldColumns),
+        number=max(1, executionCount // batchSize)
+    )
+    executionCountStr = f"{executionCount:,}".replace(',', ' ')
+    print(f"fillOut__withSegmentationAndColumns: {executionTime:.2f} secondes pour {executionCountStr} exécutions")
+    print('-' * 80)
+
+
+def _test_fillOut__withPresizedBatch(executionCount: int, batchSize: int = 1000) -> None:
+    """
+    Compare fillOut__withPresizedBatch et fillOut__withSegmentationAndList sur un modèle de 10 champs
+    dont les valeurs font entre 0 et 384 caractères, pour un total de 959 caractères par ligne.
+    """
+    import tempfile
+
+    fieldNames = [f"CHAMP{i}" for i in range(1, 11)]
+    fieldValueLengths = [0, 5, 12, 20, 30, 45, 60, 100, 303, 384]
+    fieldValues = ['x' * length for length in fieldValueLengths]
+    fieldColumns = [[fieldValue] * batchSize for fieldValue in fieldValues]
+    batchCount = max(1, executionCount // batchSize)
+    separator = '<hr>\n'
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        templateFile = Path(tmpDir) / 'template_10_champs.html'
+        templateFile.write_text(''.join(f"<p>Texte statique {i}</p><b>[---{fieldName}---]</b>\n"
+                                        for i, fieldName in enumerate(fieldNames)), encoding='utf-8')
+        templateManager = TemplateManager(htmlFile=templateFile, providedFieldNames=fieldNames)
+
+        def fillOutRows() -> str:
+            """
+            Remplit le lot ligne par ligne, comme la boucle principale de main.py.
+            """
+            return ''.join([templateManager.fillOut__withSegmentationAndList(fieldValues) + separator
+                            for _ in range(batchSize)])
+
+        assert fillOutRows() == templateManager.fillOut__withPresizedBatch(fieldColumns, separator)
+
+        executionCountStr = f"{batchCount * batchSize:,}".replace(',', ' ')
+        executionTime = timeit.timeit(fillOutRows, number=batchCount)
+        print(f"fillOut__withSegmentationAndList (10 champs): {executionTime:.2f} secondes pour {executionCountStr} exécutions")
+        executionTime = timeit.timeit(
+            lambda: templateManager.fillOut__withPresizedBatch(fieldColumns, separator),
+            number=batchCount
+        )
+        print(f"fillOut__withPresizedBatch (10 champs): {executionTime:.2f} secondes pour {executionCountStr} exécutions")
+        print('-' * 80)
+
+
+def _test_fillOut__withPresizedBytesBatch(executionCount: int, batchSize: int = 1000) -> None:
+    """
+    Compare la production de bytes UTF-8 par fillOut__withPresizedBatch() suivi d'un encodage
+    et par fillOut__withPresizedBytesBatch(), sur un modèle de 10 champs comportant des caractères accentués.
+    """
+    import tempfile
+
+    fieldNames = [f"CHAMP{i}" for i in range(1, 11)]
+    fieldValueLengths = [0, 5, 12, 20, 30, 45, 60, 100, 303, 384]
+    fieldValues = [('é' + 'x' * length)[:length] for length in fieldValueLengths]
+    fieldColumns = [[fieldValue] * batchSize for fieldValue in fieldValues]
+    batchCount = max(1, executionCount // batchSize)
+    separator = '<hr>\n'
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        templateFile = Path(tmpDir) / 'template_10_champs_accents.html'
+        templateFile.write_text(''.join(f"<p>Texte statique numéro {i}, déjà rédigé en français</p><b>[---{fieldName}---]</b>\n"
+                                        for i, fieldName in enumerate(fieldNames)), encoding='utf-8')
+        templateManager = TemplateManager(htmlFile=templateFile, providedFieldNames=fieldNames)
+
+        assert (templateManager.fillOut__withPresizedBatch(fieldColumns, separator).encode('utf-8')
+                == templateManager.fillOut__withPresizedBytesBatch(fieldColumns, separator.encode('utf-8')))
+
+        executionCountStr = f"{batchCount * batchSize:,}".replace(',', ' ')
+        executionTime = timeit.timeit(
+            lambda: templateManager.fillOut__withPresizedBatch(fieldColumns, separator).encode('utf-8'),
+            number=batchCount
+        )
+        print(f"fillOut__withPresizedBatch + encode: {executionTime:.2f} secondes pour {executionCountStr} exécutions")
+        executionTime = timeit.timeit(
+            lambda: templateManager.fillOut__withPresizedBytesBatch(fieldColumns, separator.encode('utf-8')),
+            number=batchCount
+        )
+        print(f"fillOut__withPresizedBytesBatch: {executionTime:.2f} secondes pour {executionCountStr} exécutions")
+        print('-' * 80)
+
+
+def _test_missingFieldPolicy() -> None:
+    """
+    Vérifie que les méthodes de remplissage par dictionnaire appliquent la même politique des champs absents.
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        templateFile = Path(tmpDir) / 'template_champ_absent.html'
+        templateFile.write_text("A[---X---]B[---ABSENT---]C", encoding='utf-8')
+        for policy in PlaceholderReplacer.missingFieldPolicies:
+            # ABSENT est fourni à la construction mais pas au remplissage
+            templateManager = TemplateManager(htmlFile=templateFile, providedFieldNames=['X', 'ABSENT'],
+                                              missingFieldPolicy=policy, defaultValue='?')
+            results = []
+            for method in (templateManager.fillOut__withReplace, templateManager.fillOut__withRegex,
+                           templateManager.fillOut__withAhoCorasick):
+                try:
+                    results.append(method({'X': 'x'}))
+                except ValueError as e:
+                    results.append(f"Erreur : {e}")
+            print(f"{policy:8}: {results[0]}, résultats identiques : {len(set(results)) == 1}")
+    print('-' * 80)
+
+
 def _main():
     executionCount = 10000000  # Nombre d'exécutions pour le profilage
 
+    _test_missingFieldPolicy()
     # _test_fillOut__withRegex(executionCount)
     _test_fillOut__withReplace(executionCount)
+    _test_fillOut__withAhoCorasick(executionCount)
     _test_fillOut__withSegmentationAndDict(executionCount)
     _test_fillOut__withSegmentationAndList(executionCount)
+    _test_fillOut__withCompiledPlan(executionCount)
+    _test_fillOut__withGeneratedCode(executionCount)
+    _test_fillOut__withCompiledPlanAndThreads(executionCount, threadCount=4)
+    _test_fillOut__withSegmentationAndColumns(executionCount)
+    _test_fillOut__withPresizedBatch(executionCount)
+    _test_fillOut__withPresizedBytesBatch(executionCount)
 
 
 if __name__ == '__main__':
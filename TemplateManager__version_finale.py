@@ -1,8 +1,24 @@
 # Version finale de la classe Template sans les méthodes non optimales
 
+from functools import partial
 from pathlib import Path
+from operator import itemgetter
 import re
-from typing import List
+from typing import Callable, List, Sequence
+
+
+def _noFieldValues(fieldValues: Sequence[str]) -> tuple:
+    """
+    Extracteur des valeurs des champs d'un modèle sans champ (cf. TemplateManager._makeFieldValuesGetter()).
+    """
+    return ()
+
+
+def _singleFieldValue(fieldValueIndex: int, fieldValues: Sequence[str]) -> tuple:
+    """
+    Extracteur des valeurs des champs d'un modèle à un seul champ (cf. TemplateManager._makeFieldValuesGetter()).
+    """
+    return (fieldValues[fieldValueIndex],)
 
 
 class TemplateManager:
@@ -38,15 +54,20 @@ class TemplateManager:
         # Liste des indices des valeurs des champs à utiliser lors du remplissage par segmentation et liste
         self._contentSegmentsFieldValuesIndices = self._computeFieldValuesIndices(providedFieldNames)
 
+        # Plan de remplissage immuable, partageable entre threads : les segments sont figés dans un tuple
+        # et les valeurs des champs sont extraites dans l'ordre des champs du modèle en un seul appel
+        self._compiledSegments = tuple(self._contentSegments)
+        self._fieldValuesGetter = self._makeFieldValuesGetter(self._contentSegmentsFieldValuesIndices)
+
     def fillOut(self, fieldValues: List[str]) -> str:
         """
-        Remplace les champs dans le contenu HTML par les valeurs fournies en utilisant le découpage
-        du modèle en segments effectué dans le constructeur.
+        Remplace les champs dans le contenu HTML par les valeurs fournies en utilisant le plan de remplissage
+        immuable calculé dans le constructeur. Le résultat est construit dans une liste propre à chaque appel,
+        la méthode peut donc être appelée simultanément depuis plusieurs threads.
         """
-        # Remplace la valeur des champs dans la liste des segments
-        for fieldValueIndex, fieldIndex in zip(self._contentSegmentsFieldValuesIndices, self._contentSegmentsFieldIndices):
-            self._contentSegments[fieldIndex] = fieldValues[fieldValueIndex]
-        return ''.join(self._contentSegments)
+        segments = list(self._compiledSegments)
+        segments[1::2] = self._fieldValuesGetter(fieldValues)
+        return ''.join(segments)
 
     def _validateFieldNames(self, providedFieldNames: List[str]) -> None:
         """
@@ -78,6 +99,20 @@ class TemplateManager:
 
         return contentSegmentsFieldValuesIndices
 
+    @staticmethod
+    def _makeFieldValuesGetter(contentSegmentsFieldValuesIndices: List[int]) -> Callable[[Sequence[str]], Sequence[str]]:
+        """
+        Construit une fonction qui extrait d'une liste de valeurs celles des champs du modèle, dans l'ordre
+        des champs du modèle. L'extraction est faite par operator.itemgetter, sans boucle Python.
+        :param contentSegmentsFieldValuesIndices: Indices des valeurs des champs (cf. _computeFieldValuesIndices())
+        :return: Fonction sérialisable (pickle) retournant toujours une séquence, même pour un modèle avec 0 ou 1 champ
+        """
+        if len(contentSegmentsFieldValuesIndices) == 0:
+            return _noFieldValues
+        if len(contentSegmentsFieldValuesIndices) == 1:
+            return partial(_singleFieldValue, contentSegmentsFieldValuesIndices[0])
+        return itemgetter(*contentSegmentsFieldValuesIndices)
+
 
 #=====================================================================================
 # Tests de la classe Template
@@ -0,0 +1,324 @@
+from collections import Counter
+import hashlib
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from TemplateCache import TemplateCache
+from TemplateManager import TemplateManager
+
+
+class TemplateRegistry:
+    """
+    Registre de modèles pour un mailing en plusieurs langues ou variantes : chaque ligne de données est remplie
+    avec le modèle désigné par la valeur de sa colonne selectorField.
+    Les modèles sont obtenus par un TemplateCache : des fichiers de même contenu partagent le même modèle segmenté
+    et compilé, et tous les modèles sont construits sur la même liste de champs fournis (providedFieldNames),
+    donc avec le même dictionnaire nom de champ -> indice (fieldIndices).
+    fillOut__withPresizedBytesBatch(), fillOut__withPresizedBytesBatchAndLengths() et fillOut__withSegmentationAndColumns()
+    ont la même signature que celles de TemplateManager : un registre peut remplacer un modèle dans MailingPipeline,
+    generateMailing(), ParallelRenderer ou CheckpointedGenerator.
+    """
+
+    def __init__(self, providedFieldNames: List[str], selectorField: str, defaultKey: Optional[str] = None,
+                 templateCache: Optional[TemplateCache] = None) -> None:
+        """
+        :param providedFieldNames: Liste des champs des données (MailingData.fieldNames), commune à tous les modèles
+        :param selectorField: Champ dont la valeur désigne, pour chaque ligne, la clé du modèle à utiliser
+        :param defaultKey: Clé du modèle utilisé lorsque la valeur du champ selectorField n'est pas une clé enregistrée
+                           (None : une telle valeur lève ValueError)
+        :param templateCache: Cache de modèles partagé (par défaut un cache propre au registre)
+        :raise ValueError: si selectorField n'est pas dans providedFieldNames
+        """
+        self.fieldIndices: Dict[str, int] = {fieldName: i for i, fieldName in enumerate(providedFieldNames)}
+        if selectorField not in self.fieldIndices:
+            raise ValueError(f"Le champ de sélection du modèle {selectorField} est absent des champs fournis.")
+        self.providedFieldNames = list(providedFieldNames)
+        self.selectorField = selectorField
+        self.defaultKey = defaultKey
+        self._selectorIndex = self.fieldIndices[selectorField]
+        self._templateCache = templateCache if templateCache is not None else TemplateCache()
+        self._templates: Dict[str, TemplateManager] = {}
+        # Modèle retenu pour chaque valeur déjà rencontrée du champ de sélection
+        self._templatesBySelectorValue: Dict[str, TemplateManager] = {}
+        # Nombre de lignes remplies par clé de modèle
+        self.rowCounts: Dict[str, int] = {}
+
+    def __getstate__(self) -> dict:
+        """
+        Retourne l'état à sérialiser (pickle), par exemple pour ParallelRenderer : le cache de modèles est propre
+        au processus. Les modèles partagés entre plusieurs clés le restent après désérialisation.
+        """
+        state = self.__dict__.copy()
+        del state['_templateCache']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._templateCache = TemplateCache()
+
+    def register(self, key: str, htmlFile: Path) -> TemplateManager:
+        """
+        Enregistre le modèle du fichier htmlFile sous la clé key (valeur du champ selectorField qui le désigne).
+        :return: Le modèle enregistré
+        :raise ValueError: si tous les champs du modèle ne sont pas dans la liste providedFieldNames
+        """
+        template = self._templateCache.getTemplate(htmlFile, self.providedFieldNames)
+        self._templates[key] = template
+        self._templatesBySelectorValue.clear()
+        return template
+
+    def registerDirectory(self, directory: Path, pattern: str = '*.html') -> List[str]:
+        """
+        Enregistre chaque fichier de directory correspondant à pattern, sous la clé du nom du fichier sans extension.
+        :return: Clés enregistrées, triées
+        """
+        keys = []
+        for htmlFile in sorted(directory.glob(pattern)):
+            self.register(htmlFile.stem, htmlFile)
+            keys.append(htmlFile.stem)
+        return keys
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._templates
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def keys(self) -> List[str]:
+        return list(self._templates)
+
+    def getTemplate(self, selectorValue: str) -> TemplateManager:
+        """
+        Retourne le modèle désigné par une valeur du champ selectorField, ou le modèle de clé defaultKey.
+        :raise ValueError: si aucun modèle n'est enregistré pour cette valeur et qu'il n'y a pas de modèle par défaut
+        """
+        template = self._templatesBySelectorValue.get(selectorValue)
+        if template is not None:
+            return template
+        key = selectorValue.strip()
+        if key not in self._templates:
+            if self.defaultKey is None or self.defaultKey not in self._templates:
+                raise ValueError(f"Aucun modèle enregistré pour la valeur '{selectorValue}' du champ {self.selectorField}.")
+            key = self.defaultKey
+        template = self._templates[key]
+        self._templatesBySelectorValue[selectorValue] = template
+        return template
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Empreinte SHA-256 du champ de sélection, du modèle par défaut et des modèles enregistrés
+        (cf. TemplateManager.fingerprint et CheckpointedGenerator).
+        """
+        digest = hashlib.sha256(f"{self.selectorField}\0{self.defaultKey}".encode('utf-8'))
+        for key in sorted(self._templates):
+            digest.update(f"\0{key}\0{self._templates[key].fingerprint}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def fillOut(self, fieldValues: Sequence[str]) -> str:
+        """
+        Remplit, pour une ligne, le modèle désigné par la valeur de son champ selectorField
+        (cf. TemplateManager.fillOut__withGeneratedCode()).
+        :param fieldValues: Liste des valeurs des champs, dans l'ordre de providedFieldNames
+        """
+        return self.getTemplate(fieldValues[self._selectorIndex]).fillOut__withGeneratedCode(fieldValues)
+
+    def fillOut__withPresizedBytesBatch(self, fieldColumns: List[List[str]], separator: bytes = b'',
+                                        rowCount: Optional[int] = None) -> bytes:
+        """
+        Remplit un lot de lignes fourni sous forme de colonnes, chaque ligne avec le modèle désigné par son champ
+        selectorField, et retourne les contenus encodés en UTF-8, chacun suivi de separator, dans l'ordre des lignes.
+        Les lignes sont regroupées par modèle et chaque groupe est rempli en un seul appel à
+        TemplateManager.fillOut__withPresizedBytesBatch() : la boucle de remplissage de chaque modèle ne traite que
+        ses propres lignes. Les segments des contenus sont ensuite repris dans l'ordre des lignes et joints en une seule
+        copie, comme pour un seul modèle.
+        :param fieldColumns: Liste de colonnes de valeurs, dans l'ordre de providedFieldNames
+        :param separator: Octets ajoutés après chaque contenu
+        :param rowCount: Nombre de lignes du lot, accepté pour la compatibilité avec TemplateManager :
+                         il est toujours égal à la longueur de la colonne selectorField
+        :raise ValueError: si une valeur du champ selectorField ne désigne aucun modèle
+        """
+        rowTemplates, groups = self._groupRows(fieldColumns)
+        if len(groups) == 1:
+            return rowTemplates[0].fillOut__withPresizedBytesBatch(fieldColumns, separator)
+
+        # Remplit chaque groupe, sans joindre ses segments
+        groupSegments = {template: template._presizedBytesSegments(self._groupColumns(fieldColumns, rowNumbers), separator)
+                         for template, rowNumbers in groups.items()}
+        return self._joinGroupSegments(rowTemplates, groups, groupSegments)
+
+    def fillOut__withPresizedBytesBatchAndLengths(self, fieldColumns: List[List[str]], separator: bytes = b'',
+                                                  rowCount: Optional[int] = None) -> Tuple[bytes, List[int]]:
+        """
+        Équivalent de fillOut__withPresizedBytesBatch() retournant aussi la longueur en octets de chaque contenu,
+        séparateur non compris, dans l'ordre des lignes (cf. TemplateManager.fillOut__withPresizedBytesBatchAndLengths()).
+        :param fieldColumns: Liste de colonnes de valeurs, dans l'ordre de providedFieldNames
+        :param separator: Octets ajoutés après chaque contenu
+        :param rowCount: Nombre de lignes du lot, accepté pour la compatibilité avec TemplateManager :
+                         il est toujours égal à la longueur de la colonne selectorField
+        :return: Le lot rempli, et la liste des longueurs des contenus
+        :raise ValueError: si une valeur du champ selectorField ne désigne aucun modèle
+        """
+        rowTemplates, groups = self._groupRows(fieldColumns)
+        if len(groups) == 1:
+            return rowTemplates[0].fillOut__withPresizedBytesBatchAndLengths(fieldColumns, separator)
+
+        # Remplit chaque groupe, sans joindre ses segments, et reprend ses longueurs dans l'ordre des lignes
+        groupSegments: Dict[TemplateManager, List[bytes]] = {}
+        contentLengths = [0] * len(rowTemplates)
+        for template, rowNumbers in groups.items():
+            groupSegments[template], groupLengths = template._presizedBytesSegmentsAndLengths(
+                self._groupColumns(fieldColumns, rowNumbers), separator)
+            for rowNumber, contentLength in zip(rowNumbers, groupLengths):
+                contentLengths[rowNumber] = contentLength
+        return self._joinGroupSegments(rowTemplates, groups, groupSegments), contentLengths
+
+    @staticmethod
+    def _joinGroupSegments(rowTemplates: List[TemplateManager], groups: Dict[TemplateManager, List[int]],
+                           groupSegments: Dict[TemplateManager, List[bytes]]) -> bytes:
+        """
+        Reprend les segments des groupes dans l'ordre des lignes, par plages de lignes consécutives d'un même modèle,
+        puis joint tous les segments du lot en une seule copie.
+        """
+        batchSegments: List[bytes] = []
+        groupPositions = dict.fromkeys(groups, 0)
+        rowCount = len(rowTemplates)
+        rowNumber = 0
+        while rowNumber < rowCount:
+            template = rowTemplates[rowNumber]
+            runStart = rowNumber
+            while rowNumber < rowCount and rowTemplates[rowNumber] is template:
+                rowNumber += 1
+            stride = len(template._compiledSegmentsBytes)
+            first = groupPositions[template]
+            groupPositions[template] = first + rowNumber - runStart
+            batchSegments += groupSegments[template][first * stride:(first + rowNumber - runStart) * stride]
+        return b''.join(batchSegments)
+
+    def fillOut__withSegmentationAndColumns(self, fieldColumns: List[List[str]], separator: Optional[str] = None,
+                                            rowCount: Optional[int] = None) -> Union[List[str], str]:
+        """
+        Équivalent de TemplateManager.fillOut__withSegmentationAndColumns() (utilisée par ParallelRenderer)
+        où chaque ligne est remplie avec le modèle désigné par son champ selectorField,
+        les lignes étant regroupées par modèle comme dans fillOut__withPresizedBytesBatch().
+        :param fieldColumns: Liste de colonnes de valeurs, dans l'ordre de providedFieldNames
+        :param separator: Si fourni, retourne une seule chaîne où chaque modèle rempli est suivi de separator
+        :param rowCount: Nombre de lignes du lot, accepté pour la compatibilité avec TemplateManager :
+                         il est toujours égal à la longueur de la colonne selectorField
+        :return: Liste des modèles remplis dans l'ordre des lignes, ou chaîne unique si separator est fourni
+        :raise ValueError: si une valeur du champ selectorField ne désigne aucun modèle
+        """
+        rowTemplates, groups = self._groupRows(fieldColumns)
+        if len(groups) == 1:
+            return rowTemplates[0].fillOut__withSegmentationAndColumns(fieldColumns, separator)
+
+        filledTemplates: List[str] = [''] * len(rowTemplates)
+        for template, rowNumbers in groups.items():
+            for rowNumber, filledTemplate in zip(rowNumbers, template.fillOut__withSegmentationAndColumns(
+                    self._groupColumns(fieldColumns, rowNumbers))):
+                filledTemplates[rowNumber] = filledTemplate
+        if separator is None:
+            return filledTemplates
+        # Élément vide final pour que le dernier modèle rempli soit aussi suivi du séparateur
+        filledTemplates.append('')
+        return separator.join(filledTemplates)
+
+    def _groupRows(self, fieldColumns: List[List[str]]) -> Tuple[List[TemplateManager], Dict[TemplateManager, List[int]]]:
+        """
+        Retourne le modèle de chaque ligne d'un lot et les numéros des lignes de chaque modèle,
+        dans l'ordre de la première apparition des modèles.
+        :raise ValueError: si une valeur du champ selectorField ne désigne aucun modèle
+        """
+        selectorColumn = fieldColumns[self._selectorIndex]
+        # Le modèle n'est recherché qu'une fois par valeur distincte du champ de sélection dans le lot
+        selectorValueCounts = Counter(selectorColumn)
+        templatesBySelectorValue = {selectorValue: self.getTemplate(selectorValue) for selectorValue in selectorValueCounts}
+        self._countRows(selectorValueCounts)
+        rowTemplates = list(map(templatesBySelectorValue.__getitem__, selectorColumn))
+
+        groups: Dict[TemplateManager, List[int]] = {}
+        for rowNumber, template in enumerate(rowTemplates):
+            groups.setdefault(template, []).append(rowNumber)
+        return rowTemplates, groups
+
+    @staticmethod
+    def _groupColumns(fieldColumns: List[List[str]], rowNumbers: List[int]) -> List[List[str]]:
+        """
+        Retourne les colonnes des seules lignes rowNumbers d'un lot.
+        """
+        if len(rowNumbers) == 1:
+            return [[column[rowNumbers[0]]] for column in fieldColumns]
+        rowsGetter = itemgetter(*rowNumbers)
+        return [list(rowsGetter(column)) for column in fieldColumns]
+
+    def _countRows(self, selectorValueCounts: Counter) -> None:
+        """
+        Ajoute les lignes d'un lot au nombre de lignes remplies par clé de modèle.
+        """
+        for selectorValue, rowCount in selectorValueCounts.items():
+            key = selectorValue.strip()
+            if key not in self._templates:
+                key = self.defaultKey
+            self.rowCounts[key] = self.rowCounts.get(key, 0) + rowCount
+
+
+#=====================================================================================
+# Tests de la classe TemplateRegistry
+#=====================================================================================
+import random
+import tempfile
+import time
+
+
+def _main() -> None:
+    """
+    Compare, pour un mailing en 4 langues dont les lignes sont mélangées, le remplissage ligne par ligne
+    avec le modèle de chaque ligne et le remplissage groupé par modèle, puis génère le mailing d'exemple.
+    """
+    from Benchmark import generateRows, generateTemplate
+    from Mailer import Mailer
+    from MailingData import MailingData
+
+    scenario = {'fieldCount': 10, 'valueLength': 20, 'staticLength': 2000, 'repeatCount': 1, 'rowCount': 50000}
+    fieldNames, rows = generateRows(scenario)
+    languages = ['fr', 'en', 'de', 'es']
+    fieldNames = fieldNames + ['LANGUE']
+    randomGenerator = random.Random(0)
+    rows = [row + [randomGenerator.choice(languages)] for row in rows]
+    fieldColumns = [list(column) for column in zip(*rows)]
+    batchSize = 1000
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for seed, language in enumerate(languages):
+            (Path(tmpDir) / f"{language}.html").write_text(generateTemplate(scenario, seed=seed), encoding='utf-8')
+        registry = TemplateRegistry(fieldNames, selectorField='LANGUE')
+        print(f"Modèles enregistrés : {registry.registerDirectory(Path(tmpDir))}")
+
+        start = time.perf_counter()
+        rowByRow = b''.join(registry.fillOut(row).encode('utf-8') + Mailer.separatorBytes for row in rows)
+        print(f"Ligne par ligne : {time.perf_counter() - start:.2f} secondes pour {len(rows)} lignes")
+
+        start = time.perf_counter()
+        grouped = b''.join(registry.fillOut__withPresizedBytesBatch([column[i:i + batchSize] for column in fieldColumns],
+                                                                    Mailer.separatorBytes)
+                           for i in range(0, len(rows), batchSize))
+        print(f"Groupé par modèle : {time.perf_counter() - start:.2f} secondes, contenus identiques : {grouped == rowByRow}")
+        print(f"Lignes par modèle : {registry.rowCounts}")
+
+        # Longueurs des contenus, reprises dans l'ordre des lignes
+        _, contentLengths = registry.fillOut__withPresizedBytesBatchAndLengths(
+            [column[:batchSize] for column in fieldColumns], Mailer.separatorBytes)
+        expectedLengths = [len(registry.fillOut(row).encode('utf-8')) for row in rows[:batchSize]]
+        print(f"Longueurs des contenus identiques : {contentLengths == expectedLengths}")
+
+    data = MailingData(Path('data/multi_template_data.csv'))
+    registry = TemplateRegistry(data.fieldNames, selectorField='LANGUE', defaultKey='fr')
+    registry.register('fr', Path('data/simple_template.html'))
+    registry.register('en', Path('data/simple_template_en.html'))
+    for rowCount, fieldColumns in data.nextFieldValuesAsColumns():
+        print(registry.fillOut__withPresizedBytesBatch(fieldColumns, Mailer.separatorBytes, rowCount).decode('utf-8'))
+
+
+if __name__ == '__main__':
+    _main()
@@ -1,51 +1,133 @@
 # Mise en œuvre optimisée de rechercher/remplacer multiples dans du texte
 
 from pathlib import Path
+from CheckpointedGenerator import CheckpointedGenerator
+from Instrumentation import Instrumentation
 from Mailer import Mailer
 from TemplateManager import TemplateManager
+from TemplateRegistry import TemplateRegistry
 from MailingData import MailingData
+from ParallelRenderer import ParallelRenderer
+from ShardedMailer import ShardedMailer
 import time
 
+# Instrumentation optionnelle, activée par les variables d'environnement MAILING_METRICS, MAILING_PROFILE
+# et MAILING_TRACEMALLOC (cf. Instrumentation.fromEnvironment()), par exemple :
+# MAILING_METRICS=metrics.prom MAILING_PROFILE=render python main.py
+instrumentation = Instrumentation.fromEnvironment()
 
 def test_fillOut__withReplace(htmlOutputFile: Path, template: TemplateManager, data: MailingData) -> None:
     start = time.perf_counter()
-    mailer = Mailer(htmlOutputFile)
-
-    for fieldValues in data.nextFieldValuesAsDict():
-        # Remplace les variables dans le template par les valeurs de la ligne de données
-        formattedContent = template.fillOut__withReplace(fieldValues)
-        # Ajoute le contenu formaté au mailing
-        mailer.addMailing(formattedContent)
+    with Mailer(htmlOutputFile, instrumentation=instrumentation) as mailer:
+        for fieldValues in data.nextFieldValuesAsDict():
+            # Remplace les variables dans le template par les valeurs de la ligne de données
+            formattedContent = template.fillOut__withReplace(fieldValues)
+            # Ajoute le contenu formaté au mailing
+            mailer.addMailing(formattedContent)
     end = time.perf_counter()
     print(f"Durée d'exécution de test_fillOut__withReplace : {(end - start) * 1000:.4f} ms")
 
 
 def test_fillOut__withSegmentationAndDict(htmlOutputFile: Path, template: TemplateManager, data: MailingData) -> None:
     start = time.perf_counter()
-    mailer = Mailer(htmlOutputFile)
-
-    for fieldValues in data.nextFieldValuesAsDict():
-        # Remplace les variables dans le template par les valeurs de la ligne de données
-        formattedContent = template.fillOut__withSegmentationAndDict(fieldValues)
-        # Ajoute le contenu formaté au mailing
-        mailer.addMailing(formattedContent)
+    with Mailer(htmlOutputFile, instrumentation=instrumentation) as mailer:
+        for fieldValues in data.nextFieldValuesAsDict():
+            # Remplace les variables dans le template par les valeurs de la ligne de données
+            formattedContent = template.fillOut__withSegmentationAndDict(fieldValues)
+            # Ajoute le contenu formaté au mailing
+            mailer.addMailing(formattedContent)
     end = time.perf_counter()
     print(f"Durée d'exécution de test_fillOut__withSegmentationAndDict : {(end - start) * 1000:.4f} ms")
 
 
 def test_fillOut__withSegmentationAndList(htmlOutputFile: Path, template: TemplateManager, data: MailingData) -> None:
     start = time.perf_counter()
-    mailer = Mailer(htmlOutputFile)
-
-    for fieldValues in data.nextFieldsValueAsList():
-        # Remplace les variables dans le template par les valeurs de la ligne de données
-        formattedContent = template.fillOut__withSegmentationAndList(fieldValues)
-        # Ajoute le contenu formaté au mailing
-        mailer.addMailing(formattedContent)
+    with Mailer(htmlOutputFile, instrumentation=instrumentation) as mailer:
+        for fieldValues in data.nextFieldsValueAsList():
+            # Remplace les variables dans le template par les valeurs de la ligne de données
+            formattedContent = template.fillOut__withSegmentationAndList(fieldValues)
+            # Ajoute le contenu formaté au mailing
+            mailer.addMailing(formattedContent)
     end = time.perf_counter()
     print(f"Durée d'exécution de fillOut__withSegmentationAndList : {(end - start) * 1000:.4f} ms")
 
 
+def test_fillOut__withSegmentationAndColumns(htmlOutputFile: Path, template: TemplateManager, data: MailingData) -> None:
+    start = time.perf_counter()
+    with Mailer(htmlOutputFile, instrumentation=instrumentation) as mailer:
+        for rowCount, fieldColumns in data.nextFieldValuesAsColumns(batchSize=1000):
+            # Remplit le template pour tout le lot et ajoute les contenus formatés en une seule écriture groupée
+            mailer.addMailings(template.fillOut__withSegmentationAndColumns(fieldColumns, rowCount=rowCount))
+    end = time.perf_counter()
+    print(f"Durée d'exécution de fillOut__withSegmentationAndColumns : {(end - start) * 1000:.4f} ms")
+
+
+def test_fillOut__withPresizedBatch(htmlOutputFile: Path, template: TemplateManager, data: MailingData) -> None:
+    start = time.perf_counter()
+    with Mailer(htmlOutputFile, instrumentation=instrumentation) as mailer:
+        for rowCount, fieldColumns in data.nextFieldValuesAsColumns(batchSize=1000):
+            # Remplit le template pour tout le lot dans une seule chaîne, séparateurs compris, et l'écrit en une fois
+            mailer.addJoinedMailings(template.fillOut__withPresizedBatch(fieldColumns, Mailer.separator, rowCount),
+                                     rowCount)
+    end = time.perf_counter()
+    print(f"Durée d'exécution de fillOut__withPresizedBatch : {(end - start) * 1000:.4f} ms")
+
+
+def test_fillOut__withPresizedBytesBatch(htmlOutputFile: Path, template: TemplateManager, data: MailingData) -> None:
+    start = time.perf_counter()
+    with Mailer(htmlOutputFile, instrumentation=instrumentation) as mailer:
+        for rowCount, fieldColumns in data.nextFieldValuesAsColumns(batchSize=1000):
+            # Remplit le template pour tout le lot directement en bytes UTF-8, écrits sans réencodage
+            mailer.addJoinedMailingsBytes(template.fillOut__withPresizedBytesBatch(fieldColumns, Mailer.separatorBytes,
+                                                                                   rowCount), rowCount)
+    end = time.perf_counter()
+    print(f"Durée d'exécution de fillOut__withPresizedBytesBatch : {(end - start) * 1000:.4f} ms")
+
+
+def test_fillOut__withParallelRenderer(htmlOutputFile: Path, template: TemplateManager, data: MailingData) -> None:
+    start = time.perf_counter()
+    with Mailer(htmlOutputFile, instrumentation=instrumentation) as mailer:
+        # Remplit le template par lots répartis sur tous les cœurs et ajoute les contenus formatés dans l'ordre
+        ParallelRenderer(template, chunkSize=1000).render(data, mailer)
+    end = time.perf_counter()
+    print(f"Durée d'exécution de test_fillOut__withParallelRenderer : {(end - start) * 1000:.4f} ms")
+
+
+def test_fillOut__withTemplateRegistry(htmlOutputFile: Path, registry: TemplateRegistry, data: MailingData) -> None:
+    start = time.perf_counter()
+    with Mailer(htmlOutputFile, instrumentation=instrumentation) as mailer:
+        for rowCount, fieldColumns in data.nextFieldValuesAsColumns(batchSize=1000):
+            # Remplit chaque ligne avec le modèle de sa langue, les lignes étant regroupées par modèle
+            mailer.addJoinedMailingsBytes(registry.fillOut__withPresizedBytesBatch(fieldColumns, Mailer.separatorBytes),
+                                          rowCount)
+    end = time.perf_counter()
+    print(f"Durée d'exécution de test_fillOut__withTemplateRegistry : {(end - start) * 1000:.4f} ms")
+
+
+def test_fillOut__withCheckpoints(htmlOutputFile: Path, template: TemplateManager, data: MailingData) -> None:
+    start = time.perf_counter()
+    # Reprend une génération interrompue ou ne remplit que les lignes modifiées depuis la génération précédente
+    generator = CheckpointedGenerator(template)
+    generator.generate(data, htmlOutputFile)
+    end = time.perf_counter()
+    print(f"Durée d'exécution de test_fillOut__withCheckpoints ({generator.mode}, {generator.renderedCount} lignes "
+          f"remplies, {generator.reusedCount} recopiées) : {(end - start) * 1000:.4f} ms")
+
+
+def test_fillOut__withShardedOutput(outputDirectory: Path, template: TemplateManager, data: MailingData) -> None:
+    start = time.perf_counter()
+    # Un fichier compressé par destinataire, indexé dans outputDirectory/mailing.index.tsv
+    with ShardedMailer(outputDirectory, shardBy='recipient', compression='gzip',
+                       instrumentation=instrumentation) as mailer:
+        for rowCount, fieldColumns in data.nextFieldValuesAsColumns(batchSize=1000):
+            # Les longueurs des contenus remplis permettent de les indexer sans rechercher le séparateur
+            joinedContents, contentLengths = template.fillOut__withPresizedBytesBatchAndLengths(
+                fieldColumns, Mailer.separatorBytes, rowCount)
+            mailer.addJoinedMailingsBytes(joinedContents, rowCount, contentLengths)
+    end = time.perf_counter()
+    print(f"Durée d'exécution de test_fillOut__withShardedOutput : {(end - start) * 1000:.4f} ms")
+
+
 def main() -> None:
     """
     Test de la génération de mailing selon différentes méthodes de remplissage du modèle de mail.
@@ -55,12 +137,38 @@ def main() -> None:
     # templateFile = Path('template_1381.html')
     # dataFile = Path('template_1381.xlsx')
 
-    data = MailingData(dataFile)
-    templateManager = TemplateManager(htmlFile=templateFile, providedFieldNames=data.fieldNames)
+    data = MailingData(dataFile, instrumentation=instrumentation)
+    templateManager = TemplateManager(htmlFile=templateFile, providedFieldNames=data.fieldNames,
+                                      instrumentation=instrumentation)
 
     test_fillOut__withReplace(Path('output__withReplace.html'), templateManager, data)
     test_fillOut__withSegmentationAndDict(Path('output__withSegmentationAndDict.html'), templateManager, data)
     test_fillOut__withSegmentationAndList(Path('output__withSegmentationAndList.html'), templateManager, data)
+    test_fillOut__withSegmentationAndColumns(Path('output__withSegmentationAndColumns.html'), templateManager, data)
+    test_fillOut__withPresizedBatch(Path('output__withPresizedBatch.html'), templateManager, data)
+    test_fillOut__withPresizedBytesBatch(Path('output__withPresizedBytesBatch.html'), templateManager, data)
+    test_fillOut__withParallelRenderer(Path('output__withParallelRenderer.html'), templateManager, data)
+    test_fillOut__withShardedOutput(Path('output__withShardedOutput'), templateManager, data)
+    test_fillOut__withCheckpoints(Path('output__withCheckpoints.html'), templateManager, data)
+
+    # Projection : seules les colonnes des champs du modèle sont lues et converties
+    projectedData = MailingData(dataFile, requiredFieldNames=TemplateManager.readTemplateFieldNames(templateFile),
+                                instrumentation=instrumentation)
+    projectedTemplateManager = TemplateManager(htmlFile=templateFile, providedFieldNames=projectedData.fieldNames,
+                                               instrumentation=instrumentation)
+    test_fillOut__withPresizedBatch(Path('output__withProjectedColumns.html'), projectedTemplateManager, projectedData)
+
+    # Plusieurs modèles : le modèle de chaque ligne est désigné par sa colonne LANGUE (modèle français par défaut)
+    multiTemplateData = MailingData(Path('data/multi_template_data.csv'), instrumentation=instrumentation)
+    registry = TemplateRegistry(multiTemplateData.fieldNames, selectorField='LANGUE', defaultKey='fr')
+    registry.register('fr', templateFile)
+    registry.register('en', Path('data/simple_template_en.html'))
+    test_fillOut__withTemplateRegistry(Path('output__withTemplateRegistry.html'), registry, multiTemplateData)
+
+    if instrumentation is not None:
+        print(instrumentation.report())
+        instrumentation.export()
+        instrumentation.close()
 
 
 if __name__ == "__main__":